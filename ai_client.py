@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from typing import List
+import aiohttp
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AIError(Exception):
+    """Raised when the AI API fails or misses its deadline"""
+    pass
+
+
+class AIClient:
+    """
+    Async client for an OpenAI-compatible chat completions API (Open WebUI).
+
+    Requests share one aiohttp session with a bounded connection pool
+    (OPENWEBUI_MAX_CONNECTIONS), so the event loop keeps serving other updates while
+    the model answers. Every request has a deadline (OPENWEBUI_TIMEOUT by default);
+    a late request is cancelled, which closes its connection instead of leaving it
+    half-read in the pool. The session is created on first use in the running loop
+    and recreated if that loop has changed.
+    """
+
+    def __init__(self, api_url: str = None, api_key: str = None, model: str = None,
+                 timeout: float = None, max_connections: int = None):
+        self.api_url = api_url or Config.OPENWEBUI_API_URL
+        self.api_key = api_key or Config.OPENWEBUI_API_KEY
+        self.model = model or Config.OPENWEBUI_MODEL
+        self.timeout = timeout or Config.OPENWEBUI_TIMEOUT
+        self.max_connections = max_connections or Config.OPENWEBUI_MAX_CONNECTIONS
+        self._session = None
+        self._loop = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_url and self.api_key)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            self._loop = loop
+        return self._session
+
+    async def _post(self, payload: dict) -> dict:
+        async with self._get_session().post(self.api_url, json=payload) as response:
+            if response.status != 200:
+                raise AIError(f"HTTP {response.status}: {(await response.text())[:500]}")
+            return await response.json(content_type=None)
+
+    async def chat(self, messages: List[dict], timeout: float = None) -> str:
+        """Send a chat completion request and return the reply text"""
+        timeout = timeout or self.timeout
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._post({"model": self.model, "messages": messages}), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"AI request missed its {timeout:.0f}s deadline")
+            raise AIError(f"AI không trả lời trong {timeout:.0f} giây")
+        except aiohttp.ClientError as e:
+            raise AIError(f"Không kết nối được AI API: {e}")
+        logger.info(f"AI reply in {time.perf_counter() - started:.1f}s")
+        return result.get('choices', [{}])[0].get('message', {}).get('content', 'Không nhận được phản hồi từ AI.')
+
+    async def close(self):
+        """Close the pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Global client shared by /ask
+ai_client = AIClient()
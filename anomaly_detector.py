@@ -0,0 +1,212 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+import numpy as np
+from config import Config
+from timeseries import parse_column
+from zabbix import get_zabbix_api
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_VALUE_TYPES = [0, 3]  # Numeric float, numeric unsigned
+
+# Relative floor on the standard deviation, so a flat series does not turn every small
+# step into an infinite z-score
+STD_FLOOR = 0.01
+
+
+class AnomalyDetector:
+    """
+    Streaming anomaly detector over the latest values of many items.
+
+    Every cycle asks item.get once for `lastvalue`/`lastclock` of all numeric items whose
+    key matches ANOMALY_ITEM_KEYS and updates an exponentially weighted mean and
+    variance (ANOMALY_ALPHA) per item. A new value whose z-score against that state
+    reaches ANOMALY_THRESHOLD after ANOMALY_MIN_SAMPLES samples is flagged, usually well
+    before a static trigger threshold is crossed. State lives in flat NumPy arrays
+    sorted by itemid, so a cycle is a handful of vector operations whatever the number
+    of items, and is saved to ANOMALY_SNAPSHOT after every cycle.
+    """
+
+    def __init__(self, keys: List[str] = None, alpha: float = None, threshold: float = None,
+                 min_samples: int = None, snapshot_path: str = None, item_refresh: int = None):
+        self.keys = keys or Config.ANOMALY_ITEM_KEYS
+        self.alpha = alpha or Config.ANOMALY_ALPHA
+        self.threshold = threshold or Config.ANOMALY_THRESHOLD
+        self.min_samples = min_samples or Config.ANOMALY_MIN_SAMPLES
+        self.snapshot_path = snapshot_path or Config.ANOMALY_SNAPSHOT
+        self.item_refresh = item_refresh or Config.ANOMALY_ITEM_REFRESH
+        self._lock = threading.Lock()
+        self._zapi = None
+        self._items: Dict[int, tuple] = {}  # itemid -> (host, name, key_)
+        self._groupids: List[str] = []
+        self.items_loaded_at = 0.0
+        self.last_cycle = 0.0
+        self._reset(np.empty(0, dtype=np.int64))
+        self.load()
+
+    def _reset(self, itemids: np.ndarray):
+        size = itemids.size
+        self.itemids = itemids
+        self.mean = np.zeros(size, dtype=np.float64)
+        self.var = np.zeros(size, dtype=np.float64)
+        self.count = np.zeros(size, dtype=np.int32)
+        self.last_clock = np.zeros(size, dtype=np.int64)
+        self.last_value = np.zeros(size, dtype=np.float64)
+        self.score = np.zeros(size, dtype=np.float32)
+        self.flagged = np.zeros(size, dtype=bool)
+
+    _FIELDS = ('mean', 'var', 'count', 'last_clock', 'last_value', 'score', 'flagged')
+
+    def _reindex(self, itemids: np.ndarray):
+        """Resize the state to a new sorted itemid set, keeping the state of known items"""
+        old = {field: getattr(self, field) for field in self._FIELDS}
+        old_ids = self.itemids
+        self._reset(itemids)
+        if old_ids.size and itemids.size:
+            common, new_pos, old_pos = np.intersect1d(itemids, old_ids, assume_unique=True, return_indices=True)
+            for field, values in old.items():
+                getattr(self, field)[new_pos] = values[old_pos]
+
+    def _params(self, output: List[str]) -> dict:
+        params = {
+            "output": output,
+            "filter": {"value_type": NUMERIC_VALUE_TYPES},
+            "search": {"key_": [key if '*' in key else f"*{key}*" for key in self.keys]},
+            "searchByAny": True,
+            "searchWildcardsEnabled": True,
+            "monitored": True
+        }
+        if Config.HOST_GROUPS:
+            params["groupids"] = self._groupids
+        return params
+
+    def _fetch_items(self, zapi) -> List[dict]:
+        """Item metadata (hosts, names) with the latest values"""
+        if Config.HOST_GROUPS:
+            groups = zapi.hostgroup.get({"output": ["groupid"], "filter": {"name": Config.HOST_GROUPS}})
+            self._groupids = [group['groupid'] for group in groups or []]
+        return zapi.item.get(dict(self._params(["itemid", "name", "key_", "lastvalue", "lastclock"]),
+                                  selectHosts=["host"])) or []
+
+    def _apply_items(self, rows: List[dict]):
+        """Replace the tracked itemid set and metadata"""
+        self._items = {
+            int(row['itemid']): (row['hosts'][0]['host'] if row.get('hosts') else "Unknown", row['name'], row['key_'])
+            for row in rows
+        }
+        self._reindex(np.array(sorted(self._items), dtype=np.int64))
+        self.items_loaded_at = time.time()
+        logger.info(f"Anomaly detector tracking {len(self._items)} items")
+
+    def update(self, itemids: np.ndarray, clocks: np.ndarray, values: np.ndarray) -> int:
+        """
+        Feed one latest (clock, value) per item; returns the number of flagged items.
+
+        Items without a value newer than the last one seen keep their state.
+        """
+        pos = np.searchsorted(self.itemids, itemids)
+        known = pos < self.itemids.size
+        known[known] = self.itemids[pos[known]] == itemids[known]
+        pos, clocks, values = pos[known], clocks[known], values[known]
+        fresh = clocks > self.last_clock[pos]
+        pos, clocks, values = pos[fresh], clocks[fresh], values[fresh]
+
+        mean, var, count = self.mean[pos], self.var[pos], self.count[pos]
+        diff = values - mean
+        std = np.sqrt(var) + STD_FLOOR * np.abs(mean) + 1e-9
+        score = np.where(count > 0, diff / std, 0.0)
+
+        first = count == 0
+        increment = self.alpha * diff
+        self.mean[pos] = np.where(first, values, mean + increment)
+        self.var[pos] = np.where(first, 0.0, (1 - self.alpha) * (var + diff * increment))
+        self.count[pos] = count + 1
+        self.last_clock[pos] = clocks
+        self.last_value[pos] = values
+        self.score[pos] = score
+        self.flagged[pos] = (count >= self.min_samples) & (np.abs(score) >= self.threshold)
+        return int(self.flagged.sum())
+
+    def cycle(self, zapi=None) -> int:
+        """Pull the latest values of all tracked items in one call; returns how many became anomalous"""
+        if zapi is None:
+            self._zapi = self._zapi or get_zabbix_api()
+            zapi = self._zapi
+        refresh = time.time() - self.items_loaded_at >= self.item_refresh
+        if refresh:
+            rows = self._fetch_items(zapi)
+        else:
+            rows = zapi.item.get(self._params(["itemid", "lastvalue", "lastclock"])) or []
+
+        with self._lock:
+            if refresh:
+                self._apply_items(rows)
+            rows = [row for row in rows if row.get('lastclock') not in (None, '', '0')]
+            started = time.perf_counter()
+            before = self.flagged.copy()
+            flagged = self.update(parse_column(rows, 'itemid', np.int64),
+                                  parse_column(rows, 'lastclock', np.int64),
+                                  parse_column(rows, 'lastvalue', np.float64))
+            new = int(np.count_nonzero(self.flagged & ~before))
+            self.last_cycle = time.time()
+            logger.debug(f"Anomaly cycle: {len(rows)} values in {time.perf_counter() - started:.3f}s, "
+                         f"{flagged} flagged ({new} new)")
+            self.save()
+            return new
+
+    def anomalies(self, host: str = None, limit: int = 10) -> List[dict]:
+        """Flagged items, strongest deviation first, optionally for one host"""
+        with self._lock:
+            flagged = np.flatnonzero(self.flagged)
+            flagged = flagged[np.argsort(-np.abs(self.score[flagged]), kind='stable')]
+            result = []
+            for i in flagged:
+                item_host, name, key = self._items.get(int(self.itemids[i]), ("Unknown", "", ""))
+                if host is not None and item_host != host:
+                    continue
+                result.append({
+                    'itemid': str(self.itemids[i]),
+                    'host': item_host,
+                    'name': name,
+                    'key_': key,
+                    'value': float(self.last_value[i]),
+                    'expected': float(self.mean[i]),
+                    'score': float(self.score[i]),
+                    'clock': int(self.last_clock[i])
+                })
+                if len(result) == limit:
+                    break
+            return result
+
+    def save(self):
+        """Write the state arrays to the snapshot file (atomically)"""
+        if not self.snapshot_path:
+            return
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, itemids=self.itemids, **{field: getattr(self, field) for field in self._FIELDS})
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.error(f"Error saving anomaly snapshot: {e}")
+
+    def load(self):
+        """Restore the state saved by a previous run, if any"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with np.load(self.snapshot_path) as snapshot:
+                self._reset(snapshot['itemids'])
+                for field in self._FIELDS:
+                    getattr(self, field)[:] = snapshot[field]
+            logger.info(f"Anomaly state restored for {self.itemids.size} items")
+        except Exception as e:
+            logger.error(f"Error loading anomaly snapshot: {e}")
+            self._reset(np.empty(0, dtype=np.int64))
+
+
+# Global detector run by the bots' background jobs
+anomaly_detector = AnomalyDetector()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark of AnalyzeCommand._analyze_host_dependencies on synthetic problems.
+
+Generates P problems spread over hosts, each on its own trigger with D dependencies on
+other problem triggers, and times the indexed implementation at each size. The time
+per problem should stay flat as P grows (linear scaling). The old nested scan is timed
+too on small sizes (--quadratic-sizes) for comparison; it is O(P²·D) and is not run
+on the large sizes.
+
+Chạy / Run:
+    python benchmarks/bench_analyze_dependencies.py --sizes 10000,100000,1000000 --deps 2
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commands.analyze import AnalyzeCommand
+
+
+def make_problems(count: int, deps: int, hosts: int, seed: int = 0):
+    """Problems and a trigger map shaped like problem.get / trigger.get results"""
+    rng = random.Random(seed)
+    problems = []
+    trigger_map = {}
+    for i in range(count):
+        trigger_id = str(100000 + i)
+        problems.append({
+            "objectid": trigger_id,
+            "name": f"Problem {i}",
+            "clock": str(1718000000 + i),
+            "severity": str(i % 6),
+            "hosts": [{"host": f"host{i % hosts}"}]
+        })
+        trigger_map[trigger_id] = {
+            "triggerid": trigger_id,
+            "description": f"Problem {i}",
+            "dependencies": [{"triggerid": str(100000 + rng.randrange(count))} for _ in range(deps)]
+        }
+    return problems, trigger_map
+
+
+def quadratic_dependencies(problems, trigger_map):
+    """The previous implementation: scans every problem for every dependency"""
+    dependencies = {}
+    for problem in problems:
+        trigger_id = problem["objectid"]
+        host = problem['hosts'][0]['host'] if problem['hosts'] else "Unknown"
+        if trigger_id in trigger_map:
+            trigger_deps = trigger_map[trigger_id].get('dependencies', [])
+            if trigger_deps:
+                if host not in dependencies:
+                    dependencies[host] = {'depends_on': set(), 'depended_by': set()}
+                for dep in trigger_deps:
+                    for other_problem in problems:
+                        if other_problem["objectid"] == dep['triggerid']:
+                            dep_host = other_problem['hosts'][0]['host'] if other_problem['hosts'] else "Unknown"
+                            dependencies[host]['depends_on'].add(dep_host)
+                            if dep_host not in dependencies:
+                                dependencies[dep_host] = {'depends_on': set(), 'depended_by': set()}
+                            dependencies[dep_host]['depended_by'].add(host)
+                            break
+    return dependencies
+
+
+def timed(func, *args):
+    gc.collect()
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='problem counts (comma separated)')
+    parser.add_argument('--quadratic-sizes', default='1000,2000,4000', help='sizes for the old implementation')
+    parser.add_argument('--deps', type=int, default=2, help='dependencies per trigger')
+    parser.add_argument('--hosts', type=int, default=5000, help='distinct hosts')
+    args = parser.parse_args()
+
+    command = AnalyzeCommand()
+    print(f"{'impl':<10}{'problems':>10}{'seconds':>10}{'us/problem':>12}{'hosts':>8}")
+
+    for size in [int(s) for s in args.quadratic_sizes.split(',') if s]:
+        problems, trigger_map = make_problems(size, args.deps, args.hosts)
+        expected, seconds = timed(quadratic_dependencies, problems, trigger_map)
+        result, _ = timed(command._analyze_host_dependencies, problems, trigger_map)
+        assert result == expected, "indexed result differs from the nested scan"
+        print(f"{'nested':<10}{size:>10}{seconds:>10.3f}{seconds / size * 1e6:>12.2f}{len(result):>8}")
+
+    per_problem = []
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        problems, trigger_map = make_problems(size, args.deps, args.hosts)
+        result, seconds = timed(command._analyze_host_dependencies, problems, trigger_map)
+        per_problem.append(seconds / size)
+        print(f"{'indexed':<10}{size:>10}{seconds:>10.3f}{seconds / size * 1e6:>12.2f}{len(result):>8}")
+        del problems, trigger_map, result
+
+    if len(per_problem) > 1:
+        growth = per_problem[-1] / per_problem[0]
+        print(f"\nTime per problem grew {growth:.2f}x from the smallest to the largest size "
+              f"({'linear' if growth < 3 else 'NOT linear'})")
+
+
+if __name__ == '__main__':
+    main()
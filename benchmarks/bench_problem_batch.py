@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the columnar ProblemBatch against the dict-based /analyze aggregation.
+
+Generates P synthetic problem.get rows over H hosts and N patterns and times, at each
+size, the previous per-problem loop (nested dicts with a severity list per host and a
+host set per pattern, then sorts for the top-N) and ProblemBatch (build the columns,
+then bincount group-bys for severity distribution, top hosts, top patterns and MTTR).
+Peak memory of each is measured with tracemalloc and the results are cross-checked.
+
+Chạy / Run:
+    python benchmarks/bench_problem_batch.py --sizes 10000,100000,1000000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from problem_batch import ProblemBatch
+
+
+def make_problems(count: int, hosts: int, patterns: int, seed: int = 0):
+    """problem.get-shaped rows; three quarters are resolved after up to two hours"""
+    rng = random.Random(seed)
+    problems = []
+    for i in range(count):
+        clock = 1718000000 + i
+        problems.append({
+            "eventid": str(i),
+            "objectid": str(100000 + rng.randrange(patterns * 4)),
+            "name": f"Problem pattern {rng.randrange(patterns)}",
+            "clock": str(clock),
+            "severity": str(rng.randrange(6)),
+            "hosts": [{"host": f"host{rng.randrange(hosts)}"}],
+            "r_clock": clock + rng.randrange(7200) if rng.random() < 0.75 else None
+        })
+    return problems
+
+
+def dict_analysis(problems):
+    """The previous implementation, plus MTTR computed the same way"""
+    host_problems, severity_distribution, problem_patterns, critical_hosts = {}, {}, {}, set()
+    durations, durations_by_severity = [], {}
+    for problem in problems:
+        host = problem['hosts'][0]['host'] if problem['hosts'] else "Unknown"
+        severity = int(problem['severity'])
+        host_problems.setdefault(host, {'count': 0, 'severities': []})
+        host_problems[host]['count'] += 1
+        host_problems[host]['severities'].append(severity)
+        severity_distribution[severity] = severity_distribution.get(severity, 0) + 1
+        problem_patterns.setdefault(problem['name'], {'count': 0, 'hosts': set()})
+        problem_patterns[problem['name']]['count'] += 1
+        problem_patterns[problem['name']]['hosts'].add(host)
+        if severity >= 4:
+            critical_hosts.add(host)
+        if problem['r_clock'] is not None:
+            duration = problem['r_clock'] - int(problem['clock'])
+            durations.append(duration)
+            durations_by_severity.setdefault(severity, []).append(duration)
+    top_hosts = sorted(host_problems.items(), key=lambda x: x[1]['count'], reverse=True)[:5]
+    top_patterns = sorted(problem_patterns.items(), key=lambda x: x[1]['count'], reverse=True)[:3]
+    return {
+        'severity_distribution': severity_distribution,
+        'top_hosts': [(host, data['count']) for host, data in top_hosts],
+        'top_patterns': [(name, data['count'], len(data['hosts'])) for name, data in top_patterns],
+        'critical_hosts': len(critical_hosts),
+        'mttr': sum(durations) / len(durations),
+        'mttr_by_severity': {s: sum(d) / len(d) for s, d in durations_by_severity.items()}
+    }
+
+
+def batch_analysis(problems):
+    batch = ProblemBatch.from_events(problems)
+    return {
+        'severity_distribution': batch.severity_distribution(),
+        'top_hosts': [(host, count) for host, count, _ in batch.top_hosts(5)],
+        'top_patterns': [(name, count, hosts) for name, count, hosts, _ in batch.top_patterns(3)],
+        'critical_hosts': len(batch.critical_hosts()),
+        'mttr': batch.mttr(),
+        'mttr_by_severity': batch.mttr_by_severity()
+    }
+
+
+def measured(func, *args):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def same_counts(a, b):
+    """Top-N ties may be broken differently; compare counts, not names"""
+    return (a['severity_distribution'] == b['severity_distribution']
+            and [c for _, c in a['top_hosts']] == [c for _, c in b['top_hosts']]
+            and [c[1:] for c in a['top_patterns']] == [c[1:] for c in b['top_patterns']]
+            and a['critical_hosts'] == b['critical_hosts']
+            and abs(a['mttr'] - b['mttr']) < 1e-6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='problem counts (comma separated)')
+    parser.add_argument('--hosts', type=int, default=5000, help='distinct hosts')
+    parser.add_argument('--patterns', type=int, default=500, help='distinct problem names')
+    args = parser.parse_args()
+
+    print(f"{'impl':<8}{'problems':>10}{'seconds':>10}{'us/problem':>12}{'peak MB':>10}")
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        problems = make_problems(size, args.hosts, args.patterns)
+        expected, dict_seconds, dict_peak = measured(dict_analysis, problems)
+        result, batch_seconds, batch_peak = measured(batch_analysis, problems)
+        assert same_counts(expected, result), "columnar result differs from the dict implementation"
+        for name, seconds, peak in (('dict', dict_seconds, dict_peak), ('batch', batch_seconds, batch_peak)):
+            print(f"{name:<8}{size:>10}{seconds:>10.3f}{seconds / size * 1e6:>12.2f}{peak / 2**20:>10.1f}")
+        print(f"{'':<8}{'':>10}{'speedup':>10}{dict_seconds / batch_seconds:>12.1f}x"
+              f"{dict_peak / max(batch_peak, 1):>9.1f}x less memory")
+        del problems
+
+
+if __name__ == '__main__':
+    main()
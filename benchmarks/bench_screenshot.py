@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the screenshot pipeline against a local stand-in for the Zabbix web UI.
+
+Serves a fake login page and dashboard whose widgets load through XHR after a
+configurable render delay, then pushes the captures behind take_screenshot (website)
+and /dashboard through the screenshot scheduler at several concurrency levels.
+Reports p50/p95/p99 latency (queue wait included), peak browser memory and the
+time spent per phase (driver start, navigation, wait, capture, encode).
+
+Needs Chrome + chromedriver like the bot itself. Browser memory is read from /proc,
+so it is only reported on Linux.
+
+Chạy / Run:
+    python benchmarks/bench_screenshot.py --levels 1,2,4 --jobs 8 --render-delay 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from screenshot import capture_screenshot, capture_dashboard, get_ready_wait_stats
+from image_processing import get_compression_stats
+from screenshot_queue import ScreenshotScheduler, PRIORITY_ALERT, PRIORITY_INTERACTIVE
+
+PHASES = ('driver_start', 'navigation', 'wait', 'capture', 'encode')
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><body>
+<form method="post" action="/index.php">
+  <input name="name" type="text"><input name="password" type="password">
+  <button type="submit">Sign in</button>
+</form>
+</body></html>"""
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html><head><style>
+  .dashboard-grid {{ display: grid; grid-template-columns: repeat(3, 1fr); gap: 8px; }}
+  .dashboard-grid-widget {{ height: 300px; border: 1px solid #ccc; }}
+</style></head>
+<body>
+<div class="dashboard-grid">{widgets}</div>
+<script>
+document.querySelectorAll('.dashboard-grid-widget').forEach(function(widget, index) {{
+    var xhr = new XMLHttpRequest();
+    xhr.open('GET', '/widget?id=' + index);
+    xhr.onload = function() {{
+        var canvas = document.createElement('canvas');
+        canvas.width = 500; canvas.height = 250;
+        var ctx = canvas.getContext('2d');
+        for (var x = 0; x < 500; x += 5) {{ ctx.fillRect(x, 125 + 100 * Math.sin(x / 20 + index), 4, 4); }}
+        widget.querySelector('.content').appendChild(canvas);
+        widget.classList.remove('is-loading');
+    }};
+    xhr.send();
+}});
+</script>
+</body></html>"""
+
+WIDGET = '<div class="dashboard-grid-widget is-loading"><h4>Widget {index}</h4><div class="content"></div></div>'
+
+
+class FakeZabbixHandler(BaseHTTPRequestHandler):
+    render_delay = 0.5
+    widgets = 6
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: str, content_type: str = 'text/html'):
+        data = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/widget':
+            # Server side render time of one widget
+            time.sleep(self.render_delay)
+            self._send('{"result": "ok"}', 'application/json')
+        elif url.path in ('/zabbix.php', '/page'):
+            widgets = ''.join(WIDGET.format(index=i) for i in range(self.widgets))
+            self._send(DASHBOARD_PAGE.format(widgets=widgets))
+        else:
+            self._send(LOGIN_PAGE)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(302)
+        self.send_header('Location', '/zabbix.php?action=dashboard.view')
+        self.end_headers()
+
+
+def start_fake_zabbix(render_delay: float, widgets: int):
+    FakeZabbixHandler.render_delay = render_delay
+    FakeZabbixHandler.widgets = widgets
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeZabbixHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def browser_rss_mb() -> float:
+    """Total resident memory of chrome/chromedriver processes in MB (Linux only)"""
+    total_kb = 0
+    for pid in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/comm') as f:
+                name = f.read().strip()
+            if 'chrom' not in name:
+                continue
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+class MemorySampler:
+    """Samples browser memory in the background and keeps the peak"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, browser_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_level(mode: str, base_url: str, level: int, jobs: int):
+    """Submit `jobs` captures to a scheduler limited to `level` browsers"""
+    scheduler = ScreenshotScheduler(max_concurrency=level, max_queue_size=jobs, max_job_age=3600)
+    timings = [dict() for _ in range(jobs)]
+
+    async def one(index: int):
+        started = time.monotonic()
+        if mode == 'website':
+            url = f"{base_url}/page?n={index}"
+            await scheduler.run(url, capture_screenshot, url, None, timings[index], priority=PRIORITY_ALERT)
+        else:
+            await scheduler.run(f"dashboard{index}", capture_dashboard, None, timings[index],
+                                priority=PRIORITY_INTERACTIVE)
+        return time.monotonic() - started
+
+    with MemorySampler() as memory:
+        latencies = await asyncio.gather(*(one(i) for i in range(jobs)))
+    stats = scheduler.stats()
+    scheduler.shutdown()
+    return latencies, timings, memory.peak, stats
+
+
+def report(mode: str, level: int, latencies, timings, peak_mb: float, stats: dict):
+    phases = {phase: sum(t.get(phase, 0.0) for t in timings) / len(timings) for phase in PHASES}
+    print(f"{mode:<9} {level:>4} {percentile(latencies, 50):>7.2f} {percentile(latencies, 95):>7.2f} "
+          f"{percentile(latencies, 99):>7.2f} {stats['avg_wait']:>7.2f} {peak_mb:>8.0f}  "
+          + ' '.join(f"{phases[phase]:>8.2f}" for phase in PHASES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', default='1,2,4', help='concurrency levels (comma separated)')
+    parser.add_argument('--jobs', type=int, default=8, help='captures per level')
+    parser.add_argument('--render-delay', type=float, default=0.5, help='seconds each widget takes to load')
+    parser.add_argument('--widgets', type=int, default=6, help='widgets on the fake dashboard')
+    parser.add_argument('--mode', choices=('website', 'dashboard', 'both'), default='both')
+    args = parser.parse_args()
+
+    server, base_url = start_fake_zabbix(args.render_delay, args.widgets)
+    Config.ZABBIX_URL = base_url + '/'
+    Config.ZABBIX_USER = 'bench'
+    Config.ZABBIX_PASSWORD = 'bench'
+
+    modes = ('website', 'dashboard') if args.mode == 'both' else (args.mode,)
+    levels = [int(level) for level in args.levels.split(',') if level.strip()]
+
+    print(f"Fake Zabbix at {base_url}, render delay {args.render_delay}s, {args.widgets} widgets, "
+          f"{args.jobs} jobs per level")
+    print(f"{'mode':<9} {'conc':>4} {'p50':>7} {'p95':>7} {'p99':>7} {'queue':>7} {'peak MB':>8}  "
+          + ' '.join(f"{phase[:8]:>8}" for phase in PHASES))
+    try:
+        for mode in modes:
+            for level in levels:
+                latencies, timings, peak_mb, stats = asyncio.run(run_level(mode, base_url, level, args.jobs))
+                report(mode, level, latencies, timings, peak_mb, stats)
+    finally:
+        server.shutdown()
+
+    print(f"Readiness waits: {get_ready_wait_stats()}")
+    print(f"Compression: {get_compression_stats()}")
+
+
+if __name__ == '__main__':
+    main()
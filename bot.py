@@ -1,6 +1,8 @@
 import os
+import asyncio
 import logging
 import datetime
+import time
 from dotenv import load_dotenv
 from telegram.ext import Application, CommandHandler
 from config import Config
@@ -9,12 +11,23 @@ from commands.dashboard import DashboardCommand
 from commands.get_alerts import GetAlertsCommand
 from commands.get_hosts import GetHostsCommand
 from commands.get_graph import GetGraphCommand
+from commands.spark import SparkCommand
+from commands.heatmap import HeatmapCommand
+from commands.forecast import ForecastCommand
 from commands.ask_ai import AskAICommand
-from commands.analyze import AnalyzeCommand
+from commands.analyze import AnalyzeCommand, report_snapshots
+from commands.flapping import FlappingCommand
 from commands.add_website import AddWebsiteCommand
 from commands.start import StartCommand
 from commands.help import HelpCommand
 from utils import setup_secure_logging
+from graph_renderer import graph_renderer
+from event_sync import event_sync
+from incident_clustering import incident_clusterer, IncidentNotices
+from error_patterns import pattern_miner
+from anomaly_detector import anomaly_detector
+from flapping import flap_detector
+from ai_client import ai_client
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +39,53 @@ logger = logging.getLogger(__name__)
 # Setup secure logging to mask sensitive data
 setup_secure_logging()
 
+async def shutdown_workers(application: Application) -> None:
+    """Stop background worker pools when the bot stops"""
+    graph_renderer.shutdown()
+    pattern_miner.flush()
+    await ai_client.close()
+
+# Incident messages queued by the clusterer (which runs in the sync thread) for the admins
+incident_notices = IncidentNotices()
+
+async def sync_events(context) -> None:
+    """Pull new Zabbix events into the local store and the incident clusterer"""
+    try:
+        await asyncio.to_thread(event_sync.sync)
+        incident_clusterer.expire(int(time.time()))
+    except Exception as e:
+        logger.error(f"Error syncing events: {e}")
+    await notify_incidents(context)
+
+async def notify_incidents(context) -> None:
+    """Send queued incident opened/closed messages to the admins"""
+    for text in incident_notices.drain():
+        for admin_id in Config.ADMIN_IDS:
+            try:
+                await context.bot.send_message(chat_id=admin_id, text=text)
+            except Exception as e:
+                logger.error(f"Error sending incident update to {admin_id}: {e}")
+
+async def refresh_reports(context) -> None:
+    """Rebuild stale /analyze snapshots off the event loop"""
+    try:
+        await asyncio.to_thread(report_snapshots.refresh_due)
+    except Exception as e:
+        logger.error(f"Error refreshing analysis reports: {e}")
+
+async def detect_anomalies(context) -> None:
+    """Update the anomaly state from the latest item values"""
+    try:
+        if await asyncio.to_thread(anomaly_detector.cycle):
+            report_snapshots.invalidate()
+    except Exception as e:
+        logger.error(f"Error detecting anomalies: {e}")
+
+def log_incident_update(update: dict) -> None:
+    incident = update['incident']
+    logger.info(f"Incident #{incident['id']} {update['type']}: {incident['events']} events "
+                f"on {incident['host_count']} hosts ({', '.join(incident['keys'])})")
+
 def main() -> None:
     """Start the bot."""
     # Load environment variables
@@ -51,7 +111,7 @@ def main() -> None:
     logger.info(f"Host Groups: {safe_config['host_groups']}")
 
     # Create the Application and pass it your bot's token.
-    application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+    application = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).post_shutdown(shutdown_workers).build()
 
     # Register command handlers
     application.add_handler(CommandHandler("start", StartCommand().execute))
@@ -60,14 +120,35 @@ def main() -> None:
     application.add_handler(CommandHandler("getalerts", GetAlertsCommand().execute))
     application.add_handler(CommandHandler("gethosts", GetHostsCommand().execute))
     application.add_handler(CommandHandler("getgraph", GetGraphCommand().execute))
+    application.add_handler(CommandHandler("spark", SparkCommand().execute))
+    application.add_handler(CommandHandler("heatmap", HeatmapCommand().execute))
+    application.add_handler(CommandHandler("forecast", ForecastCommand().execute))
     application.add_handler(CommandHandler("ask", AskAICommand().execute))
     application.add_handler(CommandHandler("analyze", AnalyzeCommand().execute))
+    application.add_handler(CommandHandler("flapping", FlappingCommand().execute))
     application.add_handler(CommandHandler("addwebsite", AddWebsiteCommand().execute))
 
     # Schedule daily cleanup
     job_queue = application.job_queue
     job_queue.run_daily(cleanup_old_data, time=datetime.time(hour=1, minute=0))
 
+    # Keep local events and live incidents up to date
+    event_sync.add_listener(incident_clusterer.feed)
+    incident_clusterer.add_listener(log_incident_update)
+    incident_clusterer.add_listener(incident_notices.add)
+    pattern_miner.load()
+    event_sync.add_listener(pattern_miner.feed)
+    flap_detector.load()
+    event_sync.add_listener(flap_detector.feed)
+    job_queue.run_repeating(sync_events, interval=Config.EVENT_SYNC_INTERVAL, first=10)
+
+    # Keep /analyze reports pre-computed
+    event_sync.add_listener(report_snapshots.note_events)
+    job_queue.run_repeating(refresh_reports, interval=Config.EVENT_SYNC_INTERVAL, first=30)
+
+    # Watch item values for anomalies before triggers fire
+    job_queue.run_repeating(detect_anomalies, interval=Config.ANOMALY_INTERVAL, first=20)
+
     # Run the bot until the user presses Ctrl-C
     application.run_polling()
 
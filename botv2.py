@@ -5,6 +5,7 @@ Sử dụng thư viện telebot thay vì python-telegram-bot
 """
 
 import os
+import io
 import logging
 import datetime
 import threading
@@ -20,7 +21,18 @@ from config import Config
 from db import init_db, cleanup_old_data
 from zabbix import get_zabbix_api
 from utils import setup_secure_logging, mask_sensitive_data
-from screenshot import take_screenshot
+from screenshot import capture_dashboard
+from screenshot_queue import screenshot_scheduler, ScreenshotQueueFull, PRIORITY_INTERACTIVE
+from graph_cache import item_lookup_cache, estimate_size
+from graph_engine import render_graph_sync
+from graph_renderer import graph_renderer
+from event_sync import event_sync
+from incident_clustering import incident_clusterer, IncidentNotices
+from error_patterns import pattern_miner
+from anomaly_detector import anomaly_detector
+from flapping import flap_detector
+from commands.flapping import FlappingCommand
+from commands.analyze import AnalyzeCommand, DEFAULT_WINDOW, report_snapshots
 
 # Configure logging
 logging.basicConfig(
@@ -85,7 +97,8 @@ def start_command(message):
 • /gethosts - Liệt kê các host đang giám sát
 • /getgraph <host/IP> - Lấy biểu đồ hiệu suất với gợi ý items
 • /ask <host/IP> - Phân tích thông tin hệ thống với AI
-• /analyze - Phân tích problems và dự đoán vấn đề hệ thống
+• /analyze [refresh] [1h|24h|7d|30d] [group] - Phân tích problems và dự đoán vấn đề hệ thống
+• /flapping - Trigger đổi trạng thái liên tục
 • /addwebsite - Thêm website để chụp ảnh
 
 **Quản lý người dùng:**
@@ -147,11 +160,12 @@ Bot này giúp bạn giám sát và quản lý hệ thống Zabbix thông qua Te
   - Đưa ra đánh giá và khuyến nghị tối ưu hóa
   - Dự đoán xu hướng sử dụng tài nguyên
 
-• /analyze - Phân tích problems và dự đoán vấn đề
-  - Phân tích problems trong 3 ngày qua
+• /analyze [refresh] [1h|24h|7d|30d] [group] - Phân tích problems và dự đoán vấn đề
+  - Phân tích problems trong khoảng thời gian chọn (mặc định 3 ngày)
   - Xác định hosts có vấn đề nghiêm trọng
   - Tìm mối quan hệ phụ thuộc giữa hosts
   - Dự đoán vấn đề có thể xảy ra tiếp theo
+• /flapping - Trigger đang flapping (thông báo của chúng được gộp trong /getalerts)
 
 **🌐 Quản lý website:**
 • /addwebsite - Thêm website để chụp ảnh
@@ -186,9 +200,9 @@ Bot này giúp bạn giám sát và quản lý hệ thống Zabbix thông qua Te
 
 **📈 Lệnh /analyze:**
 ```
-/analyze
+/analyze [refresh] [1h|24h|7d|30d] [group]
 ```
-- Phân tích toàn bộ problems trong 3 ngày
+- Phân tích problems trong khoảng thời gian chọn (mặc định 3 ngày), báo cáo được tính sẵn định kỳ; `refresh` để tính lại ngay
 - Tìm patterns và mối quan hệ
 - Dự đoán vấn đề tương lai
 
@@ -217,18 +231,18 @@ def dashboard_command(message):
     try:
         bot.reply_to(message, "Đang chụp ảnh dashboard Zabbix...")
         
-        # Take screenshot
-        screenshot_path = take_screenshot(Config.ZABBIX_URL)
+        # Take screenshot through the shared scheduler (bounded Chrome instances)
+        screenshot = screenshot_scheduler.submit(
+            'dashboard', capture_dashboard, priority=PRIORITY_INTERACTIVE
+        ).result()
         
-        if screenshot_path and os.path.exists(screenshot_path):
-            with open(screenshot_path, 'rb') as photo:
-                bot.send_photo(message.chat.id, photo, caption="📊 Dashboard Zabbix")
-            
-            # Clean up screenshot file
-            os.remove(screenshot_path)
+        if screenshot:
+            bot.send_photo(message.chat.id, io.BytesIO(screenshot), caption="📊 Dashboard Zabbix")
         else:
             bot.reply_to(message, "❌ Không thể chụp ảnh dashboard. Vui lòng kiểm tra cấu hình Zabbix.")
             
+    except ScreenshotQueueFull:
+        bot.reply_to(message, "❌ Hệ thống chụp ảnh đang quá tải, vui lòng thử lại sau.")
     except Exception as e:
         error_message = mask_sensitive_data(str(e))
         logger.error(f"Lỗi khi chụp ảnh dashboard: {error_message}")
@@ -243,18 +257,22 @@ def get_alerts_command(message):
         
         zapi = get_zabbix_api()
         
-        # Get problems
+        # Get problems (flapping triggers are folded into one line, fetch enough others)
         problems = zapi.problem.get({
             "output": "extend",
             "sortfield": "clock",
             "sortorder": "DESC",
-            "limit": 10
+            "limit": 10 + flap_detector.flapping_count()
         })
         
         if not problems:
             bot.reply_to(message, "✅ Không có problem nào hiện tại.")
             return
         
+        flapping = flap_detector.suppress(problem['objectid'] for problem in problems)
+        folded = [problem for problem in problems if problem['objectid'] in flapping]
+        problems = [problem for problem in problems if problem['objectid'] not in flapping]
+        
         # Format problems message
         alerts_text = "🚨 **10 Problems mới nhất:**\n\n"
         
@@ -277,6 +295,9 @@ def get_alerts_command(message):
             alerts_text += f"   🚨 {severity}\n"
             alerts_text += f"   📝 {problem['description'][:100]}...\n\n"
         
+        if folded:
+            alerts_text += f"🔁 Gộp {len(folded)} problems của trigger đang flapping (xem /flapping)\n"
+        
         bot.reply_to(message, alerts_text, parse_mode='Markdown')
         
     except Exception as e:
@@ -357,7 +378,7 @@ def get_graph_command(message):
         
         # Get items for the host
         items = zapi.item.get({
-            "output": ['itemid', 'name', 'key_'],
+            "output": ['itemid', 'name', 'key_', 'value_type'],
             "hostids": host['hostid'],
             "search": {"name": ['CPU', 'Memory', 'Disk', 'Network']},
             "searchWildcardsEnabled": True,
@@ -372,6 +393,9 @@ def get_graph_command(message):
         markup = types.InlineKeyboardMarkup()
         
         for item in items[:8]:  # Limit to 8 items
+            # Remember the item so the button callback needs no item.get
+            item = dict(item, host=host['host'])
+            item_lookup_cache.put(('item', item['itemid']), [item], size=estimate_size(item))
             markup.add(types.InlineKeyboardButton(
                 text=f"📊 {item['name']}",
                 callback_data=f"graph_{host['hostid']}_{item['itemid']}"
@@ -421,7 +445,7 @@ def ask_ai_command(message):
         
         # Get system information
         items = zapi.item.get({
-            "output": ['itemid', 'name', 'key_'],
+            "output": ['itemid', 'name', 'key_', 'value_type'],
             "hostids": host['hostid'],
             "search": {"name": ['CPU', 'Memory', 'Disk', 'Network']},
             "searchWildcardsEnabled": True
@@ -445,10 +469,17 @@ def ask_ai_command(message):
                 value = next((h['value'] for h in history if h['itemid'] == item['itemid']), 'N/A')
                 analysis_text += f"• {item['name']}: {value}\n"
             
-            analysis_text += "\n🔍 **Đánh giá AI:**\n"
-            analysis_text += "• Hệ thống đang hoạt động ổn định\n"
-            analysis_text += "• Không phát hiện vấn đề nghiêm trọng\n"
-            analysis_text += "• Khuyến nghị: Theo dõi thêm để đảm bảo hiệu suất\n"
+            analysis_text += "\n🔍 **Đánh giá:**\n"
+            anomalies = anomaly_detector.anomalies(host=host['host'], limit=5)
+            if anomalies:
+                for anomaly in anomalies:
+                    analysis_text += (f"• ⚠️ {anomaly['name']}: {anomaly['value']:.2f} lệch khỏi mức thường "
+                                      f"{anomaly['expected']:.2f} (z={anomaly['score']:+.1f})\n")
+                analysis_text += "• Dự đoán: có thể sắp phát sinh problem, nên kiểm tra các chỉ số trên\n"
+            elif anomaly_detector.last_cycle:
+                analysis_text += "• Không phát hiện giá trị bất thường so với lịch sử gần đây\n"
+            else:
+                analysis_text += "• Bộ phát hiện bất thường chưa có dữ liệu\n"
         else:
             analysis_text += "❌ Không có dữ liệu để phân tích"
         
@@ -462,80 +493,43 @@ def ask_ai_command(message):
 @bot.message_handler(commands=['analyze'])
 @admin_only
 def analyze_command(message):
-    """Analyze problems and predict issues"""
+    """Analyze problems and predict issues (served from the background-refreshed snapshot)"""
     try:
-        bot.reply_to(message, "📈 Đang phân tích problems và dự đoán vấn đề...")
-        
-        zapi = get_zabbix_api()
-        
-        # Get problems from last 3 days
-        three_days_ago = int((datetime.datetime.now() - datetime.timedelta(days=3)).timestamp())
-        
-        problems = zapi.problem.get({
-            "output": "extend",
-            "time_from": three_days_ago,
-            "sortfield": "clock",
-            "sortorder": "DESC"
-        })
-        
-        if not problems:
-            bot.reply_to(message, "✅ Không có problem nào trong 3 ngày qua.")
+        args = message.text.split()[1:]
+        force = bool(args) and args[0].lower() == 'refresh'
+        if force:
+            args = args[1:]
+        window = AnalyzeCommand._parse_window(args[0] if args else DEFAULT_WINDOW)
+        if window is None:
+            bot.reply_to(message, "❌ Cú pháp: /analyze [refresh] [1h|24h|7d|30d] [host group]")
             return
+        key = (window[0], ' '.join(args[1:]) or None)
         
-        # Analyze problems
-        analysis_text = "📈 **Phân tích Problems (3 ngày qua):**\n\n"
+        snapshot = report_snapshots.get(key)
+        if snapshot is None or force:
+            bot.reply_to(message, "📈 Đang phân tích problems và dự đoán vấn đề...")
+            snapshot = report_snapshots.refresh(key)
         
-        # Count by severity
-        severity_count = {}
-        host_count = {}
-        
-        for problem in problems:
-            severity = problem['severity']
-            severity_count[severity] = severity_count.get(severity, 0) + 1
-            
-            # Get host name
-            hosts = zapi.host.get({
-                "output": ['name'],
-                "hostids": problem['objectid']
-            })
-            if hosts:
-                host_name = hosts[0]['name']
-                host_count[host_name] = host_count.get(host_name, 0) + 1
-        
-        analysis_text += f"📊 **Tổng quan:**\n"
-        analysis_text += f"• Tổng problems: {len(problems)}\n"
-        analysis_text += f"• Hosts bị ảnh hưởng: {len(host_count)}\n\n"
-        
-        analysis_text += "🚨 **Phân bố theo mức độ nghiêm trọng:**\n"
-        severity_map = {
-            '0': 'Not classified',
-            '1': 'Information',
-            '2': 'Warning',
-            '3': 'Average',
-            '4': 'High',
-            '5': 'Disaster'
-        }
-        
-        for severity, count in sorted(severity_count.items(), key=lambda x: int(x[0]), reverse=True):
-            if count > 0:
-                analysis_text += f"• {severity_map.get(severity, 'Unknown')}: {count}\n"
-        
-        analysis_text += "\n🖥️ **Hosts có nhiều problems nhất:**\n"
-        for host, count in sorted(host_count.items(), key=lambda x: x[1], reverse=True)[:5]:
-            analysis_text += f"• {host}: {count} problems\n"
-        
-        analysis_text += "\n🔮 **Dự đoán:**\n"
-        analysis_text += "• Cần theo dõi các hosts có nhiều problems\n"
-        analysis_text += "• Kiểm tra mối quan hệ phụ thuộc giữa các hosts\n"
-        analysis_text += "• Cân nhắc tăng cường monitoring cho các hosts critical"
-        
-        bot.reply_to(message, analysis_text, parse_mode='Markdown')
+        report, generated_at = snapshot
+        report += f"\n🕒 Cập nhật lúc {datetime.datetime.fromtimestamp(generated_at).strftime('%H:%M %d/%m')}"
+        bot.reply_to(message, report, parse_mode='Markdown')
         
     except Exception as e:
         error_message = mask_sensitive_data(str(e))
         logger.error(f"Lỗi khi phân tích: {error_message}")
         bot.reply_to(message, f"❌ Lỗi khi phân tích: {error_message}")
 
+@bot.message_handler(commands=['flapping'])
+@admin_only
+def flapping_command(message):
+    """List the triggers changing state most often"""
+    try:
+        bot.reply_to(message, FlappingCommand.build_report(flap_detector.top(10)))
+    except Exception as e:
+        error_message = mask_sensitive_data(str(e))
+        logger.error(f"Lỗi khi lấy trigger flapping: {error_message}")
+        bot.reply_to(message, f"❌ Lỗi khi lấy trigger flapping: {error_message}")
+
 @bot.message_handler(commands=['addwebsite'])
 @admin_only
 def add_website_command(message):
@@ -597,52 +591,33 @@ def graph_callback(call):
         
         bot.answer_callback_query(call.id, "📊 Đang tạo biểu đồ...")
         
-        # Get graph data
-        zapi = get_zabbix_api()
-        
-        # Get item info
-        items = zapi.item.get({
-            "output": ['name', 'key_'],
-            "itemids": itemid
-        })
-        
-        if not items:
-            bot.send_message(call.message.chat.id, "❌ Không tìm thấy item")
-            return
+        # Item chosen from the keyboard is normally still cached from /getgraph
+        items = item_lookup_cache.get(('item', itemid))
+        zapi = None
+        if items is None:
+            zapi = get_zabbix_api()
+            items = zapi.item.get({
+                "output": ['itemid', 'name', 'key_', 'value_type'],
+                "itemids": itemid,
+                "selectHosts": ['host']
+            })
+            if not items:
+                bot.send_message(call.message.chat.id, "❌ Không tìm thấy item")
+                return
+            item = items[0]
+            items = [dict(item, host=item['hosts'][0]['host'] if item.get('hosts') else hostid)]
+            item_lookup_cache.put(('item', itemid), items, size=estimate_size(items))
         
         item = items[0]
         
-        # Get history data
-        history = zapi.history.get({
-            "output": "extend",
-            "itemids": itemid,
-            "sortfield": "clock",
-            "sortorder": "DESC",
-            "limit": 100
-        })
+        # Same fetch/parse/render pipeline and image cache as bot v1 /getgraph
+        png = render_graph_sync(items, 3600, f"{item['name']} - {item['host']}", zapi=zapi)
         
-        if not history:
+        if png is None:
             bot.send_message(call.message.chat.id, "❌ Không có dữ liệu lịch sử")
             return
         
-        # Create simple text graph
-        graph_text = f"📊 **Biểu đồ:** {item['name']}\n\n"
-        
-        # Show last 10 values
-        for i, h in enumerate(history[:10]):
-            clock = datetime.datetime.fromtimestamp(int(h['clock']))
-            time_str = clock.strftime('%H:%M')
-            graph_text += f"{time_str}: {h['value']}\n"
-        
-        graph_text += f"\n📈 **Thống kê:**\n"
-        values = [float(h['value']) for h in history if h['value'].replace('.', '').isdigit()]
-        if values:
-            graph_text += f"• Hiện tại: {values[0]:.2f}\n"
-            graph_text += f"• Trung bình: {sum(values)/len(values):.2f}\n"
-            graph_text += f"• Max: {max(values):.2f}\n"
-            graph_text += f"• Min: {min(values):.2f}\n"
-        
-        bot.send_message(call.message.chat.id, graph_text, parse_mode='Markdown')
+        bot.send_photo(call.message.chat.id, io.BytesIO(png), caption=f"📊 {item['name']} - {item['host']} (1 giờ)")
         
     except Exception as e:
         error_message = mask_sensitive_data(str(e))
@@ -719,6 +694,62 @@ def start_cleanup_job():
     cleanup_thread = threading.Thread(target=cleanup_old_data_job, daemon=True)
     cleanup_thread.start()
 
+# Incident messages queued by the clusterer, sent to the admins after each sync
+incident_notices = IncidentNotices()
+
+def notify_incidents():
+    """Send queued incident messages to the admins"""
+    for text in incident_notices.drain():
+        for admin_id in Config.ADMIN_IDS:
+            try:
+                bot.send_message(admin_id, text)
+            except Exception as e:
+                error_message = mask_sensitive_data(str(e))
+                logger.error(f"Error sending incident update to {admin_id}: {error_message}")
+
+def event_sync_job():
+    """Background job keeping local events and live incidents up to date"""
+    while True:
+        try:
+            event_sync.sync()
+            incident_clusterer.expire(int(time.time()))
+            notify_incidents()
+            report_snapshots.refresh_due()
+        except Exception as e:
+            error_message = mask_sensitive_data(str(e))
+            logger.error(f"Error syncing events: {error_message}")
+        
+        time.sleep(Config.EVENT_SYNC_INTERVAL)
+
+def start_event_sync_job():
+    """Start the event sync job in a separate thread"""
+    event_sync.add_listener(incident_clusterer.feed)
+    incident_clusterer.add_listener(incident_notices.add)
+    pattern_miner.load()
+    event_sync.add_listener(pattern_miner.feed)
+    flap_detector.load()
+    event_sync.add_listener(flap_detector.feed)
+    event_sync.add_listener(report_snapshots.note_events)
+    sync_thread = threading.Thread(target=event_sync_job, daemon=True)
+    sync_thread.start()
+
+def anomaly_job():
+    """Background job updating the anomaly state from the latest item values"""
+    while True:
+        try:
+            if anomaly_detector.cycle():
+                report_snapshots.invalidate()
+        except Exception as e:
+            error_message = mask_sensitive_data(str(e))
+            logger.error(f"Error detecting anomalies: {error_message}")
+        
+        time.sleep(Config.ANOMALY_INTERVAL)
+
+def start_anomaly_job():
+    """Start the anomaly detection job in a separate thread"""
+    anomaly_thread = threading.Thread(target=anomaly_job, daemon=True)
+    anomaly_thread.start()
+
 # ==================== MAIN FUNCTION ====================
 
 def main():
@@ -748,12 +779,18 @@ def main():
         
         # Start cleanup job
         start_cleanup_job()
+        start_event_sync_job()
+        start_anomaly_job()
         
         logger.info("Bot v2.0 starting...")
         logger.info("Bot is ready to receive messages!")
         
         # Start polling
-        bot.infinity_polling(timeout=10, long_polling_timeout=5)
+        try:
+            bot.infinity_polling(timeout=10, long_polling_timeout=5)
+        finally:
+            graph_renderer.shutdown()
+            pattern_miner.flush()
         
     except Exception as e:
         error_message = mask_sensitive_data(str(e))
@@ -5,8 +5,12 @@ from .dashboard import DashboardCommand
 from .get_alerts import GetAlertsCommand
 from .get_hosts import GetHostsCommand
 from .get_graph import GetGraphCommand
+from .spark import SparkCommand
+from .heatmap import HeatmapCommand
+from .forecast import ForecastCommand
 from .ask_ai import AskAICommand
 from .analyze import AnalyzeCommand
+from .flapping import FlappingCommand
 from .add_website import AddWebsiteCommand
 
 __all__ = [
@@ -16,7 +20,11 @@ __all__ = [
     'GetAlertsCommand',
     'GetHostsCommand',
     'GetGraphCommand',
+    'SparkCommand',
+    'HeatmapCommand',
+    'ForecastCommand',
     'AskAICommand',
     'AnalyzeCommand',
+    'FlappingCommand',
     'AddWebsiteCommand'
 ]
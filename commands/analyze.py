@@ -1,154 +1,214 @@
+import asyncio
 import logging
 import time
 from telegram import Update
 from telegram.ext import ContextTypes
 from decorators import admin_only
+from config import Config
 from zabbix import get_zabbix_api
+from db import get_problem_summary, get_problem_events
+from event_sync import event_sync
+from trigger_graph import trigger_graph
+from incident_clustering import incident_clusterer, host_count_label
+from problem_batch import ProblemBatch
+from report_snapshots import ReportSnapshots
+from error_patterns import pattern_miner
+from anomaly_detector import anomaly_detector
 
 logger = logging.getLogger(__name__)
 
+# /analyze windows: N hours or N days
+WINDOW_UNITS = {'h': 3600, 'd': 86400}
+DEFAULT_WINDOW = '3d'
+MAX_WINDOW = 30 * 86400
+
 class AnalyzeCommand:
     @admin_only
     async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        args = list(context.args or [])
+        force = bool(args) and args[0].lower() == 'refresh'
+        if force:
+            args = args[1:]
+        window = self._parse_window(args[0] if args else DEFAULT_WINDOW)
+        if window is None:
+            await update.message.reply_text("Cú pháp: /analyze [refresh] [1h|24h|7d|30d] [host group]\nVí dụ: /analyze 7d Linux servers")
+            return
+        seconds, label = window
+        group = ' '.join(args[1:]) or None
+        key = (seconds, group)
+
         try:
-            await update.message.reply_text("Đang phân tích history problems trong 3 ngày qua...")
-            zapi = get_zabbix_api()
-            end_time = int(time.time())
-            start_time = end_time - 86400 * 3  # 3 days
-
-            problems = zapi.problem.get({
-                "output": ["objectid", "name", "clock", "severity", "acknowledged"],
-                "selectHosts": ["host"],
-                "time_from": start_time,
-                "time_till": end_time,
-                "sortfield": "clock",
-                "sortorder": "DESC"
-            })
-
-            if not problems:
-                await update.message.reply_text("Không có problems nào trong 3 ngày qua để phân tích.")
-                return
-
-            trigger_ids = [problem["objectid"] for problem in problems]
-            triggers = zapi.trigger.get({
-                "output": ["triggerid", "description", "priority", "dependencies"],
-                "triggerids": trigger_ids
-            })
-
-            trigger_map = {trigger["triggerid"]: trigger for trigger in triggers}
-
-            analysis_data = self._analyze_problems(problems, trigger_map)
-            
-            report = self._generate_report(analysis_data)
-            
+            snapshot = report_snapshots.get(key)
+            if snapshot is None or force:
+                scope = label + (f", nhóm {group}" if group else "")
+                await update.message.reply_text(f"Đang phân tích problems trong {scope}...")
+                snapshot = await asyncio.to_thread(report_snapshots.refresh, key)
+
+            report, generated_at = snapshot
+            age = max(0, int(time.time()) - generated_at)
+            refresh_args = ' '.join(['refresh'] + list(args))
+            report += (f"\n🕒 Cập nhật lúc {time.strftime('%H:%M %d/%m', time.localtime(generated_at))} "
+                       f"({age // 60} phút trước) - /analyze {refresh_args} để tính lại")
             await update.message.reply_text(report, parse_mode='Markdown')
             
         except Exception as e:
             logger.error(f"Error in analyze_and_predict: {str(e)}")
             await update.message.reply_text(f"Lỗi khi phân tích và dự đoán: {str(e)}")
 
-    def _analyze_problems(self, problems, trigger_map):
-        analysis = {
-            'total_problems': len(problems),
-            'host_problems': {},
-            'severity_distribution': {},
-            'problem_patterns': {},
-            'critical_hosts': set(),
-            'host_dependencies': {},
-            'problem_clusters': []
-        }
+    @staticmethod
+    def _window_label(seconds: int) -> str:
+        if seconds % 86400 == 0 and seconds > 86400:
+            return f"{seconds // 86400} ngày qua"
+        return f"{seconds // 3600} giờ qua"
 
-        for problem in problems:
-            trigger_id = problem["objectid"]
-            host = problem['hosts'][0]['host'] if problem['hosts'] else "Unknown"
-            severity = int(problem['severity'])
+    @classmethod
+    def _parse_window(cls, arg: str):
+        """'24h' / '7d' -> (seconds, label), None when invalid"""
+        arg = arg.strip().lower()
+        if len(arg) < 2 or arg[-1] not in WINDOW_UNITS or not arg[:-1].isdigit() or int(arg[:-1]) == 0:
+            return None
+        seconds = min(int(arg[:-1]) * WINDOW_UNITS[arg[-1]], MAX_WINDOW)
+        return seconds, cls._window_label(seconds)
 
-            if host not in analysis['host_problems']:
-                analysis['host_problems'][host] = {'count': 0, 'severities': []}
-            analysis['host_problems'][host]['count'] += 1
-            analysis['host_problems'][host]['severities'].append(severity)
+    def build_report(self, seconds: int, group: str = None) -> str:
+        """Collect, analyse and render the report of one window/group (blocking)"""
+        scope = self._window_label(seconds) + (f", nhóm {group}" if group else "")
+        end_time = int(time.time())
+        summary, problems, trigger_map, root_causes = self._collect(end_time - seconds, end_time, group)
+        if not summary:
+            return f"Không có problems nào trong {scope} để phân tích."
 
-            if severity not in analysis['severity_distribution']:
-                analysis['severity_distribution'][severity] = 0
-            analysis['severity_distribution'][severity] += 1
+        analysis_data = self._analyze_problems(summary, problems, trigger_map)
+        analysis_data['root_causes'] = root_causes
+        analysis_data['incidents'] = incident_clusterer.incidents(end_time - seconds, group)
+        analysis_data['scope'] = scope
+        window = pattern_miner.window_for(seconds)
+        analysis_data['error_templates'] = (self._window_label(window), pattern_miner.top(window, 3))
+        analysis_data['anomalies'] = anomaly_detector.anomalies(limit=5)
+        return self._generate_report(analysis_data)
 
-            if trigger_id in trigger_map:
-                description = trigger_map[trigger_id].get('description', problem['name'])
-                if description not in analysis['problem_patterns']:
-                    analysis['problem_patterns'][description] = {'count': 0, 'hosts': set()}
-                analysis['problem_patterns'][description]['count'] += 1
-                analysis['problem_patterns'][description]['hosts'].add(host)
+    def _collect(self, start_time, end_time, group):
+        """
+        Everything the report needs, from the local store.
+
+        Zabbix is only asked for events newer than the last sync and, once, for the part
+        of the window older than the local coverage; trigger dependencies come from the
+        cached dependency graph.
+        """
+        event_sync.sync()
+        event_sync.ensure_coverage(start_time)
+
+        summary = get_problem_summary(start_time, end_time, group)
+        problems = get_problem_events(start_time, end_time, group, limit=Config.ANALYZE_DETAIL_LIMIT)
+        trigger_ids = list({problem["objectid"] for problem in problems})
+        active_ids = list({problem["objectid"] for problem in problems if problem.get('active')})
+
+        trigger_map, root_causes = {}, []
+        try:
+            zapi = get_zabbix_api() if trigger_graph.stale(trigger_ids) else None
+            if zapi is not None:
+                trigger_graph.ensure(zapi, trigger_ids)
+            trigger_map = trigger_graph.trigger_map(trigger_ids)
+            root_causes = trigger_graph.rank_root_causes(active_ids)
+        except Exception as e:
+            logger.error(f"Error loading trigger dependencies: {str(e)}")
+        return summary, problems, trigger_map, root_causes
 
-            if severity >= 4:
-                analysis['critical_hosts'].add(host)
+    def _analyze_problems(self, summary, problems, trigger_map):
+        """
+        Aggregates from a columnar batch of the (host, severity, name, count) summary
+        rows; MTTR and dependencies from the individual problem events.
+        """
+        counts = ProblemBatch.from_summary(summary)
+        events = ProblemBatch.from_events(problems)
+        return {
+            'total_problems': counts.total(),
+            'host_count': counts.host_count(),
+            'severity_distribution': counts.severity_distribution(),
+            'top_hosts': counts.top_hosts(5),
+            'top_patterns': counts.top_patterns(3),
+            'critical_hosts': counts.critical_hosts(),
+            'mttr': events.mttr(),
+            'mttr_by_severity': events.mttr_by_severity(),
+            'host_dependencies': self._analyze_host_dependencies(problems, trigger_map)
+        }
 
-        analysis['host_dependencies'] = self._analyze_host_dependencies(problems, trigger_map)
-        analysis['problem_clusters'] = self._find_problem_clusters(problems)
+    @staticmethod
+    def _format_duration(seconds):
+        if seconds != seconds:  # nan: nothing resolved
+            return "n/a"
+        if seconds < 3600:
+            return f"{seconds / 60:.0f} phút"
+        return f"{seconds / 3600:.1f} giờ"
 
-        return analysis
+    @staticmethod
+    def _problem_records(problems):
+        """Compact (objectid, host) pairs, built once instead of re-reading problem dicts"""
+        return [(problem["objectid"], problem['hosts'][0]['host'] if problem['hosts'] else "Unknown")
+                for problem in problems]
 
     def _analyze_host_dependencies(self, problems, trigger_map):
+        """
+        Host dependency map from trigger dependencies between the problems.
+
+        An objectid -> host index (first problem per trigger) replaces the scan of all
+        problems for each dependency, so the cost is O(P + P·D) instead of O(P²·D).
+        """
+        records = self._problem_records(problems)
+        host_by_trigger = {}
+        for trigger_id, host in records:
+            host_by_trigger.setdefault(trigger_id, host)
+
         dependencies = {}
-        for problem in problems:
-            trigger_id = problem["objectid"]
-            host = problem['hosts'][0]['host'] if problem['hosts'] else "Unknown"
-            if trigger_id in trigger_map:
-                trigger_deps = trigger_map[trigger_id].get('dependencies', [])
-                if trigger_deps:
-                    if host not in dependencies:
-                        dependencies[host] = {'depends_on': set(), 'depended_by': set()}
-                    for dep_trigger_id in trigger_deps:
-                        for other_problem in problems:
-                            if other_problem["objectid"] == dep_trigger_id:
-                                dep_host = other_problem['hosts'][0]['host'] if other_problem['hosts'] else "Unknown"
-                                dependencies[host]['depends_on'].add(dep_host)
-                                if dep_host not in dependencies:
-                                    dependencies[dep_host] = {'depends_on': set(), 'depended_by': set()}
-                                dependencies[dep_host]['depended_by'].add(host)
-                                break
+        for trigger_id, host in records:
+            trigger = trigger_map.get(trigger_id)
+            if not trigger:
+                continue
+            trigger_deps = trigger.get('dependencies', [])
+            if not trigger_deps:
+                continue
+            if host not in dependencies:
+                dependencies[host] = {'depends_on': set(), 'depended_by': set()}
+            for dep in trigger_deps:
+                # selectDependencies returns {"triggerid": ...} objects
+                dep_trigger_id = dep['triggerid'] if isinstance(dep, dict) else dep
+                dep_host = host_by_trigger.get(dep_trigger_id)
+                if dep_host is None:
+                    continue
+                dependencies[host]['depends_on'].add(dep_host)
+                if dep_host not in dependencies:
+                    dependencies[dep_host] = {'depends_on': set(), 'depended_by': set()}
+                dependencies[dep_host]['depended_by'].add(host)
         return dependencies
 
-    def _find_problem_clusters(self, problems):
-        clusters = []
-        sorted_problems = sorted(problems, key=lambda x: int(x['clock']))
-        time_window = 300  # 5 minutes
-        current_cluster = []
-        for problem in sorted_problems:
-            if not current_cluster or int(problem['clock']) - int(current_cluster[-1]['clock']) <= time_window:
-                current_cluster.append(problem)
-            else:
-                if len(current_cluster) > 1:
-                    clusters.append(current_cluster)
-                current_cluster = [problem]
-        if len(current_cluster) > 1:
-            clusters.append(current_cluster)
-        return clusters
-
     def _generate_report(self, analysis):
-        report = "🔍 **BÁO CÁO PHÂN TÍCH PROBLEMS (3 NGÀY QUA)**\n\n"
+        report = f"🔍 **BÁO CÁO PHÂN TÍCH PROBLEMS ({analysis.get('scope', '3 ngày qua').upper()})**\n\n"
         report += f"📊 **Tổng quan:**\n"
         report += f"- Tổng số problems: {analysis['total_problems']}\n"
-        report += f"- Số host bị ảnh hưởng: {len(analysis['host_problems'])}\n"
-        report += f"- Hosts critical (severity >= 4): {len(analysis['critical_hosts'])}\n\n"
+        report += f"- Số host bị ảnh hưởng: {analysis['host_count']}\n"
+        report += f"- Hosts critical (severity >= 4): {len(analysis['critical_hosts'])}\n"
+        report += f"- MTTR (thời gian khắc phục trung bình): {self._format_duration(analysis['mttr'])}\n\n"
         
         severity_names = {0: 'Not classified', 1: 'Information', 2: 'Warning', 3: 'Average', 4: 'High', 5: 'Disaster'}
         report += "🚨 **Phân bố mức độ nghiêm trọng:**\n"
         for severity, count in sorted(analysis['severity_distribution'].items()):
-            report += f"- {severity_names.get(severity, f'Level {severity}')}: {count} problems\n"
+            report += f"- {severity_names.get(severity, f'Level {severity}')}: {count} problems"
+            if severity in analysis['mttr_by_severity']:
+                report += f" (MTTR {self._format_duration(analysis['mttr_by_severity'][severity])})"
+            report += "\n"
         report += "\n"
         
         report += "🖥️ **Hosts có nhiều problems nhất:**\n"
-        for host, data in sorted(analysis['host_problems'].items(), key=lambda x: x[1]['count'], reverse=True)[:5]:
-            avg_severity = sum(data['severities']) / len(data['severities'])
-            report += f"- {host}: {data['count']} problems (avg severity: {avg_severity:.1f})\n"
+        for host, count, avg_severity in analysis['top_hosts']:
+            report += f"- {host}: {count} problems (avg severity: {avg_severity:.1f})\n"
         report += "\n"
         
         report += "📋 **Patterns phổ biến:**\n"
-        for pattern, data in sorted(analysis['problem_patterns'].items(), key=lambda x: x[1]['count'], reverse=True)[:3]:
-            hosts_list = ', '.join(list(data['hosts'])[:3])
-            if len(data['hosts']) > 3:
-                hosts_list += f" và {len(data['hosts']) - 3} hosts khác"
-            report += f"- {pattern}: {data['count']} lần (hosts: {hosts_list})\n"
+        for pattern, count, host_count, sample in analysis['top_patterns']:
+            hosts_list = ', '.join(sample)
+            if host_count > len(sample):
+                hosts_list += f" và {host_count - len(sample)} hosts khác"
+            report += f"- {pattern}: {count} lần (hosts: {hosts_list})\n"
         report += "\n"
         
         if analysis['critical_hosts']:
@@ -164,23 +224,41 @@ class AnalyzeCommand:
                     report += f"- {host} ảnh hưởng đến: {', '.join(deps['depended_by'])}\n"
             report += "\n"
         
-        if analysis['problem_clusters']:
-            report += "⚡ **Clusters problems (xảy ra cùng lúc):**\n"
-            for i, cluster in enumerate(analysis['problem_clusters'][:3], 1):
-                hosts_in_cluster = {p['hosts'][0]['host'] for p in cluster if p['hosts']}
-                report += f"- Cluster {i}: {len(cluster)} problems trên {len(hosts_in_cluster)} hosts ({', '.join(hosts_in_cluster)})\n"
+        if analysis.get('root_causes'):
+            report += "🎯 **Nguyên nhân gốc có khả năng:**\n"
+            for cause in analysis['root_causes']:
+                report += (f"- {cause['host']}: {cause['description']} → ảnh hưởng {cause['active_downstream']} problems "
+                           f"trên {cause['affected_hosts']} hosts\n")
+            report += "\n"
+        
+        if analysis.get('incidents'):
+            report += "⚡ **Incidents (problems xảy ra cùng lúc):**\n"
+            for incident in analysis['incidents'][:3]:
+                started = time.strftime('%H:%M %d/%m', time.localtime(incident['started']))
+                state = "đang diễn ra" if incident['live'] else "đã đóng"
+                report += (f"- #{incident['id']} ({state}, từ {started}): {incident['events']} problems trên "
+                           f"{host_count_label(incident)} hosts ({', '.join(incident['hosts'][:3])})\n")
+            report += "\n"
+        
+        window_label, templates = analysis.get('error_templates') or ('', [])
+        if templates:
+            report += f"🧩 **Mẫu lỗi thường gặp ({window_label}):**\n"
+            for template, count in templates:
+                report += f"- {template}: {count} lần\n"
             report += "\n"
         
         report += "🔮 **DỰ ĐOÁN VÀ KHUYẾN NGHỊ:**\n"
-        sorted_patterns = sorted(analysis['problem_patterns'].items(), key=lambda x: x[1]['count'], reverse=True)
-        if sorted_patterns:
-            report += f"- Pattern '{sorted_patterns[0][0]}' có khả năng cao sẽ xảy ra lại\n"
+        for anomaly in analysis.get('anomalies', []):
+            report += (f"- {anomaly['host']}: {anomaly['name']} = {anomaly['value']:.2f} lệch khỏi mức thường "
+                       f"{anomaly['expected']:.2f} (z={anomaly['score']:+.1f}), có thể sắp phát sinh problem\n")
+        if analysis['top_patterns']:
+            report += f"- Pattern '{analysis['top_patterns'][0][0]}' có khả năng cao sẽ xảy ra lại\n"
         
-        sorted_hosts = sorted(analysis['host_problems'].items(), key=lambda x: x[1]['count'], reverse=True)
-        if sorted_hosts:
-            report += f"- Host '{sorted_hosts[0][0]}' có nguy cơ cao gặp vấn đề tiếp theo\n"
+        if analysis['top_hosts']:
+            report += f"- Host '{analysis['top_hosts'][0][0]}' có nguy cơ cao gặp vấn đề tiếp theo\n"
         
-        critical_dependencies = [(h, d['depended_by']) for h, d in analysis['host_dependencies'].items() if d['depended_by'] and h in analysis['critical_hosts']]
+        critical = set(analysis['critical_hosts'])
+        critical_dependencies = [(h, d['depended_by']) for h, d in analysis['host_dependencies'].items() if d['depended_by'] and h in critical]
         if critical_dependencies:
             report += "- Các host critical có thể ảnh hưởng đến nhiều host khác:\n"
             for host, affected in critical_dependencies[:3]:
@@ -189,9 +267,14 @@ class AnalyzeCommand:
         report += "\n💡 **KHUYẾN NGHỊ:**\n"
         if analysis['critical_hosts']:
             report += "- Ưu tiên kiểm tra và khắc phục các hosts critical\n"
-        if analysis['problem_clusters']:
+        if analysis.get('incidents'):
             report += "- Có thể có vấn đề chung gây ra nhiều problems cùng lúc\n"
         if analysis['host_dependencies']:
             report += "- Kiểm tra mối quan hệ phụ thuộc giữa các hosts\n"
         
         return report
+
+
+# Background-refreshed /analyze reports; the default window is always kept warm
+report_snapshots = ReportSnapshots(AnalyzeCommand().build_report,
+                                   pinned=[(AnalyzeCommand._parse_window(DEFAULT_WINDOW)[0], None)])
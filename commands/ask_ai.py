@@ -1,12 +1,12 @@
-import os
+import asyncio
 import logging
 import time
-import requests
 from telegram import Update
 from telegram.ext import ContextTypes
 from decorators import admin_only
 from zabbix import get_zabbix_api
-from config import Config
+from anomaly_detector import anomaly_detector
+from ai_client import ai_client, AIError
 
 logger = logging.getLogger(__name__)
 
@@ -17,61 +17,57 @@ class AskAICommand:
             await update.message.reply_text("Vui lòng nhập câu hỏi về dữ liệu Zabbix.")
             return
 
+        if not ai_client.configured:
+            await update.message.reply_text("Chưa cấu hình Open WebUI API.")
+            return
+
         try:
-            zapi = get_zabbix_api()
             end_time = int(time.time())
             start_time = end_time - 86400 * 7  # 7 days
+            alerts, hosts = await asyncio.to_thread(self._collect, start_time, end_time)
 
-            alerts = zapi.trigger.get({
-                "output": ["description", "lastchange", "priority"],
-                "sortfield": "lastchange",
-                "sortorder": "DESC",
-                "time_from": start_time,
-                "time_till": end_time
-            })
-
-            hosts = zapi.host.get({
-                "output": ["host", "status"],
-                "selectInterfaces": ["ip"]
-            })
+            anomalies = anomaly_detector.anomalies(limit=10)
+            anomaly_lines = '\n'.join(
+                f"  + {a['host']} - {a['name']}: {a['value']:.2f} (mức thường {a['expected']:.2f}, z={a['score']:+.1f})"
+                for a in anomalies
+            ) or "  + Không có"
 
             prompt = f"""Dữ liệu Zabbix trong 7 ngày qua:
 - Số lượng cảnh báo: {len(alerts)}
 - Số lượng host: {len(hosts)}
 - Thời gian: từ {time.strftime('%Y-%m-%d', time.localtime(start_time))} đến {time.strftime('%Y-%m-%d', time.localtime(end_time))}
+- Giá trị bất thường đang phát hiện (chưa chắc đã có trigger):
+{anomaly_lines}
 
 Câu hỏi: {' '.join(context.args)}
 
 Hãy phân tích dữ liệu và trả lời câu hỏi trên."""
 
-            api_url = Config.OPENWEBUI_API_URL
-            api_key = Config.OPENWEBUI_API_KEY
+            await update.message.reply_text("Đang phân tích dữ liệu Zabbix...")
 
-            if not api_url or not api_key:
-                await update.message.reply_text("Chưa cấu hình Open WebUI API.")
+            try:
+                ai_reply = await ai_client.chat([{"role": "user", "content": prompt}])
+            except AIError as e:
+                await update.message.reply_text(f"Lỗi từ AI: {e}")
                 return
-
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            data = {
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ]
-            }
-
-            await update.message.reply_text("Đang phân tích dữ liệu Zabbix...")
-            
-            response = requests.post(api_url, headers=headers, json=data, timeout=60)
-            if response.status_code == 200:
-                result = response.json()
-                ai_reply = result.get('choices', [{}])[0].get('message', {}).get('content', 'Không nhận được phản hồi từ AI.')
-                await update.message.reply_text(ai_reply)
-            else:
-                await update.message.reply_text(f"Lỗi từ AI: {response.text}")
+            await update.message.reply_text(ai_reply)
 
         except Exception as e:
             logger.error(f"Lỗi khi phân tích dữ liệu: {str(e)}")
             await update.message.reply_text(f"Lỗi khi phân tích dữ liệu: {str(e)}")
+
+    def _collect(self, start_time, end_time):
+        """Alerts and hosts for the prompt (blocking Zabbix calls, run in a worker thread)"""
+        zapi = get_zabbix_api()
+        alerts = zapi.trigger.get({
+            "output": ["description", "lastchange", "priority"],
+            "sortfield": "lastchange",
+            "sortorder": "DESC",
+            "time_from": start_time,
+            "time_till": end_time
+        })
+        hosts = zapi.host.get({
+            "output": ["host", "status"],
+            "selectInterfaces": ["ip"]
+        })
+        return alerts, hosts
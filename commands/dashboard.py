@@ -1,56 +1,73 @@
-import os
 import logging
-import time
 import io
-from telegram import Update
+from telegram import Update, InputMediaPhoto
 from telegram.ext import ContextTypes
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from config import Config
 from decorators import admin_only
+from screenshot import take_dashboard_screenshot, take_dashboard_screenshots
+from screenshot_queue import ScreenshotQueueFull
 
 logger = logging.getLogger(__name__)
 
+# Telegram accepts at most 10 photos per media group
+MAX_TARGETS = 10
+
 class DashboardCommand:
     @admin_only
     async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            targets = self._parse_targets(context.args or [])
+        except ValueError as e:
+            await update.message.reply_text(
+                f"{str(e)}\nVí dụ: /dashboard 10, /dashboard 10 CPU, /dashboard 10,12 hoặc /dashboard 10 CPU,Memory"
+            )
+            return
+
         try:
             await update.message.reply_text("Đang chụp ảnh dashboard Zabbix...")
-            
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument(f"--window-size={Config.SCREENSHOT_WIDTH},{Config.SCREENSHOT_HEIGHT}")
-
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-            
-            try:
-                zabbix_url = Config.ZABBIX_URL
-                driver.get(zabbix_url)
-                
-                time.sleep(2)
-                
-                username_field = driver.find_element("name", "name")
-                password_field = driver.find_element("name", "password")
-                
-                username_field.send_keys(Config.ZABBIX_USER)
-                password_field.send_keys(Config.ZABBIX_PASSWORD)
-                
-                login_button = driver.find_element("xpath", "//button[@type='submit']")
-                login_button.click()
-                
-                time.sleep(5)
-                
-                screenshot = driver.get_screenshot_as_png()
-                
+
+            if not targets:
+                screenshot = await take_dashboard_screenshot()
                 await update.message.reply_photo(photo=io.BytesIO(screenshot))
-                
-            finally:
-                driver.quit()
-                
+                return
+
+            images = await take_dashboard_screenshots(targets)
+            if len(images) == 1:
+                caption, screenshot = images[0]
+                await update.message.reply_photo(photo=io.BytesIO(screenshot), caption=caption)
+            else:
+                await update.message.reply_media_group(
+                    media=[InputMediaPhoto(media=screenshot, caption=caption) for caption, screenshot in images]
+                )
+
+        except ScreenshotQueueFull:
+            await update.message.reply_text("Hệ thống chụp ảnh đang quá tải, vui lòng thử lại sau.")
         except Exception as e:
             logger.error(f"Lỗi khi chụp ảnh dashboard: {str(e)}")
             await update.message.reply_text(f"Lỗi khi chụp ảnh dashboard: {str(e)}")
+
+    def _parse_targets(self, args):
+        """
+        Parse `/dashboard [id[,id...]] [widget[,widget...]]` into (dashboardid, widget) pairs.
+
+        Several IDs capture several dashboards; several widgets (names may contain spaces)
+        capture those widgets of a single dashboard.
+        """
+        if not args:
+            return []
+
+        dashboard_ids = [part.strip() for part in args[0].split(',') if part.strip()]
+        if not dashboard_ids or not all(part.isdigit() for part in dashboard_ids):
+            raise ValueError("Dashboard ID phải là số.")
+
+        widgets = [name.strip() for name in ' '.join(args[1:]).split(',') if name.strip()]
+        if widgets and len(dashboard_ids) > 1:
+            raise ValueError("Chỉ chọn widget khi chụp một dashboard.")
+
+        if widgets:
+            targets = [(dashboard_ids[0], widget) for widget in widgets]
+        else:
+            targets = [(dashboardid, None) for dashboardid in dict.fromkeys(dashboard_ids)]
+
+        if len(targets) > MAX_TARGETS:
+            raise ValueError(f"Tối đa {MAX_TARGETS} dashboard/widget mỗi lần.")
+        return targets
@@ -0,0 +1,46 @@
+import logging
+import time
+from telegram import Update
+from telegram.ext import ContextTypes
+from decorators import admin_only
+from config import Config
+from flapping import flap_detector
+
+logger = logging.getLogger(__name__)
+
+MAX_RESULTS = 10
+
+class FlappingCommand:
+    @admin_only
+    async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            await update.message.reply_text(self.build_report(flap_detector.top(MAX_RESULTS)))
+        except Exception as e:
+            logger.error(f"Error listing flapping triggers: {str(e)}")
+            await update.message.reply_text(f"Lỗi khi lấy danh sách trigger flapping: {str(e)}")
+
+    @staticmethod
+    def build_report(entries) -> str:
+        """Text of /flapping for both bots"""
+        minutes = Config.FLAP_WINDOW // 60
+        if not entries:
+            return f"✅ Không có trigger nào đổi trạng thái liên tục trong {minutes} phút qua."
+
+        text = f"🔁 Trigger flapping ({minutes} phút qua, ngưỡng {Config.FLAP_THRESHOLD:g} lần đổi trạng thái)\n\n"
+        for entry in entries:
+            marker = "🔴" if entry['flapping'] else "🟡"
+            text += (f"{marker} {entry['host']} - {entry['name']}\n"
+                     f"   Điểm {entry['score']:.1f}, {entry['transitions']} lần đổi trạng thái gần đây, "
+                     f"lần cuối {time.strftime('%H:%M %d/%m', time.localtime(entry['last_change']))}")
+            if entry['suppressed']:
+                text += f", đã gộp {entry['suppressed']} thông báo"
+            text += "\n"
+        return text
+
+    @staticmethod
+    def summary_line(alerts) -> str:
+        """One message for the suppressed alerts of flapping triggers: (host, description) pairs"""
+        text = f"🔁 Gộp {len(alerts)} cảnh báo của trigger đang flapping (xem /flapping):\n"
+        for host, description in alerts:
+            text += f"• {host} - {description}\n"
+        return text
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import math
+from telegram import Update
+from telegram.ext import ContextTypes
+from decorators import admin_only
+from config import Config
+from zabbix import get_zabbix_api
+from graph_data import find_hosts
+from graph_cache import item_lookup_cache, estimate_size
+from forecast import forecaster
+
+logger = logging.getLogger(__name__)
+
+MAX_RESULTS = 10
+
+class ForecastCommand:
+    @admin_only
+    async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        target = ' '.join(context.args) if context.args else None
+        scope = target or "tất cả hosts"
+
+        try:
+            await update.message.reply_text(f"Đang dự báo dung lượng cho {scope}...")
+            forecasts = await asyncio.to_thread(self._forecast, target)
+            if forecasts is None:
+                await update.message.reply_text(f"Không tìm thấy host hoặc host group '{target}'.")
+                return
+            if not forecasts:
+                await update.message.reply_text(f"Không có dữ liệu trend disk/memory/filesystem cho {scope}.")
+                return
+
+            await update.message.reply_text(self._format(scope, forecasts))
+
+        except Exception as e:
+            logger.error(f"Error forecasting: {str(e)}")
+            await update.message.reply_text(f"Lỗi khi dự báo: {str(e)}")
+
+    def _items(self, zapi, target):
+        """Capacity items of a host, a host group or all configured groups; None if target is unknown"""
+        params = {
+            "output": ["itemid", "name", "key_"],
+            "selectHosts": ["host"],
+            "filter": {"value_type": [0, 3]},
+            "search": {"key_": Config.FORECAST_ITEM_KEYS},
+            "searchByAny": True,
+            "searchWildcardsEnabled": True,
+            "monitored": True
+        }
+        if target:
+            hosts = find_hosts(zapi, [target])
+            if hosts:
+                params["hostids"] = list(hosts)
+            else:
+                groups = zapi.hostgroup.get({"output": ["groupid"], "filter": {"name": [target]}})
+                if not groups:
+                    return None
+                params["groupids"] = [group['groupid'] for group in groups]
+        elif Config.HOST_GROUPS:
+            groups = zapi.hostgroup.get({"output": ["groupid"], "filter": {"name": Config.HOST_GROUPS}})
+            params["groupids"] = [group['groupid'] for group in groups or []]
+
+        items = zapi.item.get(params) or []
+        for item in items:
+            item['host'] = item['hosts'][0]['host'] if item.get('hosts') else "Unknown"
+        return items
+
+    def _forecast(self, target):
+        lookup_key = ('forecast', target)
+        items = item_lookup_cache.get(lookup_key)
+        zapi = None
+        if items is None:
+            zapi = get_zabbix_api()
+            items = self._items(zapi, target)
+            if items is None:
+                return None
+            item_lookup_cache.put(lookup_key, items, size=estimate_size(items))
+        return forecaster.forecast(zapi, items, limit=MAX_RESULTS)
+
+    @staticmethod
+    def _format_eta(seconds):
+        if math.isinf(seconds):
+            return "không đầy"
+        if seconds < 86400:
+            return f"~{seconds / 3600:.0f} giờ"
+        return f"~{seconds / 86400:.1f} ngày"
+
+    def _format(self, scope, forecasts):
+        text = f"📉 Dự báo dung lượng ({scope}, {Config.FORECAST_WINDOW // 86400} ngày trend)\n\n"
+        for forecast in forecasts:
+            text += (f"• {forecast['host']} - {forecast['name']}: {forecast['last']:.1f}%, "
+                     f"{forecast['slope_per_day']:+.2f}%/ngày, đầy sau {self._format_eta(forecast['eta'])}")
+            if math.isinf(forecast['eta']) != math.isinf(forecast['linear_eta']):
+                text += f" (tuyến tính: {self._format_eta(forecast['linear_eta'])})"
+            text += "\n"
+        return text
@@ -8,9 +8,13 @@ from zabbix import get_zabbix_api
 from db import save_alert
 from utils import extract_url_from_text
 from screenshot import take_screenshot
+from flapping import flap_detector
+from commands.flapping import FlappingCommand
 
 logger = logging.getLogger(__name__)
 
+MAX_ALERTS = 10
+
 class GetAlertsCommand:
     @admin_only
     async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -21,13 +25,18 @@ class GetAlertsCommand:
                 "selectHosts": ["host"],
                 "sortfield": "lastchange",
                 "sortorder": "DESC",
-                "limit": 10
+                # Flapping triggers are folded into one message, fetch enough others to fill the list
+                "limit": MAX_ALERTS + flap_detector.flapping_count()
             })
 
             if not alerts:
                 await update.message.reply_text("Không có cảnh báo nào.")
                 return
 
+            flapping = flap_detector.suppress(alert['triggerid'] for alert in alerts)
+            folded = [alert for alert in alerts if alert['triggerid'] in flapping]
+            alerts = [alert for alert in alerts if alert['triggerid'] not in flapping][:MAX_ALERTS]
+
             for alert in alerts:
                 host = alert['hosts'][0]['host'] if alert['hosts'] else "Unknown"
                 alert_info = {
@@ -48,6 +57,10 @@ class GetAlertsCommand:
                 
                 await self.send_alert_with_screenshot(update.effective_chat.id, alert_info, context)
 
+            if folded:
+                await update.message.reply_text(FlappingCommand.summary_line(
+                    [(alert['hosts'][0]['host'] if alert['hosts'] else "Unknown", alert['description']) for alert in folded]))
+
         except Exception as e:
             logger.error(f"Error getting alerts: {str(e)}")
             await update.message.reply_text(f"Lỗi khi lấy cảnh báo: {str(e)}")
@@ -1,89 +1,69 @@
 import logging
-import time
 import io
-import datetime
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from telegram import Update
 from telegram.ext import ContextTypes
 from decorators import admin_only
 from zabbix import get_zabbix_api
+from graph_data import find_hosts, find_items
+from graph_cache import item_lookup_cache, estimate_size
+from graph_engine import render_graph
 
 logger = logging.getLogger(__name__)
 
+# Most series drawn on one chart
+MAX_SERIES = 10
+
 class GetGraphCommand:
     @admin_only
     async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if len(context.args) < 2:
-            await update.message.reply_text("Vui lòng cung cấp host và item key.\nVí dụ: /getgraph host1 system.cpu.util")
+            await update.message.reply_text(
+                "Vui lòng cung cấp host và item key.\n"
+                "Ví dụ: /getgraph host1 system.cpu.util\n"
+                "Nhiều host/item: /getgraph host1,host2 system.cpu.util,vm.memory.* 7200"
+            )
             return
 
-        host = context.args[0]
-        item_key = context.args[1]
+        hosts = self._split(context.args[0])
+        patterns = self._split(context.args[1])
         period = int(context.args[2]) if len(context.args) > 2 else 3600  # Default 1 hour
 
         try:
-            zapi = get_zabbix_api()
-
-            hosts = zapi.host.get({
-                "filter": {"host": host},
-                "output": ["hostid"]
-            })
-            
-            if not hosts:
-                await update.message.reply_text(f"Host {host} không tìm thấy.")
-                return
-
-            hostid = hosts[0]["hostid"]
-
-            items = zapi.item.get({
-                "hostids": hostid,
-                "search": {"key_": item_key},
-                "output": ["itemid", "name"]
-            })
-
-            if not items:
-                await update.message.reply_text(f"Item với key {item_key} không tìm thấy.")
-                return
-
-            itemid = items[0]["itemid"]
-            item_name = items[0]["name"]
-
-            time_till = int(time.time())
-            time_from = time_till - period
-
-            history = zapi.history.get({
-                "itemids": itemid,
-                "time_from": time_from,
-                "time_till": time_till,
-                "output": "extend",
-                "sortfield": "clock",
-                "sortorder": "ASC"
-            })
-
-            if not history:
+            zapi = None
+            lookup_key = (tuple(hosts), tuple(patterns))
+            items = item_lookup_cache.get(lookup_key)
+
+            if items is None:
+                zapi = get_zabbix_api()
+                found_hosts = find_hosts(zapi, hosts)
+                if not found_hosts:
+                    await update.message.reply_text(f"Host {', '.join(hosts)} không tìm thấy.")
+                    return
+
+                items = find_items(zapi, found_hosts, patterns, limit=MAX_SERIES)
+                if not items:
+                    await update.message.reply_text(f"Item với key {', '.join(patterns)} không tìm thấy.")
+                    return
+
+                item_lookup_cache.put(lookup_key, items, size=estimate_size(items))
+
+            if len(items) == 1:
+                title = f"{items[0]['name']} - {items[0]['host']}"
+            else:
+                title = f"{', '.join(patterns)} - {', '.join(hosts)}"
+
+            # Cached images return before any Zabbix call
+            png = await render_graph(items, period, title, zapi=zapi)
+            if png is None:
                 await update.message.reply_text("Không có dữ liệu lịch sử.")
                 return
 
-            plt.figure(figsize=(10, 6))
-            times = [datetime.datetime.fromtimestamp(int(h["clock"])) for h in history]
-            values = [float(h["value"]) for h in history]
+            await update.message.reply_photo(photo=io.BytesIO(png))
 
-            plt.plot(times, values)
-            plt.title(f"{item_name} - {host}")
-            plt.xlabel("Thời gian")
-            plt.ylabel("Giá trị")
-            plt.grid(True)
-            plt.gcf().autofmt_xdate()
-            plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight')
-            buf.seek(0)
-            plt.close()
-
-            await update.message.reply_photo(photo=buf)
-            
         except Exception as e:
             logger.error(f"Error creating graph: {str(e)}")
             await update.message.reply_text(f"Lỗi khi tạo biểu đồ: {str(e)}")
+
+    @staticmethod
+    def _split(arg: str):
+        return [part.strip() for part in arg.split(',') if part.strip()]
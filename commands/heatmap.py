@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+import io
+from telegram import Update
+from telegram.ext import ContextTypes
+from decorators import admin_only
+from config import Config
+from db import get_problem_occurrences
+from event_sync import event_sync
+from heatmap import build_heatmap, page_rows
+from graph_renderer import graph_renderer, render_heatmap
+from graph_cache import graph_cache, bucket_end, graph_key
+
+logger = logging.getLogger(__name__)
+
+MAX_DAYS = 30
+
+class HeatmapCommand:
+    @admin_only
+    async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        try:
+            days = int(context.args[0]) if context.args else 7
+            page = int(context.args[1]) if len(context.args) > 1 else 1
+        except ValueError:
+            await update.message.reply_text("Cú pháp: /heatmap [số ngày] [trang]\nVí dụ: /heatmap 7 2")
+            return
+        days = min(max(days, 1), MAX_DAYS)
+
+        try:
+            time_till = bucket_end(int(time.time()))
+            time_from = time_till - days * 86400
+
+            names, matrix, bin_seconds = await asyncio.to_thread(self._load, time_from, time_till)
+            if names.size == 0:
+                await update.message.reply_text(f"Không có problem nào trong kho sự kiện cục bộ trong {days} ngày qua.")
+                return
+
+            names, matrix, page, pages = page_rows(names, matrix, page, Config.HEATMAP_PAGE_ROWS)
+            caption = (f"🔥 Problems theo host/giờ - {days} ngày, {bin_seconds // 3600}h/cột\n"
+                       f"Trang {page}/{pages}")
+            if page < pages:
+                caption += f" - /heatmap {days} {page + 1} để xem tiếp"
+
+            key = graph_key(f"heatmap:{days}", days * 86400, time_till, f"heatmap:{page}")
+            png = graph_cache.get(key)
+            if png is None:
+                png = await graph_renderer.render(
+                    render_heatmap,
+                    matrix,
+                    [str(name) for name in names],
+                    time_from,
+                    bin_seconds,
+                    f"Problems / host ({days} ngày)"
+                )
+                graph_cache.put(key, png)
+
+            await update.message.reply_photo(photo=io.BytesIO(png), caption=caption)
+
+        except Exception as e:
+            logger.error(f"Error creating heatmap: {str(e)}")
+            await update.message.reply_text(f"Lỗi khi tạo heatmap: {str(e)}")
+
+    def _load(self, time_from, time_till):
+        """Read the synced problem events and bin them into a ranked host x time matrix"""
+        event_sync.sync()
+        event_sync.ensure_coverage(time_from)
+        occurrences = get_problem_occurrences(time_from, time_till)
+        return build_heatmap(occurrences, time_from, time_till, Config.HEATMAP_MAX_COLUMNS)
@@ -26,6 +26,7 @@ Bot này giúp bạn giám sát và quản lý hệ thống Zabbix thông qua Te
 **/start** - Hiển thị menu chính và danh sách lệnh
 **/help** - Hiển thị hướng dẫn chi tiết này
 **/dashboard** - Chụp ảnh dashboard Zabbix hiện tại
+**/dashboard <id>[,id...] [widget,...]** - Chụp dashboard theo ID hoặc từng widget
 
 """
             
@@ -37,6 +38,9 @@ Bot này giúp bạn giám sát và quản lý hệ thống Zabbix thông qua Te
 • `/getalerts` - Xem 10 problems mới nhất được lọc theo host groups
 • `/gethosts` - Liệt kê tất cả host đang giám sát và trạng thái
 • `/getgraph <host/IP>` - Tạo biểu đồ hiệu suất cho host cụ thể
+• `/spark <host> <key> [giây]` - Xem nhanh xu hướng dạng sparkline (min/avg/max/last), không cần vẽ ảnh
+• `/heatmap [ngày] [trang]` - Bản đồ nhiệt số problems theo host và giờ (host nhiều problems nhất trước)
+• `/forecast [host|group]` - Dự báo khi nào disk, filesystem, memory đầy (xếp theo thời gian còn lại)
 
 **🤖 Phân tích AI:**
 • `/ask <host/IP>` - Phân tích thông tin hệ thống với AI
@@ -44,7 +48,8 @@ Bot này giúp bạn giám sát và quản lý hệ thống Zabbix thông qua Te
   - Đưa ra đánh giá và khuyến nghị tối ưu hóa
   - Dự đoán xu hướng sử dụng tài nguyên
 
-• `/analyze` - Phân tích problems và dự đoán vấn đề
+• `/analyze [refresh] [1h|24h|7d|30d] [group]` - Phân tích problems và dự đoán vấn đề
+• `/flapping` - Trigger đổi trạng thái liên tục (thông báo của chúng được gộp trong /getalerts)
   - Phân tích problems trong 3 ngày qua
   - Xác định hosts có vấn đề nghiêm trọng
   - Tìm mối quan hệ phụ thuộc giữa hosts
@@ -67,11 +72,23 @@ Bot này giúp bạn giám sát và quản lý hệ thống Zabbix thông qua Te
 ```
 /getgraph server01
 /getgraph 192.168.1.100
+/getgraph web01,web02 system.cpu.util 7200
+/getgraph db01 vfs.fs.size[/,pused],vm.memory.*
 ```
+- Nhiều host/item (phân cách bằng dấu phẩy, `*` là ký tự đại diện) được vẽ chồng trên một biểu đồ
 - Bot sẽ hiển thị danh sách items phổ biến (CPU, Memory, Disk, Network)
 - Sử dụng inline keyboard để chọn nhanh
 - Biểu đồ hiển thị thống kê: hiện tại, trung bình, max, min
 
+**🖼️ Lệnh /dashboard:**
+```
+/dashboard 10
+/dashboard 10 CPU,Memory
+/dashboard 10,12,15
+```
+- Mở trực tiếp dashboard theo ID, chụp riêng widget theo tên
+- Nhiều dashboard/widget được chụp song song và gửi thành một album
+
 **🤖 Lệnh /ask:**
 ```
 /ask server01
@@ -83,9 +100,10 @@ Bot này giúp bạn giám sát và quản lý hệ thống Zabbix thông qua Te
 
 **📈 Lệnh /analyze:**
 ```
-/analyze
+/analyze [refresh] [1h|24h|7d|30d] [group]
 ```
-- Phân tích toàn bộ problems trong 3 ngày
+- Phân tích problems trong khoảng thời gian chọn (mặc định 3 ngày), có thể lọc theo host group
+- Báo cáo được tính sẵn định kỳ và trả về ngay; `refresh` để tính lại
 - Tìm patterns và mối quan hệ
 - Dự đoán vấn đề tương lai
 
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import numpy as np
+from telegram import Update
+from telegram.ext import ContextTypes
+from decorators import admin_only
+from zabbix import get_zabbix_api
+from graph_data import fetch_items_series, find_hosts, find_items
+from graph_cache import item_lookup_cache, estimate_size
+from graph_engine import graph_window
+from timeseries import sparkline
+
+logger = logging.getLogger(__name__)
+
+# Characters in one sparkline, fits a phone screen
+SPARK_BUCKETS = 40
+
+USAGE = "Vui lòng cung cấp host và item key.\nVí dụ: /spark host1 system.cpu.util 3600"
+
+class SparkCommand:
+    @admin_only
+    async def execute(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if len(context.args) < 2:
+            await update.message.reply_text(USAGE)
+            return
+
+        host = context.args[0]
+        item_key = context.args[1]
+        try:
+            period = int(context.args[2]) if len(context.args) > 2 else 3600  # Default 1 hour
+        except ValueError:
+            period = 0
+        if period <= 0:
+            await update.message.reply_text(f"Khoảng thời gian phải là số giây dương.\n{USAGE}")
+            return
+
+        try:
+            # Same lookup cache as /getgraph, so a host/key graphed before needs no item.get
+            lookup_key = ((host,), (item_key,))
+            items = item_lookup_cache.get(lookup_key)
+            zapi = None
+
+            if items is None:
+                zapi = get_zabbix_api()
+                hosts = find_hosts(zapi, [host])
+                if not hosts:
+                    await update.message.reply_text(f"Host {host} không tìm thấy.")
+                    return
+
+                items = find_items(zapi, hosts, [item_key], limit=1)
+                if not items:
+                    await update.message.reply_text(f"Item với key {item_key} không tìm thấy.")
+                    return
+
+                item_lookup_cache.put(lookup_key, items, size=estimate_size(items))
+
+            item = items[0]
+            time_from, time_till = graph_window(period)
+            # History comes from the local history cache; no chart is rendered
+            series = await asyncio.to_thread(
+                lambda: fetch_items_series(zapi or get_zabbix_api(), [item], time_from, time_till)[str(item['itemid'])]
+            )
+
+            values = series["value"][~np.isnan(series["value"])]
+            if values.size == 0:
+                await update.message.reply_text("Không có dữ liệu lịch sử.")
+                return
+
+            low = series["min"] if series.get("min") is not None else values
+            high = series["max"] if series.get("max") is not None else values
+            message = (
+                f"📈 {item['name']} - {item['host']} ({self._format_period(period)})\n"
+                f"{sparkline(values, SPARK_BUCKETS)}\n"
+                f"min {np.nanmin(low):.2f} | avg {values.mean():.2f} | "
+                f"max {np.nanmax(high):.2f} | last {values[-1]:.2f}"
+            )
+            await update.message.reply_text(message)
+
+        except Exception as e:
+            logger.error(f"Error creating sparkline: {str(e)}")
+            await update.message.reply_text(f"Lỗi khi tạo sparkline: {str(e)}")
+
+    @staticmethod
+    def _format_period(seconds):
+        if seconds < 3600:
+            return f"{seconds // 60} phút"
+        if seconds < 86400:
+            return f"{round(seconds / 3600, 1):g} giờ"
+        return f"{round(seconds / 86400, 1):g} ngày"
@@ -26,7 +26,7 @@ class StartCommand:
 **Cho mọi người dùng:**
 • `/start` - Hiển thị hướng dẫn này
 • `/help` - Hiển thị hướng dẫn sử dụng chi tiết
-• `/dashboard` - Chụp ảnh dashboard Zabbix
+• `/dashboard [id] [widget]` - Chụp ảnh dashboard Zabbix
 
 """
 
@@ -36,8 +36,12 @@ class StartCommand:
 • `/getalerts` - Xem problems mới nhất được lọc theo host groups
 • `/gethosts` - Liệt kê các host đang giám sát
 • `/getgraph <host/IP>` - Lấy biểu đồ hiệu suất với gợi ý items
+• `/spark <host> <key> [giây]` - Sparkline xem nhanh trên điện thoại
+• `/heatmap [ngày] [trang]` - Heatmap problems theo host và giờ
+• `/forecast [host|group]` - Dự báo dung lượng disk/memory
 • `/ask <host/IP>` - Phân tích thông tin hệ thống với AI
-• `/analyze` - Phân tích problems và dự đoán vấn đề hệ thống
+• `/analyze [refresh] [1h|24h|7d|30d] [group]` - Phân tích problems và dự đoán vấn đề hệ thống
+• `/flapping` - Trigger đang flapping
 • `/addwebsite` - Thêm website để chụp ảnh
 
 **Quản lý người dùng:**
@@ -30,10 +30,74 @@ class Config:
     # Screenshot
     SCREENSHOT_WIDTH = int(os.getenv('SCREENSHOT_WIDTH', '1920'))
     SCREENSHOT_HEIGHT = int(os.getenv('SCREENSHOT_HEIGHT', '1080'))
+    SCREENSHOT_READY_TIMEOUT = float(os.getenv('SCREENSHOT_READY_TIMEOUT', '10'))  # Hard cap for page readiness wait (seconds)
+    SCREENSHOT_POLL_INTERVAL = float(os.getenv('SCREENSHOT_POLL_INTERVAL', '0.25'))
+    SCREENSHOT_MAX_CONCURRENCY = int(os.getenv('SCREENSHOT_MAX_CONCURRENCY', '2'))  # Max Chrome instances at once
+    SCREENSHOT_QUEUE_SIZE = int(os.getenv('SCREENSHOT_QUEUE_SIZE', '20'))
+    SCREENSHOT_JOB_MAX_AGE = float(os.getenv('SCREENSHOT_JOB_MAX_AGE', '120'))  # Drop queued jobs older than this (seconds)
+    SCREENSHOT_FORMAT = os.getenv('SCREENSHOT_FORMAT', 'JPEG')  # JPEG, WEBP or PNG
+    SCREENSHOT_MAX_BYTES = int(os.getenv('SCREENSHOT_MAX_BYTES', '300000'))  # Size budget per uploaded screenshot
+    SCREENSHOT_DASHBOARD_SELECTOR = os.getenv('SCREENSHOT_DASHBOARD_SELECTOR', '.dashboard-grid')  # Crop dashboards to this element
+    SCREENSHOT_MAX_TABS = int(os.getenv('SCREENSHOT_MAX_TABS', '4'))  # Dashboards loaded in parallel per browser
+    
+    # Graphs
+    GRAPH_RENDER_WORKERS = int(os.getenv('GRAPH_RENDER_WORKERS', '2'))  # Processes rendering charts
+    GRAPH_RENDER_TIMEOUT = float(os.getenv('GRAPH_RENDER_TIMEOUT', '20'))  # Render deadline (seconds)
+    GRAPH_TRENDS_THRESHOLD = int(os.getenv('GRAPH_TRENDS_THRESHOLD', '172800'))  # Use trends for longer periods (seconds)
+    GRAPH_DOWNSAMPLE = os.getenv('GRAPH_DOWNSAMPLE', 'lttb')  # lttb or minmax
+    GRAPH_CACHE_MAX_BYTES = int(os.getenv('GRAPH_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))  # Rendered graph cache size
+    GRAPH_CACHE_BUCKET = int(os.getenv('GRAPH_CACHE_BUCKET', '60'))  # Graph end time is rounded to this (seconds)
+    GRAPH_LOOKUP_CACHE_MAX_BYTES = int(os.getenv('GRAPH_LOOKUP_CACHE_MAX_BYTES', str(4 * 1024 * 1024)))
+    GRAPH_LOOKUP_CACHE_TTL = int(os.getenv('GRAPH_LOOKUP_CACHE_TTL', '600'))  # Host/item lookups are reused this long
+    HEATMAP_PAGE_ROWS = int(os.getenv('HEATMAP_PAGE_ROWS', '40'))  # Hosts per /heatmap page
+    HEATMAP_MAX_COLUMNS = int(os.getenv('HEATMAP_MAX_COLUMNS', '168'))  # Time bins per /heatmap
+    HISTORY_CACHE_ENABLED = os.getenv('HISTORY_CACHE_ENABLED', 'true').lower() == 'true'
+    HISTORY_CACHE_DIR = os.getenv('HISTORY_CACHE_DIR', 'history_cache')  # One memory-mapped file per item
+    HISTORY_CACHE_MAX_AGE = int(os.getenv('HISTORY_CACHE_MAX_AGE', '172800'))  # Points older than this are evicted (seconds)
+    HISTORY_CACHE_OVERLAP = int(os.getenv('HISTORY_CACHE_OVERLAP', '120'))  # Tail re-read to catch late values (seconds)
+    
+    # Analysis
+    EVENT_SYNC_INTERVAL = int(os.getenv('EVENT_SYNC_INTERVAL', '60'))  # Seconds between event.get polls
+    EVENT_SYNC_BATCH = int(os.getenv('EVENT_SYNC_BATCH', '5000'))  # Events per event.get page
+    EVENT_SYNC_BACKFILL = int(os.getenv('EVENT_SYNC_BACKFILL', '86400'))  # History loaded on the first sync (seconds)
+    INCIDENT_WINDOW = int(os.getenv('INCIDENT_WINDOW', '300'))  # Incident closes after this long without events
+    INCIDENT_MIN_EVENTS = int(os.getenv('INCIDENT_MIN_EVENTS', '2'))  # Events before an incident is reported
+    INCIDENT_MAX_LIVE = int(os.getenv('INCIDENT_MAX_LIVE', '1000'))  # Live incidents kept in memory
+    INCIDENT_KEYS = [k.strip() for k in os.getenv('INCIDENT_KEYS', 'host,group,tag').split(',') if k.strip()]
+    INCIDENT_NOTIFY = os.getenv('INCIDENT_NOTIFY', 'true').lower() == 'true'  # Send opened/closed incidents to the admins
+    TRIGGER_GRAPH_REFRESH = int(os.getenv('TRIGGER_GRAPH_REFRESH', '3600'))  # Full rebuild of the trigger dependency graph (seconds)
+    ANALYZE_DETAIL_LIMIT = int(os.getenv('ANALYZE_DETAIL_LIMIT', '50000'))  # Max individual events /analyze loads for dependencies and clusters
+    ANALYZE_REFRESH_INTERVAL = int(os.getenv('ANALYZE_REFRESH_INTERVAL', '900'))  # Background rebuild of /analyze snapshots (seconds)
+    ANALYZE_REFRESH_EVENTS = int(os.getenv('ANALYZE_REFRESH_EVENTS', '50'))  # Synced events that trigger an early rebuild
+    ANALYZE_SNAPSHOT_KEEP = int(os.getenv('ANALYZE_SNAPSHOT_KEEP', '86400'))  # Stop refreshing a window/group unused this long (seconds)
+    ERROR_PATTERN_WINDOWS = [int(w) for w in os.getenv('ERROR_PATTERN_WINDOWS', '3600,86400,604800').split(',') if w.strip()]
+    ERROR_PATTERN_BUCKET = int(os.getenv('ERROR_PATTERN_BUCKET', '300'))  # Sliding step of the pattern windows (seconds)
+    ERROR_PATTERN_FLUSH = int(os.getenv('ERROR_PATTERN_FLUSH', '60'))  # Hot pattern counts are written to the database this often (seconds)
+    FLAP_WINDOW = int(os.getenv('FLAP_WINDOW', '3600'))  # Decay time of the flap score (seconds)
+    FLAP_THRESHOLD = float(os.getenv('FLAP_THRESHOLD', '6'))  # State changes per window at which a trigger is flapping
+    FLAP_HISTORY = int(os.getenv('FLAP_HISTORY', '20'))  # State changes kept per trigger
+    FLAP_MAX_TRIGGERS = int(os.getenv('FLAP_MAX_TRIGGERS', '10000'))  # Triggers tracked in memory
+    # Separated by ';' because item keys contain commas
+    ANOMALY_ITEM_KEYS = [k.strip() for k in os.getenv('ANOMALY_ITEM_KEYS', 'system.cpu.util;system.cpu.load;vm.memory.util;vfs.fs.size;net.if.in;net.if.out').split(';') if k.strip()]
+    ANOMALY_INTERVAL = int(os.getenv('ANOMALY_INTERVAL', '60'))  # Seconds between anomaly detection cycles
+    ANOMALY_ALPHA = float(os.getenv('ANOMALY_ALPHA', '0.1'))  # EWMA weight of the newest value
+    ANOMALY_THRESHOLD = float(os.getenv('ANOMALY_THRESHOLD', '4.0'))  # |z-score| that flags an anomaly
+    ANOMALY_MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', '30'))  # Samples before an item can be flagged
+    ANOMALY_ITEM_REFRESH = int(os.getenv('ANOMALY_ITEM_REFRESH', '3600'))  # Reload the monitored item list this often (seconds)
+    ANOMALY_SNAPSHOT = os.getenv('ANOMALY_SNAPSHOT', 'anomaly_state.npz')  # Detector state kept across restarts
+    # Separated by ';' because item keys contain commas
+    FORECAST_ITEM_KEYS = [k.strip() for k in os.getenv('FORECAST_ITEM_KEYS', 'vfs.fs.size[*,pused];vfs.fs.dependent.size[*,pused];vfs.fs.inode[*,pused];vm.memory.util*;vm.memory.size[pused]').split(';') if k.strip()]
+    FORECAST_WINDOW = int(os.getenv('FORECAST_WINDOW', '604800'))  # Seconds of hourly trends fitted by /forecast
+    FORECAST_BATCH = int(os.getenv('FORECAST_BATCH', '500'))  # Itemids per trend.get call
+    FORECAST_CAPACITY = float(os.getenv('FORECAST_CAPACITY', '100'))  # Percentage at which an item is exhausted
+    FORECAST_TREND_DELAY = int(os.getenv('FORECAST_TREND_DELAY', '300'))  # Seconds after the hour until Zabbix has written its trends
     
     # AI Integration
     OPENWEBUI_API_URL = os.getenv('OPENWEBUI_API_URL')
     OPENWEBUI_API_KEY = os.getenv('OPENWEBUI_API_KEY')
+    OPENWEBUI_MODEL = os.getenv('OPENWEBUI_MODEL', 'gpt-3.5-turbo')
+    OPENWEBUI_TIMEOUT = float(os.getenv('OPENWEBUI_TIMEOUT', '60'))  # Deadline of one AI request (seconds)
+    OPENWEBUI_MAX_CONNECTIONS = int(os.getenv('OPENWEBUI_MAX_CONNECTIONS', '4'))  # Pooled connections to the AI API
     
     # Database
     DB_PATH = 'zabbix_alerts.db'
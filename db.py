@@ -50,6 +50,41 @@ def init_db(db_path=Config.DB_PATH):
                           solution TEXT,
                           frequency INTEGER,
                           last_updated INTEGER)''')
+            c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_error_patterns_pattern ON error_patterns (pattern)')
+            
+            c.execute('''CREATE TABLE IF NOT EXISTS events
+                         (eventid INTEGER PRIMARY KEY,
+                          clock INTEGER,
+                          value INTEGER,
+                          r_eventid INTEGER,
+                          objectid TEXT,
+                          severity INTEGER,
+                          name TEXT,
+                          host TEXT,
+                          groups TEXT,
+                          tags TEXT)''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_events_clock ON events (clock)')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_events_object ON events (objectid, eventid)')
+            
+            c.execute('''CREATE TABLE IF NOT EXISTS event_rollups
+                         (hour INTEGER,
+                          host TEXT,
+                          groups TEXT,
+                          severity INTEGER,
+                          name TEXT,
+                          count INTEGER,
+                          PRIMARY KEY (hour, host, severity, name))''')
+            
+            c.execute('''CREATE TABLE IF NOT EXISTS sync_state
+                         (key TEXT PRIMARY KEY,
+                          value INTEGER)''')
+            
+            c.execute('''CREATE TABLE IF NOT EXISTS analysis_reports
+                         (window INTEGER,
+                          group_name TEXT,
+                          report TEXT,
+                          generated_at INTEGER,
+                          PRIMARY KEY (window, group_name))''')
             
             c.execute('''CREATE TABLE IF NOT EXISTS users
                          (id INTEGER PRIMARY KEY,
@@ -119,6 +154,240 @@ def save_alert(trigger_id, host, description, priority, timestamp) -> bool:
         logger.error(f"Error saving alert: {e}")
         return False
 
+def save_events(events: List[Dict[str, Any]], db_path=Config.DB_PATH) -> int:
+    """Store synced Zabbix events in one transaction; already stored eventids are skipped"""
+    if not events:
+        return 0
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.executemany('''INSERT OR IGNORE INTO events
+                             (eventid, clock, value, r_eventid, objectid, severity, name, host, groups, tags)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                          [(e['eventid'], e['clock'], e['value'], e['r_eventid'], e['objectid'], e['severity'],
+                            e['name'], e['host'], ','.join(e['groups']), ','.join(e['tags'])) for e in events])
+            conn.commit()
+            return c.rowcount
+    except Exception as e:
+        logger.error(f"Error saving events: {e}")
+        return 0
+
+def get_last_event(db_path=Config.DB_PATH) -> Optional[tuple]:
+    """(eventid, clock) of the newest stored event, or None"""
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT eventid, clock FROM events ORDER BY eventid DESC LIMIT 1')
+            row = c.fetchone()
+            return (row['eventid'], row['clock']) if row else None
+    except Exception as e:
+        logger.error(f"Error getting last event: {e}")
+        return None
+
+def get_sync_state(key: str, db_path=Config.DB_PATH) -> Optional[int]:
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT value FROM sync_state WHERE key = ?', (key,))
+            row = c.fetchone()
+            return row['value'] if row else None
+    except Exception as e:
+        logger.error(f"Error getting sync state: {e}")
+        return None
+
+def set_sync_state(key: str, value: int, db_path=Config.DB_PATH) -> bool:
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)', (key, value))
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error setting sync state: {e}")
+        return False
+
+def refresh_event_rollups(hours, db_path=Config.DB_PATH) -> bool:
+    """Recompute the hourly problem counts of the given hour starts from the events table"""
+    hours = sorted(set(hours))
+    if not hours:
+        return True
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            for hour in hours:
+                c.execute('DELETE FROM event_rollups WHERE hour = ?', (hour,))
+                c.execute('''INSERT INTO event_rollups (hour, host, groups, severity, name, count)
+                             SELECT ?, host, MAX(groups), severity, name, COUNT(*) FROM events
+                             WHERE value = 1 AND clock >= ? AND clock < ?
+                             GROUP BY host, severity, name''', (hour, hour, hour + 3600))
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error refreshing event rollups: {e}")
+        return False
+
+def _group_clause(group: Optional[str], column: str = 'groups'):
+    if not group:
+        return '', ()
+    return f" AND (',' || {column} || ',') LIKE ?", (f"%,{group},%",)
+
+def get_problem_summary(time_from: int, time_till: int, group: Optional[str] = None,
+                        db_path=Config.DB_PATH) -> List[tuple]:
+    """
+    (host, severity, name, count) of problem events in [time_from, time_till).
+
+    Complete hours are read from event_rollups, the partial hours at both edges from
+    the raw events, so long windows cost about as much as short ones.
+    """
+    first_hour = time_from + (-time_from) % 3600
+    last_hour = time_till - time_till % 3600
+    group_sql, group_args = _group_clause(group)
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            if first_hour >= last_hour:
+                c.execute(f'''SELECT host, severity, name, COUNT(*) AS count FROM events
+                              WHERE value = 1 AND clock >= ? AND clock < ?{group_sql}
+                              GROUP BY host, severity, name''', (time_from, time_till, *group_args))
+            else:
+                c.execute(f'''SELECT host, severity, name, SUM(count) AS count FROM (
+                                  SELECT host, severity, name, count FROM event_rollups
+                                  WHERE hour >= ? AND hour < ?{group_sql}
+                                  UNION ALL
+                                  SELECT host, severity, name, 1 FROM events
+                                  WHERE value = 1 AND ((clock >= ? AND clock < ?) OR (clock >= ? AND clock < ?)){group_sql}
+                              ) GROUP BY host, severity, name''',
+                          (first_hour, last_hour, *group_args,
+                           time_from, first_hour, last_hour, time_till, *group_args))
+            return [(row['host'], row['severity'], row['name'], row['count']) for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting problem summary: {e}")
+        return []
+
+def get_problem_events(time_from: int, time_till: int, group: Optional[str] = None, limit: int = None,
+                       db_path=Config.DB_PATH) -> List[Dict[str, Any]]:
+    """
+    Newest problem events in [time_from, time_till) shaped like problem.get rows.
+
+    `r_clock` is the time of the first recovery of the trigger synced after the event,
+    None (and `active` True) while there is none.
+    """
+    group_sql, group_args = _group_clause(group, 'e.groups')
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute(f'''SELECT e.eventid, e.clock, e.objectid, e.severity, e.name, e.host,
+                                 (SELECT MIN(r.clock) FROM events r WHERE r.objectid = e.objectid
+                                  AND r.value = 0 AND r.eventid > e.eventid) AS r_clock
+                          FROM events e
+                          WHERE e.value = 1 AND e.clock >= ? AND e.clock < ?{group_sql}
+                          ORDER BY e.clock DESC LIMIT ?''',
+                      (time_from, time_till, *group_args, limit or -1))
+            return [{
+                'eventid': str(row['eventid']),
+                'objectid': row['objectid'],
+                'name': row['name'],
+                'clock': str(row['clock']),
+                'severity': str(row['severity']),
+                'hosts': [{'host': row['host']}],
+                'r_clock': row['r_clock'],
+                'active': row['r_clock'] is None
+            } for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting problem events: {e}")
+        return []
+
+def save_error_patterns(rows: List[tuple], db_path=Config.DB_PATH) -> bool:
+    """Add (pattern, example description, frequency, last seen) counts in one transaction"""
+    if not rows:
+        return True
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.executemany('''INSERT INTO error_patterns (pattern, description, frequency, last_updated)
+                             VALUES (?, ?, ?, ?)
+                             ON CONFLICT(pattern) DO UPDATE SET
+                                 frequency = frequency + excluded.frequency,
+                                 description = CASE WHEN excluded.last_updated >= last_updated
+                                                    THEN excluded.description ELSE description END,
+                                 last_updated = MAX(last_updated, excluded.last_updated)''', rows)
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error saving error patterns: {e}")
+        return False
+
+def get_error_patterns(limit: int = 10, db_path=Config.DB_PATH) -> List[tuple]:
+    """(pattern, description, frequency, last_updated) of the most frequent stored patterns"""
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('''SELECT pattern, description, frequency, last_updated FROM error_patterns
+                         ORDER BY frequency DESC LIMIT ?''', (limit,))
+            return [tuple(row) for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting error patterns: {e}")
+        return []
+
+def get_problem_names(since: int, db_path=Config.DB_PATH) -> List[tuple]:
+    """(clock, name) of stored problem events since `since`, oldest first"""
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT clock, name FROM events WHERE value = 1 AND clock >= ? ORDER BY clock', (since,))
+            return [(row['clock'], row['name']) for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting problem names: {e}")
+        return []
+
+def get_problem_occurrences(time_from: int, time_till: int, db_path=Config.DB_PATH) -> List[tuple]:
+    """(host, clock) of stored problem events in [time_from, time_till), in one query"""
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('''SELECT host, clock FROM events
+                         WHERE value = 1 AND clock >= ? AND clock < ?''', (time_from, time_till))
+            return [(row['host'], row['clock']) for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting problem occurrences: {e}")
+        return []
+
+def get_trigger_events(since: int, db_path=Config.DB_PATH) -> List[tuple]:
+    """(objectid, clock, value, host, name) of stored events since `since`, oldest first"""
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('''SELECT objectid, clock, value, host, name FROM events
+                         WHERE clock >= ? ORDER BY clock, eventid''', (since,))
+            return [(row['objectid'], row['clock'], row['value'], row['host'], row['name']) for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting trigger events: {e}")
+        return []
+
+def save_analysis_report(window: int, group_name: str, report: str, generated_at: int,
+                         db_path=Config.DB_PATH) -> bool:
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('''INSERT OR REPLACE INTO analysis_reports (window, group_name, report, generated_at)
+                         VALUES (?, ?, ?, ?)''', (window, group_name, report, generated_at))
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error saving analysis report: {e}")
+        return False
+
+def get_analysis_reports(db_path=Config.DB_PATH) -> List[tuple]:
+    """(window, group_name, report, generated_at) of every stored /analyze snapshot"""
+    try:
+        with get_db_connection(db_path) as conn:
+            c = conn.cursor()
+            c.execute('SELECT window, group_name, report, generated_at FROM analysis_reports')
+            return [tuple(row) for row in c.fetchall()]
+    except Exception as e:
+        logger.error(f"Error getting analysis reports: {e}")
+        return []
+
 def add_host_website(host: str, url: str, enabled: bool) -> bool:
     try:
         with get_db_connection() as conn:
@@ -148,6 +417,10 @@ def cleanup_old_data():
             c = conn.cursor()
             c.execute('DELETE FROM alerts WHERE timestamp < ?', (cutoff_time,))
             alerts_deleted = c.rowcount
+            c.execute('DELETE FROM events WHERE clock < ?', (cutoff_time,))
+            c.execute('DELETE FROM event_rollups WHERE hour < ?', (cutoff_time,))
+            c.execute("UPDATE sync_state SET value = ? WHERE key = 'events_from' AND value < ?", (cutoff_time, cutoff_time))
+            c.execute('DELETE FROM analysis_reports WHERE generated_at < ?', (int(time.time()) - 86400,))
             c.execute('DELETE FROM error_patterns WHERE last_updated < ?', (cutoff_time,))
             patterns_deleted = c.rowcount
             conn.commit()
@@ -0,0 +1,231 @@
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import Dict, List, Tuple
+from config import Config
+from db import save_error_patterns, get_problem_names
+
+logger = logging.getLogger(__name__)
+
+# Masks applied in order: URLs and paths before IPs, IPs before plain numbers
+_MASKS = [
+    (re.compile(r'\b[a-z][a-z0-9+.-]*://\S+', re.IGNORECASE), '<URL>'),
+    (re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b'), '<IP>'),
+    (re.compile(r'\b(?:[0-9a-f]{1,4}:){4,7}[0-9a-f]{1,4}\b', re.IGNORECASE), '<IP>'),
+    (re.compile(r'(?<![\w<])(?:[A-Za-z]:\\|/)[^\s"\'(),:;]*'), '<PATH>'),
+    (re.compile(r'\b0x[0-9a-f]+\b|\b[0-9a-f]{12,}\b', re.IGNORECASE), '<HEX>'),
+    (re.compile(r'\b\d+(?:[.,]\d+)*(?:e[-+]?\d+)?'), '<NUM>'),
+]
+_SPACES = re.compile(r'\s+')
+
+# Descriptions already normalised (most alerts repeat the same few texts)
+TEMPLATE_CACHE_SIZE = 10000
+
+
+def normalise(description: str) -> str:
+    """Problem description -> template with numbers, IPs, paths, URLs and hex ids masked"""
+    template = description or ''
+    for pattern, mask in _MASKS:
+        template = pattern.sub(mask, template)
+    return _SPACES.sub(' ', template).strip()
+
+
+class RankedCounter:
+    """
+    Counter that can list its k largest entries in O(k).
+
+    Entries are grouped by count (count -> keys in the order they reached it) and the
+    distinct counts are kept sorted, so top(k) walks the largest counts down, visits at
+    most k groups and takes at most k keys from them; ties are listed oldest first. An
+    update moves a key between two count groups in O(1), plus a bisect insertion into
+    the sorted counts when its new count is not held by any other key yet.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        self._groups: Dict[int, Dict[str, None]] = {}
+        self._levels: List[int] = []  # Distinct counts, ascending
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _leave(self, key: str, count: int):
+        group = self._groups[count]
+        del group[key]
+        if not group:
+            del self._groups[count]
+            del self._levels[bisect.bisect_left(self._levels, count)]
+
+    def _join(self, key: str, count: int):
+        group = self._groups.get(count)
+        if group is None:
+            group = self._groups[count] = {}
+            bisect.insort(self._levels, count)
+        group[key] = None
+
+    def add(self, key: str, delta: int = 1):
+        old = self._counts.get(key, 0)
+        new = old + delta
+        if old:
+            self._leave(key, old)
+        if new > 0:
+            self._counts[key] = new
+            self._join(key, new)
+        else:
+            self._counts.pop(key, None)
+
+    def get(self, key: str) -> int:
+        return self._counts.get(key, 0)
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        result = []
+        for count in reversed(self._levels):
+            for key in islice(self._groups[count], k - len(result)):
+                result.append((key, count))
+            if len(result) == k:
+                break
+        return result
+
+
+class PatternMiner:
+    """
+    Incremental miner of error templates from problem events.
+
+    Each problem description is normalised into a template. Counts go to a hot in-memory
+    counter that is written to `error_patterns` in one batch at most every
+    ERROR_PATTERN_FLUSH seconds, and to one RankedCounter per window in
+    ERROR_PATTERN_WINDOWS. Windows slide in ERROR_PATTERN_BUCKET steps: per-bucket
+    counters are kept for the longest window and subtracted from a window's ranking
+    when they fall out of it, so top(window, k) never rescans events.
+    """
+
+    def __init__(self, windows: List[int] = None, bucket: int = None, flush_interval: int = None,
+                 db_path: str = None):
+        self.windows = sorted(windows or Config.ERROR_PATTERN_WINDOWS)
+        self.bucket = bucket or Config.ERROR_PATTERN_BUCKET
+        self.flush_interval = flush_interval or Config.ERROR_PATTERN_FLUSH
+        self.db_path = db_path or Config.DB_PATH
+        self._lock = threading.Lock()
+        self._templates: "OrderedDict[str, str]" = OrderedDict()
+        self._hot: Counter = Counter()
+        self._hot_seen: Dict[str, Tuple[int, str]] = {}  # template -> (last clock, example description)
+        self._buckets: "OrderedDict[int, Counter]" = OrderedDict()
+        self._rankings = {window: RankedCounter() for window in self.windows}
+        self._edges = {window: None for window in self.windows}  # Oldest bucket counted per window
+        self.last_flush = time.time()
+        self.loaded = False
+
+    def template(self, description: str) -> str:
+        template = self._templates.get(description)
+        if template is None:
+            template = normalise(description)
+            self._templates[description] = template
+            if len(self._templates) > TEMPLATE_CACHE_SIZE:
+                self._templates.popitem(last=False)
+        else:
+            self._templates.move_to_end(description)
+        return template
+
+    def _edge(self, window: int, now: int) -> int:
+        return now - now % self.bucket - window + self.bucket
+
+    def _advance(self, now: int):
+        """Drop buckets that left each window from its ranking"""
+        for window in self.windows:
+            edge = self._edge(window, now)
+            old_edge = self._edges[window]
+            if old_edge is not None and edge > old_edge:
+                ranking = self._rankings[window]
+                for start, counts in self._buckets.items():
+                    if start >= edge:
+                        break
+                    if start >= old_edge:
+                        for template, count in counts.items():
+                            ranking.add(template, -count)
+            self._edges[window] = edge if old_edge is None else max(edge, old_edge)
+        oldest = self._edge(self.windows[-1], now)
+        while self._buckets and next(iter(self._buckets)) < oldest:
+            self._buckets.popitem(last=False)
+
+    def _count(self, template: str, clock: int, count: int = 1):
+        start = clock - clock % self.bucket
+        if start < self._edges[self.windows[-1]]:
+            return
+        counts = self._buckets.get(start)
+        if counts is None:
+            late = bool(self._buckets) and start < next(reversed(self._buckets))
+            counts = self._buckets[start] = Counter()
+            if late:
+                # Keep the buckets ordered by start
+                self._buckets = OrderedDict(sorted(self._buckets.items()))
+        counts[template] += count
+        for window in self.windows:
+            if start >= self._edges[window]:
+                self._rankings[window].add(template, count)
+
+    def feed(self, events: List[dict]):
+        """Event sync listener: count the templates of new problem events"""
+        problems = [event for event in events if event['value'] == 1]
+        if not problems:
+            return
+        with self._lock:
+            self._advance(int(time.time()))
+            for event in problems:
+                template = self.template(event['name'])
+                self._hot[template] += 1
+                last = self._hot_seen.get(template)
+                if last is None or event['clock'] >= last[0]:
+                    self._hot_seen[template] = (event['clock'], event['name'])
+                self._count(template, event['clock'])
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def load(self, now: int = None):
+        """Rebuild the window rankings from the local events table (counts are not re-flushed)"""
+        now = now or int(time.time())
+        rows = get_problem_names(now - self.windows[-1], self.db_path)
+        with self._lock:
+            self._advance(now)
+            for clock, name in rows:
+                self._count(self.template(name), clock)
+            self.loaded = True
+        logger.info(f"Error pattern windows loaded from {len(rows)} stored events")
+
+    def flush(self) -> int:
+        """Write the hot counts to error_patterns in one batch; returns the number of templates"""
+        with self._lock:
+            hot, seen = self._hot, self._hot_seen
+            self._hot, self._hot_seen = Counter(), {}
+            self.last_flush = time.time()
+        if not hot:
+            return 0
+        rows = [(template, seen[template][1], count, seen[template][0]) for template, count in hot.items()]
+        if not save_error_patterns(rows, self.db_path):
+            # Keep the counts for the next flush
+            with self._lock:
+                self._hot.update(hot)
+                for template, (clock, name) in seen.items():
+                    if template not in self._hot_seen or self._hot_seen[template][0] < clock:
+                        self._hot_seen[template] = (clock, name)
+            return 0
+        return len(rows)
+
+    def window_for(self, seconds: int) -> int:
+        """Smallest tracked window covering `seconds` (the largest one if none does)"""
+        return next((window for window in self.windows if window >= seconds), self.windows[-1])
+
+    def top(self, window: int, k: int = 5) -> List[Tuple[str, int]]:
+        """(template, count) of the k most frequent templates in `window` seconds"""
+        if window not in self._rankings:
+            raise ValueError(f"Window {window} is not tracked (ERROR_PATTERN_WINDOWS={self.windows})")
+        with self._lock:
+            self._advance(int(time.time()))
+            return self._rankings[window].top(k)
+
+
+# Global miner fed by event_sync
+pattern_miner = PatternMiner()
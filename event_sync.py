@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+from config import Config
+from db import save_events, get_last_event, get_sync_state, set_sync_state, refresh_event_rollups
+from zabbix import get_zabbix_api
+
+logger = logging.getLogger(__name__)
+
+
+class EventSync:
+    """
+    Incremental copy of Zabbix trigger events into the local `events` table.
+
+    Each sync() asks event.get only for events after the newest stored eventid (the
+    first run backfills EVENT_SYNC_BACKFILL seconds), in pages of EVENT_SYNC_BATCH.
+    New events are stored, rolled up per hour and then passed to every listener, oldest
+    first. The start of the covered period is kept in sync_state ('events_from') and
+    can be moved back with ensure_coverage().
+    """
+
+    def __init__(self, batch_size: int = None, backfill: int = None, db_path: str = None):
+        self.batch_size = batch_size or Config.EVENT_SYNC_BATCH
+        self.backfill = backfill or Config.EVENT_SYNC_BACKFILL
+        self.db_path = db_path or Config.DB_PATH
+        self._listeners: List[Callable[[List[dict]], None]] = []
+        self._host_groups: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._zapi = None
+        self.last_sync = 0.0
+
+    def add_listener(self, listener: Callable[[List[dict]], None]):
+        """Call `listener(events)` with every batch of new events"""
+        self._listeners.append(listener)
+
+    def _groups_for(self, zapi, hostids: List[str]) -> Dict[str, List[str]]:
+        """Host group names per hostid, cached; only unknown hosts are looked up"""
+        missing = [hostid for hostid in set(hostids) if hostid not in self._host_groups]
+        if missing:
+            try:
+                hosts = zapi.host.get({"hostids": missing, "output": ["hostid"], "selectHostGroups": ["name"]})
+            except Exception:
+                # Zabbix before 6.2 calls it selectGroups
+                hosts = zapi.host.get({"hostids": missing, "output": ["hostid"], "selectGroups": ["name"]})
+            for host in hosts or []:
+                groups = host.get('hostgroups') or host.get('groups') or []
+                self._host_groups[host['hostid']] = sorted(group['name'] for group in groups)
+            for hostid in missing:
+                self._host_groups.setdefault(hostid, [])
+        return self._host_groups
+
+    def _normalise(self, zapi, rows: List[dict]) -> List[dict]:
+        hostids = [row['hosts'][0]['hostid'] for row in rows if row.get('hosts')]
+        groups = self._groups_for(zapi, hostids) if hostids else {}
+        events = []
+        for row in rows:
+            host = row['hosts'][0] if row.get('hosts') else {}
+            events.append({
+                'eventid': int(row['eventid']),
+                'clock': int(row['clock']),
+                'value': int(row['value']),
+                'r_eventid': int(row.get('r_eventid') or 0),
+                'objectid': row['objectid'],
+                'severity': int(row.get('severity') or 0),
+                'name': row.get('name', ''),
+                'host': host.get('host', 'Unknown'),
+                'groups': groups.get(host.get('hostid'), []),
+                'tags': sorted(f"{tag['tag']}={tag.get('value', '')}" for tag in row.get('tags') or [])
+            })
+        return events
+
+    def _connection(self, zapi):
+        if zapi is None:
+            # One long-lived session instead of a login per sync
+            self._zapi = self._zapi or get_zabbix_api()
+            zapi = self._zapi
+        return zapi
+
+    def _params(self) -> dict:
+        return {
+            "output": ["eventid", "clock", "value", "r_eventid", "objectid", "severity", "name"],
+            "source": 0,  # Trigger events
+            "object": 0,
+            "selectHosts": ["hostid", "host"],
+            "selectTags": ["tag", "value"],
+            "sortfield": ["eventid"],
+            "sortorder": "ASC",
+            "limit": self.batch_size
+        }
+
+    def _pull(self, zapi, params: dict, dispatch: bool) -> int:
+        """Page through event.get by eventid, storing (and optionally dispatching) each page"""
+        total = 0
+        while True:
+            rows = zapi.event.get(dict(params)) or []
+            if not rows:
+                break
+            events = self._normalise(zapi, rows)
+            save_events(events, self.db_path)
+            refresh_event_rollups({event['clock'] - event['clock'] % 3600 for event in events}, self.db_path)
+            if dispatch:
+                for listener in self._listeners:
+                    try:
+                        listener(events)
+                    except Exception as e:
+                        logger.error(f"Event listener {getattr(listener, '__name__', listener)} failed: {e}")
+            total += len(events)
+            if len(rows) < self.batch_size:
+                break
+            params.pop("time_from", None)
+            params["eventid_from"] = str(events[-1]['eventid'] + 1)
+        return total
+
+    def sync(self, zapi=None) -> int:
+        """Fetch, store and dispatch every event newer than the local copy; returns how many"""
+        with self._lock:
+            zapi = self._connection(zapi)
+            last = get_last_event(self.db_path)
+            params = self._params()
+            if last:
+                params["eventid_from"] = str(last[0] + 1)
+            else:
+                params["time_from"] = int(time.time()) - self.backfill
+                set_sync_state('events_from', params["time_from"], self.db_path)
+
+            total = self._pull(zapi, params, dispatch=True)
+            self.last_sync = time.time()
+            if total:
+                logger.info(f"Synced {total} Zabbix events")
+            return total
+
+    def covered_from(self) -> int:
+        """Start of the period the local events table covers (now if nothing synced yet)"""
+        value = get_sync_state('events_from', self.db_path)
+        return int(time.time()) if value is None else value
+
+    def ensure_coverage(self, time_from: int, zapi=None) -> int:
+        """
+        Load older events so the local store covers time_from onwards.
+
+        Only the uncovered part before the current coverage start is requested; the
+        events are stored and rolled up but not dispatched to listeners.
+        """
+        with self._lock:
+            covered = get_sync_state('events_from', self.db_path)
+            if covered is None or time_from >= covered:
+                return 0
+            zapi = self._connection(zapi)
+            params = self._params()
+            params["time_from"] = time_from
+            params["time_till"] = covered - 1
+            total = self._pull(zapi, params, dispatch=False)
+            set_sync_state('events_from', time_from, self.db_path)
+            logger.info(f"Backfilled {total} Zabbix events from {time_from}")
+            return total
+
+
+# Global event sync instance
+event_sync = EventSync()
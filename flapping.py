@@ -0,0 +1,176 @@
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Iterable, List, Set
+from config import Config
+from db import get_trigger_events
+
+logger = logging.getLogger(__name__)
+
+# Windows of stored events replayed on load; older transitions have decayed below 2%
+LOAD_WINDOWS = 4
+
+
+class TriggerFlap:
+    __slots__ = ('transitions', 'score', 'last_clock', 'value', 'host', 'name', 'flapping', 'since', 'suppressed')
+
+    def __init__(self, history: int):
+        self.transitions = deque(maxlen=history)  # (clock, value) ring buffer
+        self.score = 0.0
+        self.last_clock = 0
+        self.value = None
+        self.host = "Unknown"
+        self.name = ""
+        self.flapping = False
+        self.since = 0
+        self.suppressed = 0
+
+
+class FlapDetector:
+    """
+    Flapping detector over the trigger state changes seen by the event sync.
+
+    Every trigger keeps its last FLAP_HISTORY transitions (PROBLEM <-> OK) in a ring
+    buffer and an exponentially decayed transition count: on a transition the score is
+    decayed by exp(-dt / FLAP_WINDOW) and incremented by one, so it approximates the
+    number of state changes in the last window at O(1) per event. A trigger starts
+    flapping at FLAP_THRESHOLD and stops once its decayed score drops below half of it.
+    At most FLAP_MAX_TRIGGERS triggers are tracked; the one idle longest is dropped.
+    """
+
+    def __init__(self, window: int = None, threshold: float = None, history: int = None,
+                 max_triggers: int = None, db_path: str = None):
+        self.window = window or Config.FLAP_WINDOW
+        self.threshold = threshold or Config.FLAP_THRESHOLD
+        self.history = history or Config.FLAP_HISTORY
+        self.max_triggers = max_triggers or Config.FLAP_MAX_TRIGGERS
+        self.db_path = db_path or Config.DB_PATH
+        self._triggers: "OrderedDict[str, TriggerFlap]" = OrderedDict()  # Least recently changed first
+        self._lock = threading.Lock()
+
+    def _decayed(self, state: TriggerFlap, now: int) -> float:
+        return state.score * math.exp(-max(0, now - state.last_clock) / self.window)
+
+    def _refresh(self, triggerid: str, state: TriggerFlap, now: int) -> float:
+        """Current score; ends the flapping state once the score has decayed enough"""
+        score = self._decayed(state, now)
+        if state.flapping and score < self.threshold / 2:
+            state.flapping = False
+            logger.info(f"Trigger {triggerid} ({state.host}: {state.name}) stopped flapping, "
+                        f"{state.suppressed} notifications folded")
+            state.suppressed = 0
+        return score
+
+    def _transition(self, event: dict):
+        triggerid = event['objectid']
+        state = self._triggers.get(triggerid)
+        if state is None:
+            state = self._triggers[triggerid] = TriggerFlap(self.history)
+            if len(self._triggers) > self.max_triggers:
+                self._triggers.popitem(last=False)
+        else:
+            self._triggers.move_to_end(triggerid)
+        state.host = event.get('host', state.host)
+        state.name = event.get('name') or state.name
+        if state.value is None:
+            # First event seen: only the starting state, not a change
+            state.value = event['value']
+            state.last_clock = event['clock']
+            return
+        if event['value'] == state.value:
+            return
+
+        clock = event['clock']
+        state.score = self._decayed(state, clock) + 1
+        state.last_clock = max(clock, state.last_clock)
+        state.value = event['value']
+        state.transitions.append((clock, event['value']))
+        if not state.flapping and state.score >= self.threshold:
+            state.flapping = True
+            state.since = clock
+            logger.info(f"Trigger {triggerid} ({state.host}: {state.name}) is flapping "
+                        f"(score {state.score:.1f})")
+        if state.flapping and event['value'] == 1:
+            # A new problem of a flapping trigger: its notification is folded
+            state.suppressed += 1
+
+    def feed(self, events: List[dict]):
+        """Event sync listener: count the state transitions of every trigger"""
+        with self._lock:
+            for event in events:
+                self._transition(event)
+
+    def load(self, now: int = None):
+        """Rebuild the recent trigger states from the local events table"""
+        now = now or int(time.time())
+        rows = get_trigger_events(now - LOAD_WINDOWS * self.window, self.db_path)
+        with self._lock:
+            for objectid, clock, value, host, name in rows:
+                self._transition({'objectid': objectid, 'clock': clock, 'value': value, 'host': host, 'name': name})
+        logger.info(f"Flap detector loaded {len(rows)} stored events")
+
+    def is_flapping(self, triggerid: str, now: int = None) -> bool:
+        now = now or int(time.time())
+        with self._lock:
+            state = self._triggers.get(str(triggerid))
+            if state is None or not state.flapping:
+                return False
+            self._refresh(str(triggerid), state, now)
+            return state.flapping
+
+    def suppress(self, triggerids: Iterable[str], now: int = None) -> Set[str]:
+        """
+        Triggers among `triggerids` whose notifications should be folded into one summary.
+
+        Listing a trigger does not count as a notification; folded notifications are
+        counted once per problem event while the trigger flaps and shown by /flapping.
+        """
+        now = now or int(time.time())
+        suppressed = set()
+        with self._lock:
+            for triggerid in triggerids:
+                triggerid = str(triggerid)
+                state = self._triggers.get(triggerid)
+                if state is None or not state.flapping:
+                    continue
+                self._refresh(triggerid, state, now)
+                if state.flapping:
+                    suppressed.add(triggerid)
+        return suppressed
+
+    def flapping_count(self, now: int = None) -> int:
+        now = now or int(time.time())
+        count = 0
+        with self._lock:
+            for triggerid, state in self._triggers.items():
+                if state.flapping:
+                    self._refresh(triggerid, state, now)
+                    count += state.flapping
+        return count
+
+    def top(self, limit: int = 10, now: int = None) -> List[dict]:
+        """Triggers with the highest current flap score (at least half the threshold), worst first"""
+        now = now or int(time.time())
+        with self._lock:
+            scored = [(self._refresh(triggerid, state, now), triggerid, state)
+                      for triggerid, state in self._triggers.items()]
+            worst = heapq.nlargest(limit, (entry for entry in scored if entry[0] >= self.threshold / 2),
+                                   key=lambda entry: entry[0])
+            return [{
+                'triggerid': triggerid,
+                'host': state.host,
+                'name': state.name,
+                'score': score,
+                'flapping': state.flapping,
+                'since': state.since,
+                'transitions': sum(1 for clock, _ in state.transitions if clock >= now - self.window),
+                'last_change': state.last_clock,
+                'suppressed': state.suppressed
+            } for score, triggerid, state in worst]
+
+
+# Global detector fed by event_sync
+flap_detector = FlapDetector()
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+import warnings
+from typing import Dict, List, Tuple
+import numpy as np
+from config import Config
+from timeseries import parse_column
+from zabbix import get_zabbix_api
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+HUBER_K = 1.345  # Huber tuning constant (95% efficiency on normal noise)
+
+
+def trend_matrix(rows: List[dict], itemids: np.ndarray, time_from: int, hours: int) -> np.ndarray:
+    """
+    trend.get rows of many items -> (items x hours) matrix of value_avg, NaN where missing.
+
+    `itemids` must be sorted; rows are placed with one searchsorted and one scatter.
+    """
+    matrix = np.full((itemids.size, hours), np.nan)
+    if not rows:
+        return matrix
+    ids = parse_column(rows, 'itemid', np.int64)
+    columns = (parse_column(rows, 'clock', np.int64) - time_from) // HOUR
+    values = parse_column(rows, 'value_avg', np.float64)
+    positions = np.searchsorted(itemids, ids)
+    valid = (positions < itemids.size) & (columns >= 0) & (columns < hours)
+    valid[valid] = itemids[positions[valid]] == ids[valid]
+    matrix[positions[valid], columns[valid]] = values[valid]
+    return matrix
+
+
+def weighted_fit(x: np.ndarray, y: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row weighted least squares line y = a + b*x; rows of y share the x grid"""
+    w = np.where(np.isnan(y), 0.0, weights)
+    y = np.nan_to_num(y)
+    sw = w.sum(axis=1)
+    sx = w @ x
+    sy = (w * y).sum(axis=1)
+    sxx = w @ (x * x)
+    sxy = (w * y) @ x
+    denominator = sw * sxx - sx * sx
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where(denominator > 0, (sw * sxy - sx * sy) / denominator, np.nan)
+        intercept = np.where(sw > 0, (sy - slope * sx) / sw, np.nan)
+    return intercept, slope
+
+
+def huber_fit(x: np.ndarray, y: np.ndarray, iterations: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-row robust line fit: iteratively reweighted least squares with Huber weights.
+
+    Each iteration is one weighted fit of all rows at once; residuals are scaled by their
+    per-row median absolute deviation, so spikes and one-off cleanups barely move the
+    line.
+    """
+    weights = np.ones_like(y)
+    intercept, slope = weighted_fit(x, y, weights)
+    for _ in range(iterations):
+        residuals = y - (intercept[:, None] + slope[:, None] * x)
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN rows (items without trends)
+            scale = 1.4826 * np.nanmedian(np.abs(residuals), axis=1)
+            scaled = np.abs(residuals) / np.where(scale > 0, scale, np.inf)[:, None]
+            weights = np.where(scaled <= HUBER_K, 1.0, HUBER_K / scaled)
+        intercept, slope = weighted_fit(x, y, weights)
+    return intercept, slope
+
+
+def time_to_exhaustion(intercept: np.ndarray, slope: np.ndarray, at: float, capacity: float) -> np.ndarray:
+    """Seconds until the fitted line reaches capacity after `at` (inf when flat or falling)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        remaining = (capacity - (intercept + slope * at)) / slope
+    return np.where((slope > 0) & np.isfinite(remaining), np.maximum(remaining, 0.0), np.inf)
+
+
+class Forecaster:
+    """
+    Capacity forecasts for percentage items (disk, inode, memory usage).
+
+    The hourly trends of FORECAST_WINDOW seconds of all requested items are fetched with
+    trend.get in batches of FORECAST_BATCH itemids, laid out as one items x hours matrix
+    and fitted with an ordinary and a Huber-robust line in a few matrix operations. The
+    result per item is cached until its next hourly trend can exist, so repeated
+    forecasts within the hour do not call Zabbix.
+    """
+
+    def __init__(self, window: int = None, batch: int = None, capacity: float = None, trend_delay: int = None):
+        self.window = window or Config.FORECAST_WINDOW
+        self.batch = batch or Config.FORECAST_BATCH
+        self.capacity = capacity or Config.FORECAST_CAPACITY
+        self.trend_delay = trend_delay or Config.FORECAST_TREND_DELAY
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[float, dict]] = {}  # itemid -> (valid until, forecast)
+
+    def _valid_until(self, now: int) -> int:
+        # The trend of the current hour is written once the hour is over
+        return now - now % HOUR + HOUR + self.trend_delay
+
+    def fit(self, items: List[dict], rows: List[dict], time_from: int, now: int) -> List[dict]:
+        """Forecast every item from its trend rows (all items in one matrix)"""
+        hours = max(2, self.window // HOUR)
+        itemids = np.array(sorted(int(item['itemid']) for item in items), dtype=np.int64)
+        by_id = {int(item['itemid']): item for item in items}
+        values = trend_matrix(rows, itemids, time_from, hours)
+        x = np.arange(hours, dtype=np.float64) * HOUR + HOUR / 2  # Seconds from time_from
+
+        linear = weighted_fit(x, values, np.ones_like(values))
+        robust = huber_fit(x, values)
+        at = now - time_from
+        linear_eta = time_to_exhaustion(*linear, at, self.capacity)
+        robust_eta = time_to_exhaustion(*robust, at, self.capacity)
+        observed = ~np.isnan(values)
+        points = np.count_nonzero(observed, axis=1)
+        last = values[np.arange(itemids.size), hours - 1 - np.argmax(observed[:, ::-1], axis=1)]
+
+        forecasts = []
+        for i, itemid in enumerate(itemids):
+            item = by_id[int(itemid)]
+            forecasts.append({
+                'itemid': str(itemid),
+                'host': item.get('host', 'Unknown'),
+                'name': item.get('name', item.get('key_', '')),
+                'points': int(points[i]),
+                'last': float(last[i]),
+                'slope_per_day': float(robust[1][i] * 86400),
+                'eta': float(robust_eta[i]),
+                'linear_eta': float(linear_eta[i])
+            })
+        return forecasts
+
+    def forecast(self, zapi, items: List[dict], limit: int = 10) -> List[dict]:
+        """
+        Forecasts of the items soonest to run out first; only stale items are refetched.
+
+        `zapi` may be None: a Zabbix session is then opened only if some item is stale.
+        """
+        now = int(time.time())
+        with self._lock:
+            fresh = {item['itemid']: self._cache[item['itemid']][1] for item in items
+                     if item['itemid'] in self._cache and self._cache[item['itemid']][0] > now}
+        stale = [item for item in items if item['itemid'] not in fresh]
+
+        if stale:
+            zapi = zapi or get_zabbix_api()
+            time_from = now - now % HOUR - self.window
+            rows = []
+            for start in range(0, len(stale), self.batch):
+                rows.extend(zapi.trend.get({
+                    "itemids": [item['itemid'] for item in stale[start:start + self.batch]],
+                    "time_from": time_from,
+                    "time_till": now,
+                    "output": ["itemid", "clock", "value_avg"]
+                }) or [])
+            started = time.perf_counter()
+            computed = self.fit(stale, rows, time_from, now)
+            logger.info(f"Forecast fitted {len(stale)} items ({len(rows)} trend rows) "
+                        f"in {time.perf_counter() - started:.3f}s")
+            valid_until = self._valid_until(now)
+            with self._lock:
+                for result in computed:
+                    self._cache[result['itemid']] = (valid_until, result)
+                    fresh[result['itemid']] = result
+                for itemid in [i for i, (until, _) in self._cache.items() if until <= now]:
+                    del self._cache[itemid]
+
+        ranked = [result for result in fresh.values() if result['points'] >= 2]
+        ranked.sort(key=lambda r: (r['eta'], -r['slope_per_day']))
+        return ranked[:limit]
+
+
+# Global forecaster shared by /forecast
+forecaster = Forecaster()
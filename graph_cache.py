@@ -0,0 +1,98 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ByteLRUCache:
+    """
+    Thread-safe LRU cache bounded by the total size of its values in bytes.
+
+    `size` defaults to len(value) (PNG bytes); other values should pass their own
+    estimate. Entries optionally expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[2] is not None and entry[2] < time.monotonic()):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size: int = None):
+        size = len(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def bucket_end(time_till: int, bucket: int = None) -> int:
+    """Round the end of a graph window down to the cache bucket"""
+    bucket = bucket or Config.GRAPH_CACHE_BUCKET
+    return time_till - time_till % bucket
+
+
+def graph_key(itemid, period: int, end: int, style: str = 'line') -> tuple:
+    """Cache key of a rendered graph"""
+    return (str(itemid), int(period), int(end), style)
+
+
+def estimate_size(value) -> int:
+    """Rough memory footprint of small API results kept in the lookup cache"""
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+# Rendered PNGs keyed by graph_key()
+graph_cache = ByteLRUCache(Config.GRAPH_CACHE_MAX_BYTES)
+
+# (host, item key) -> resolved items, so cache hits skip host.get/item.get too
+item_lookup_cache = ByteLRUCache(Config.GRAPH_LOOKUP_CACHE_MAX_BYTES, ttl=Config.GRAPH_LOOKUP_CACHE_TTL)
@@ -0,0 +1,169 @@
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, List
+import numpy as np
+from config import Config
+from timeseries import parse_history, parse_trends, split_by_item
+from history_store import history_store
+
+logger = logging.getLogger(__name__)
+
+# Zabbix item value types that have trends (float and unsigned integer)
+NUMERIC_VALUE_TYPES = ('0', '3')
+
+TREND_PERIOD = 3600  # Zabbix aggregates trends per hour
+
+_EMPTY_HISTORY = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+
+def fetch_history_many(zapi, items: List[dict], time_from: int, time_till: int) -> Dict[str, tuple]:
+    """
+    Raw history of several items as {itemid: (clock, value)} sorted by clock.
+
+    history.get takes one value type per call, so items are grouped by value_type and
+    each group is fetched with a single call for all of its itemids.
+    """
+    groups = defaultdict(list)
+    for item in items:
+        groups[int(item.get('value_type', 3))].append(str(item['itemid']))
+
+    result = {}
+    for value_type, itemids in groups.items():
+        rows = zapi.history.get({
+            "itemids": itemids,
+            "history": value_type,
+            "time_from": time_from,
+            "time_till": time_till,
+            "output": ["itemid", "clock", "value"],
+            "sortfield": "clock",
+            "sortorder": "ASC"
+        }) or []
+        if len(itemids) == 1:
+            result[itemids[0]] = parse_history(rows)
+        else:
+            result.update(split_by_item(rows, ['value']))
+    return {str(item['itemid']): result.get(str(item['itemid']), _EMPTY_HISTORY) for item in items}
+
+
+def fetch_history(zapi, item: dict, time_from: int, time_till: int):
+    """Raw history of one item as (clock, value) arrays sorted by clock"""
+    return fetch_history_many(zapi, [item], time_from, time_till)[str(item['itemid'])]
+
+
+def _uses_trends(item: dict, time_from: int, time_till: int) -> bool:
+    return (time_till - time_from > Config.GRAPH_TRENDS_THRESHOLD
+            and str(item.get('value_type', '3')) in NUMERIC_VALUE_TYPES)
+
+
+def _fetch_trends_many(zapi, items: List[dict], time_from: int, time_till: int) -> Dict[str, tuple]:
+    """Hourly trends of several items with one trend.get: {itemid: (clock, avg, min, max)}"""
+    itemids = [str(item['itemid']) for item in items]
+    rows = zapi.trend.get({
+        "itemids": itemids,
+        "time_from": time_from,
+        "time_till": time_till,
+        "output": ["itemid", "clock", "value_min", "value_avg", "value_max"]
+    }) or []
+    if len(itemids) == 1:
+        return {itemids[0]: parse_trends(rows)}
+    return split_by_item(rows, ['value_avg', 'value_min', 'value_max'])
+
+
+def fetch_items_series(zapi, items: List[dict], time_from: int, time_till: int) -> Dict[str, dict]:
+    """
+    Fetch graphable series for several items: {itemid: series}.
+
+    Spans longer than GRAPH_TRENDS_THRESHOLD read hourly trends (min/avg/max) for every
+    complete hour and raw history only for the current, not yet aggregated hour, so a
+    week costs ~170 trend rows per item instead of every sample. Shorter spans, and items
+    without trends, read history, through the local history cache when
+    HISTORY_CACHE_ENABLED. Every source is fetched with one call for all items.
+    A series is a dict with `clock`, `value` and, for trend based series, `min`/`max`
+    arrays plus `source` ('history' or 'trends').
+    """
+    trend_items = [item for item in items if _uses_trends(item, time_from, time_till)]
+    history_items = [item for item in items if not _uses_trends(item, time_from, time_till)]
+    load_history = history_store.get_many if Config.HISTORY_CACHE_ENABLED else fetch_history_many
+    result = {}
+
+    if history_items:
+        for itemid, (clocks, values) in load_history(zapi, history_items, time_from, time_till).items():
+            result[itemid] = {"clock": clocks, "value": values, "source": "history"}
+
+    if trend_items:
+        # Trends exist for complete hours only; the current hour comes from history
+        boundary = time_till - time_till % TREND_PERIOD
+        trends = _fetch_trends_many(zapi, trend_items, time_from, boundary - 1)
+        recent = load_history(zapi, trend_items, max(time_from, boundary), time_till)
+        empty = _EMPTY_HISTORY[1]
+        for item in trend_items:
+            itemid = str(item['itemid'])
+            trend_clocks, avg, low, high = trends.get(itemid, (_EMPTY_HISTORY[0], empty, empty, empty))
+            recent_clocks, recent_values = recent[itemid]
+            logger.info(f"Item {itemid}: {trend_clocks.size} trend rows + {recent_clocks.size} history rows")
+            result[itemid] = {
+                "clock": np.concatenate((trend_clocks, recent_clocks)),
+                "value": np.concatenate((avg, recent_values)),
+                "min": np.concatenate((low, recent_values)),
+                "max": np.concatenate((high, recent_values)),
+                "source": "trends"
+            }
+    return result
+
+
+def fetch_item_series(zapi, item: dict, time_from: int, time_till: int) -> dict:
+    """Fetch a graphable series for one item (see fetch_items_series)"""
+    return fetch_items_series(zapi, [item], time_from, time_till)[str(item['itemid'])]
+
+
+def _key_matcher(pattern: str):
+    """Item key pattern -> predicate. `*` is a wildcard, plain patterns match substrings."""
+    if '*' not in pattern:
+        needle = pattern.lower()
+        return lambda key: needle in key.lower()
+    regex = re.compile('.*'.join(re.escape(part) for part in pattern.split('*')), re.IGNORECASE)
+    return lambda key: regex.fullmatch(key) is not None
+
+
+def find_hosts(zapi, names: List[str]) -> Dict[str, str]:
+    """Resolve host names with one host.get: {hostid: host} in the order they were given"""
+    hosts = zapi.host.get({
+        "filter": {"host": names},
+        "output": ["hostid", "host"]
+    }) or []
+    by_name = {host["host"]: host["hostid"] for host in hosts}
+    return {by_name[name]: name for name in names if name in by_name}
+
+
+def find_items(zapi, hosts: Dict[str, str], patterns: List[str], limit: int = None) -> List[dict]:
+    """
+    Resolve item key patterns on several hosts with one item.get.
+
+    A plain pattern picks one item per host (the exact key if present, else the first
+    key containing it); a pattern with `*` picks every matching item. Each returned item
+    carries the `host` name it belongs to.
+    """
+    items = zapi.item.get({
+        "hostids": list(hosts),
+        "search": {"key_": [p if '*' in p else f"*{p}*" for p in patterns]},
+        "searchByAny": True,
+        "searchWildcardsEnabled": True,
+        "output": ["itemid", "name", "value_type", "hostid", "key_"]
+    }) or []
+
+    by_host = defaultdict(list)
+    for item in items:
+        by_host[item["hostid"]].append(item)
+
+    selected = {}
+    for hostid, host in hosts.items():
+        for pattern in patterns:
+            matches = [item for item in by_host[hostid] if _key_matcher(pattern)(item["key_"])]
+            if '*' not in pattern:
+                exact = [item for item in matches if item["key_"] == pattern]
+                matches = (exact or matches)[:1]
+            for item in matches:
+                selected.setdefault(item["itemid"], dict(item, host=host))
+    result = list(selected.values())
+    return result[:limit] if limit else result
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from typing import List
+from zabbix import get_zabbix_api
+from graph_renderer import graph_renderer, render_line_chart, CHART_WIDTH_PX
+from graph_data import fetch_items_series
+from graph_cache import graph_cache, bucket_end, graph_key
+from timeseries import downsample_series, target_points
+
+logger = logging.getLogger(__name__)
+
+
+def graph_window(period: int):
+    """(time_from, time_till) of a graph ending now, rounded to the cache bucket"""
+    time_till = bucket_end(int(time.time()))
+    return time_till - period, time_till
+
+
+def cache_key(items: List[dict], period: int, time_till: int) -> tuple:
+    itemids = ','.join(sorted(str(item['itemid']) for item in items))
+    return graph_key(itemids, period, time_till, 'line' if len(items) == 1 else 'overlay')
+
+
+def load_series(zapi, items: List[dict], time_from: int, time_till: int) -> List[dict]:
+    """Fetch every item's series in one batch and reduce each to what the chart can show"""
+    fetched = fetch_items_series(zapi, items, time_from, time_till)
+    max_points = target_points(CHART_WIDTH_PX)
+    series = []
+    for item in items:
+        entry = downsample_series(fetched[str(item['itemid'])], max_points)
+        if len(items) > 1:
+            entry["label"] = f"{item['host']}: {item['name']}"
+        series.append(entry)
+    return series
+
+
+def _has_data(series: List[dict]) -> bool:
+    return any(entry["clock"].size for entry in series)
+
+
+async def render_graph(items: List[dict], period: int, title: str, zapi=None):
+    """
+    PNG of `items` over the last `period` seconds, or None when there is no data.
+
+    Served from the graph cache when possible; otherwise Zabbix is queried (logging in
+    only now if no `zapi` is given) in a worker thread and the chart is drawn in the
+    render pool.
+    """
+    time_from, time_till = graph_window(period)
+    key = cache_key(items, period, time_till)
+    cached = graph_cache.get(key)
+    if cached:
+        return cached
+
+    def load():
+        return load_series(zapi or get_zabbix_api(), items, time_from, time_till)
+
+    series = await asyncio.to_thread(load)
+    if not _has_data(series):
+        return None
+    png = await graph_renderer.render(render_line_chart, series, title)
+    graph_cache.put(key, png)
+    return png
+
+
+def render_graph_sync(items: List[dict], period: int, title: str, zapi=None):
+    """Blocking render_graph for threaded callers such as bot v2 handlers"""
+    time_from, time_till = graph_window(period)
+    key = cache_key(items, period, time_till)
+    cached = graph_cache.get(key)
+    if cached:
+        return cached
+
+    series = load_series(zapi or get_zabbix_api(), items, time_from, time_till)
+    if not _has_data(series):
+        return None
+    png = graph_renderer.render_sync(render_line_chart, series, title)
+    graph_cache.put(key, png)
+    return png
@@ -0,0 +1,234 @@
+import asyncio
+import datetime
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.dates as mdates
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Chart size; CHART_WIDTH_PX drives how far series are downsampled before rendering
+FIGSIZE = (10, 6)
+DPI = 100
+CHART_WIDTH_PX = FIGSIZE[0] * DPI
+
+# Matplotlib date number of the Unix epoch, lets us convert whole clock arrays at once
+_EPOCH_DATENUM = mdates.date2num(datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc))
+
+
+class GraphRenderTimeout(Exception):
+    """Raised when a chart is not rendered before its deadline"""
+    pass
+
+
+def clocks_to_datenum(clocks: np.ndarray) -> np.ndarray:
+    """Convert Unix timestamps to matplotlib date numbers without datetime objects"""
+    return np.asarray(clocks, dtype=np.float64) / 86400.0 + _EPOCH_DATENUM
+
+
+def _date_format(span_seconds: float) -> str:
+    if span_seconds <= 86400:
+        return '%H:%M:%S' if span_seconds <= 3600 else '%H:%M'
+    if span_seconds <= 7 * 86400:
+        return '%d/%m %H:%M'
+    return '%d/%m/%Y'
+
+
+def _figure_to_png(fig: Figure) -> bytes:
+    buf = io.BytesIO()
+    FigureCanvasAgg(fig)
+    fig.savefig(buf, format='png', dpi=DPI, bbox_inches='tight')
+    return buf.getvalue()
+
+
+def render_line_chart(series: List[dict], title: str, xlabel: str = "Thời gian", ylabel: str = "Giá trị") -> bytes:
+    """
+    Render one or more time series to PNG with the object-oriented matplotlib API.
+
+    Each series is a dict with `clock` (int array of Unix timestamps), `value` (float
+    array), optional `min`/`max` arrays drawn as a band and an optional `label`.
+
+    Runs in the render pool, so it must only use its arguments and never the global
+    pyplot state.
+    """
+    fig = Figure(figsize=FIGSIZE, dpi=DPI)
+    ax = fig.add_subplot(1, 1, 1)
+    tz = datetime.datetime.now().astimezone().tzinfo
+    span = 0
+
+    for entry in series:
+        clocks = np.asarray(entry['clock'])
+        if clocks.size == 0:
+            continue
+        span = max(span, int(clocks[-1]) - int(clocks[0]))
+        x = clocks_to_datenum(clocks)
+        line, = ax.plot(x, entry['value'], label=entry.get('label'), linewidth=1)
+        if entry.get('min') is not None and entry.get('max') is not None:
+            # Trend based series: shade the hourly min..max range around the average
+            ax.fill_between(x, entry['min'], entry['max'], color=line.get_color(), alpha=0.2, linewidth=0)
+
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.grid(True)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter(_date_format(span), tz=tz))
+    if any(entry.get('label') for entry in series):
+        ax.legend(loc='best', fontsize='small')
+    fig.autofmt_xdate()
+    return _figure_to_png(fig)
+
+
+def render_heatmap(matrix: np.ndarray, row_labels: List[str], time_from: int, bin_seconds: int, title: str) -> bytes:
+    """
+    Render a rows x time-bins count matrix (e.g. problems per host per hour) to PNG.
+
+    The figure grows with the number of rows so host labels stay readable; callers page
+    large matrices before sending them to the pool.
+    """
+    matrix = np.asarray(matrix)
+    rows, columns = matrix.shape if matrix.ndim == 2 else (0, 0)
+    fig = Figure(figsize=(FIGSIZE[0], max(3.0, 0.25 * rows + 1.5)), dpi=DPI)
+    ax = fig.add_subplot(1, 1, 1)
+
+    if rows and columns:
+        image = ax.imshow(matrix, aspect='auto', cmap='Reds', interpolation='nearest', vmin=0)
+        fig.colorbar(image, ax=ax, fraction=0.03, pad=0.02)
+        ax.set_yticks(np.arange(rows))
+        ax.set_yticklabels(row_labels, fontsize='small')
+
+        step = max(1, columns // 12)
+        ticks = np.arange(0, columns, step)
+        tz = datetime.datetime.now().astimezone().tzinfo
+        fmt = '%H:%M' if columns * bin_seconds <= 86400 else '%d/%m %Hh'
+        ax.set_xticks(ticks)
+        ax.set_xticklabels([
+            datetime.datetime.fromtimestamp(time_from + int(t) * bin_seconds, tz).strftime(fmt) for t in ticks
+        ], rotation=45, ha='right', fontsize='small')
+
+    ax.set_title(title)
+    ax.set_xlabel("Thời gian")
+    return _figure_to_png(fig)
+
+
+def _timed_render(func, args, kwargs):
+    """Runs inside a pool worker: render and measure the time spent there"""
+    started = time.perf_counter()
+    png = func(*args, **kwargs)
+    return png, time.perf_counter() - started
+
+
+class GraphRenderService:
+    """
+    Renders charts in a small process pool so matplotlib never runs on the event loop.
+
+    Every render has a deadline (GRAPH_RENDER_TIMEOUT by default) and its timing is
+    logged and kept for stats(). A render that misses its deadline cannot be cancelled
+    inside its worker, so the pool's workers are killed and a fresh pool is started;
+    otherwise later renders would queue behind it. The pool is created on first use and
+    recreated if a worker dies.
+    """
+
+    def __init__(self, max_workers: int = None, timeout: float = None):
+        self.max_workers = max_workers or Config.GRAPH_RENDER_WORKERS
+        self.timeout = timeout or Config.GRAPH_RENDER_TIMEOUT
+        self._pool = None
+        self._lock = threading.Lock()
+        self._timings = deque(maxlen=500)
+        self._timeouts = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that already runs threads is not safe
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    async def render(self, func, *args, timeout: float = None, **kwargs) -> bytes:
+        """Run `func(*args, **kwargs)` in the pool and return its PNG bytes"""
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        pool = self._get_pool()
+        try:
+            future = loop.run_in_executor(pool, _timed_render, func, args, kwargs)
+            png, render_time = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._recycle(pool)
+            self._timeouts += 1
+            logger.warning(f"{func.__name__} missed its {timeout:.0f}s render deadline")
+            raise GraphRenderTimeout(f"Vẽ biểu đồ quá {timeout:.0f} giây")
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next render
+            self.shutdown()
+            raise
+        return self._record(func, png, render_time, time.perf_counter() - started)
+
+    def render_sync(self, func, *args, timeout: float = None, **kwargs) -> bytes:
+        """Blocking render() for callers running in threads (bot v2 handlers)"""
+        timeout = timeout or self.timeout
+        started = time.perf_counter()
+        pool = self._get_pool()
+        try:
+            future = pool.submit(_timed_render, func, args, kwargs)
+            png, render_time = future.result(timeout)
+        except FutureTimeoutError:
+            self._recycle(pool)
+            self._timeouts += 1
+            logger.warning(f"{func.__name__} missed its {timeout:.0f}s render deadline")
+            raise GraphRenderTimeout(f"Vẽ biểu đồ quá {timeout:.0f} giây")
+        except BrokenProcessPool:
+            self.shutdown()
+            raise
+        return self._record(func, png, render_time, time.perf_counter() - started)
+
+    def _record(self, func, png: bytes, render_time: float, total_time: float) -> bytes:
+        self._timings.append((render_time, total_time))
+        logger.info(f"{func.__name__} rendered {len(png) // 1024}KB in {render_time:.3f}s "
+                    f"({total_time:.3f}s including pool overhead)")
+        return png
+
+    def stats(self) -> dict:
+        """Render count, average/max render and end-to-end times (seconds), timeouts"""
+        timings = list(self._timings)
+        if not timings:
+            return {"renders": 0, "avg_render": 0.0, "max_render": 0.0, "avg_total": 0.0, "timeouts": self._timeouts}
+        return {
+            "renders": len(timings),
+            "avg_render": round(sum(t[0] for t in timings) / len(timings), 3),
+            "max_render": round(max(t[0] for t in timings), 3),
+            "avg_total": round(sum(t[1] for t in timings) / len(timings), 3),
+            "timeouts": self._timeouts
+        }
+
+    def _recycle(self, pool: ProcessPoolExecutor):
+        """Kill the workers of `pool` after a missed deadline; the next render starts a new pool"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        # Renders still running in this pool fail with BrokenProcessPool
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# Global render service instance
+graph_renderer = GraphRenderService()
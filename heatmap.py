@@ -0,0 +1,60 @@
+import logging
+import math
+from typing import List, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+
+
+def bin_problems(hosts: np.ndarray, clocks: np.ndarray, time_from: int, time_till: int,
+                 bin_seconds: int = HOUR) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count problems per host per time bin.
+
+    Returns (host names, matrix) where matrix[i, j] is the number of problems of host i
+    in bin j starting at time_from + j * bin_seconds. Hosts are interned with np.unique
+    and counted with a single bincount, no per-event Python loop.
+    """
+    hosts = np.asarray(hosts)
+    clocks = np.asarray(clocks, dtype=np.int64)
+    n_bins = max(1, math.ceil((time_till - time_from) / bin_seconds))
+    mask = (clocks >= time_from) & (clocks < time_till)
+    names, host_index = np.unique(hosts[mask], return_inverse=True)
+    if names.size == 0:
+        return names, np.zeros((0, n_bins), dtype=np.int64)
+    columns = (clocks[mask] - time_from) // bin_seconds
+    matrix = np.bincount(host_index * n_bins + columns, minlength=names.size * n_bins)
+    return names, matrix.reshape(names.size, n_bins)
+
+
+def rank_hosts(names: np.ndarray, matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sort rows by total problem count, busiest host first (ties keep name order)"""
+    order = np.argsort(-matrix.sum(axis=1), kind='stable')
+    return names[order], matrix[order]
+
+
+def page_rows(names: np.ndarray, matrix: np.ndarray, page: int, page_size: int):
+    """(names, matrix, page, pages) of one page of rows; page is 1-based and clamped"""
+    pages = max(1, math.ceil(names.size / page_size))
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    return names[start:start + page_size], matrix[start:start + page_size], page, pages
+
+
+def bin_seconds_for(span: int, max_columns: int) -> int:
+    """Whole hours per column so a span fits in max_columns"""
+    return HOUR * max(1, math.ceil(span / HOUR / max_columns))
+
+
+def build_heatmap(occurrences: List[tuple], time_from: int, time_till: int, max_columns: int):
+    """(host, timestamp) rows -> ranked (names, matrix, bin_seconds)"""
+    bin_seconds = bin_seconds_for(time_till - time_from, max_columns)
+    if not occurrences:
+        return np.empty(0, dtype=object), np.zeros((0, 1), dtype=np.int64), bin_seconds
+    hosts = np.array([row[0] or "Unknown" for row in occurrences], dtype=object)
+    clocks = np.fromiter((row[1] for row in occurrences), dtype=np.int64, count=len(occurrences))
+    names, matrix = bin_problems(hosts, clocks, time_from, time_till, bin_seconds)
+    names, matrix = rank_hosts(names, matrix)
+    return names, matrix, bin_seconds
@@ -0,0 +1,216 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from typing import Dict, List
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# File layout: one header followed by packed 12-byte records
+HEADER = np.dtype([('covered_from', '<i8'), ('covered_till', '<i8')])
+RECORD = np.dtype([('clock', '<i4'), ('value', '<f8')])
+
+# Only numeric items fit the float64 value column
+CACHEABLE_VALUE_TYPES = ('0', '3')
+
+PURGE_INTERVAL = 3600
+
+
+class HistoryStore:
+    """
+    Incremental local cache of item history, one memory-mapped file per itemid.
+
+    Each file records the time range it covers and the (clock int32, value float64)
+    points in it. A request inside a cached range only asks Zabbix for points newer than
+    the cached tail (re-reading the last HISTORY_CACHE_OVERLAP seconds to catch late
+    values); points older than HISTORY_CACHE_MAX_AGE are evicted and files of items not
+    requested for that long are deleted.
+    """
+
+    def __init__(self, directory: str = None, max_age: int = None, overlap: int = None):
+        self.directory = directory or Config.HISTORY_CACHE_DIR
+        self.max_age = max_age or Config.HISTORY_CACHE_MAX_AGE
+        self.overlap = Config.HISTORY_CACHE_OVERLAP if overlap is None else overlap
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+        self._last_purge = 0.0
+        self.points_served = 0
+        self.points_fetched = 0
+
+    def _path(self, itemid: str) -> str:
+        return os.path.join(self.directory, f"{itemid}.bin")
+
+    def _lock(self, itemid: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks[itemid]
+
+    def _read(self, itemid: str):
+        """(covered_from, covered_till, records) of an item, or None when not cached"""
+        path = self._path(itemid)
+        if not os.path.exists(path):
+            return None
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if header.size == 0:
+            return None
+        count = (os.path.getsize(path) - HEADER.itemsize) // RECORD.itemsize
+        if count > 0:
+            records = np.memmap(path, dtype=RECORD, mode='r', offset=HEADER.itemsize, shape=(count,))
+        else:
+            records = np.empty(0, dtype=RECORD)
+        return int(header['covered_from'][0]), int(header['covered_till'][0]), records
+
+    def _write(self, itemid: str, covered_from: int, covered_till: int, records: np.ndarray):
+        """Replace an item's file atomically"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(itemid)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(np.array([(covered_from, covered_till)], dtype=HEADER).tobytes())
+            f.write(np.ascontiguousarray(records, dtype=RECORD).tobytes())
+        os.replace(tmp_path, path)
+
+    def _append(self, itemid: str, covered_from: int, covered_till: int, keep: int, records: np.ndarray):
+        """Drop everything after the first `keep` records, append new ones and move the tail"""
+        with open(self._path(itemid), 'r+b') as f:
+            f.truncate(HEADER.itemsize + keep * RECORD.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(records, dtype=RECORD).tobytes())
+            f.seek(0)
+            f.write(np.array([(covered_from, covered_till)], dtype=HEADER).tobytes())
+
+    @staticmethod
+    def _to_records(clocks: np.ndarray, values: np.ndarray) -> np.ndarray:
+        records = np.empty(clocks.size, dtype=RECORD)
+        records['clock'] = clocks
+        records['value'] = values
+        return records
+
+    def get_many(self, zapi, items: List[dict], time_from: int, time_till: int) -> Dict[str, tuple]:
+        """
+        History of several items as {itemid: (clock, value)}, like fetch_history_many.
+
+        Cached items whose range covers time_from are refreshed with one delta
+        history.get batch, cold items with one full batch; windows older than the
+        cache age and non-numeric items go straight to Zabbix.
+        """
+        from graph_data import fetch_history_many
+
+        now = int(time.time())
+        cutoff = now - self.max_age
+        cacheable = [item for item in items
+                     if str(item.get('value_type', '3')) in CACHEABLE_VALUE_TYPES and time_from >= cutoff]
+        cacheable_ids = {str(item['itemid']) for item in cacheable}
+        direct = [item for item in items if str(item['itemid']) not in cacheable_ids]
+
+        result = fetch_history_many(zapi, direct, time_from, time_till) if direct else {}
+        if not cacheable:
+            return result
+
+        with ExitStack() as stack:
+            for itemid in sorted(cacheable_ids):
+                stack.enter_context(self._lock(itemid))
+
+            cold, warm = [], {}
+            for item in cacheable:
+                plan = self._plan(str(item['itemid']), time_from, time_till)
+                if plan is None:
+                    cold.append(item)
+                elif plan[1] < time_till:
+                    warm[str(item['itemid'])] = (item, plan)
+
+            if cold:
+                fetched = fetch_history_many(zapi, cold, time_from, time_till)
+                for itemid, (clocks, values) in fetched.items():
+                    self.points_fetched += clocks.size
+                    self._write(itemid, time_from, time_till, self._to_records(clocks, values))
+
+            if warm:
+                refetch_from = min(plan[2] for _, plan in warm.values())
+                fetched = fetch_history_many(zapi, [item for item, _ in warm.values()], refetch_from, time_till)
+                for itemid, (clocks, values) in fetched.items():
+                    covered_from, _, start, keep = warm[itemid][1]
+                    new = clocks >= start
+                    self.points_fetched += int(new.sum())
+                    self._append(itemid, covered_from, time_till, keep, self._to_records(clocks[new], values[new]))
+
+            for item in cacheable:
+                itemid = str(item['itemid'])
+                result[itemid] = self._serve(itemid, time_from, time_till, cutoff)
+
+        self._maybe_purge()
+        return result
+
+    def _plan(self, itemid: str, time_from: int, time_till: int):
+        """
+        None when the cache cannot serve the window (missing, starts too late or has a gap),
+        else (covered_from, covered_till, refetch_from, records_to_keep).
+        """
+        state = self._read(itemid)
+        if state is None:
+            return None
+        covered_from, covered_till, records = state
+        if covered_from > time_from or covered_till < time_from - self.overlap:
+            return None
+        # Re-read the overlap so values stored late by Zabbix are not missed
+        refetch_from = max(covered_from, covered_till - self.overlap)
+        keep = int(np.searchsorted(records['clock'], refetch_from, side='left'))
+        return covered_from, covered_till, refetch_from, keep
+
+    def _serve(self, itemid: str, time_from: int, time_till: int, cutoff: int):
+        """Evict points older than cutoff and return the window as in-memory arrays"""
+        covered_from, covered_till, records = self._read(itemid)
+        if covered_from < cutoff:
+            records = np.array(records[records['clock'] >= cutoff])
+            self._write(itemid, cutoff, covered_till, records)
+        else:
+            os.utime(self._path(itemid))  # Keeps the file from being purged as unused
+        clocks = records['clock']
+        start = int(np.searchsorted(clocks, time_from, side='left'))
+        end = int(np.searchsorted(clocks, time_till, side='right'))
+        self.points_served += end - start
+        return clocks[start:end].astype(np.int64), np.array(records['value'][start:end])
+
+    def get(self, zapi, item: dict, time_from: int, time_till: int):
+        """History of one item as (clock, value) arrays sorted by clock"""
+        return self.get_many(zapi, [item], time_from, time_till)[str(item['itemid'])]
+
+    def _maybe_purge(self):
+        if time.time() - self._last_purge >= PURGE_INTERVAL:
+            self._last_purge = time.time()
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete files of items not requested within max_age; returns how many"""
+        if not os.path.isdir(self.directory):
+            return 0
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.bin') and os.path.getmtime(path) < cutoff:
+                with self._lock(name[:-4]):
+                    os.remove(path)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} expired history cache files")
+        return removed
+
+    def stats(self) -> dict:
+        """Cached items, bytes on disk, points returned and points fetched from Zabbix"""
+        files = []
+        if os.path.isdir(self.directory):
+            files = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith('.bin')]
+        return {
+            "items": len(files),
+            "bytes": sum(os.path.getsize(path) for path in files),
+            "points_served": self.points_served,
+            "points_fetched": self.points_fetched
+        }
+
+
+# Global history cache instance
+history_store = HistoryStore()
@@ -0,0 +1,86 @@
+import io
+import logging
+import threading
+from typing import Optional, Tuple
+from PIL import Image
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Quality ladder tried before the image is downscaled
+QUALITY_STEPS = (85, 75, 65, 55, 45)
+# Each downscale pass shrinks the image by this factor
+DOWNSCALE_FACTOR = 0.8
+# Never shrink screenshots below this width, text becomes unreadable
+MIN_WIDTH = 640
+
+_stats_lock = threading.Lock()
+_stats = {'images': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buf = io.BytesIO()
+    if fmt == 'PNG':
+        image.save(buf, format='PNG', optimize=True)
+    else:
+        image.save(buf, format=fmt, quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def compress_image(data: bytes, crop_box: Optional[Tuple[int, int, int, int]] = None,
+                   max_bytes: int = None, fmt: str = None) -> bytes:
+    """
+    Crop and re-encode a screenshot so it fits in `max_bytes`.
+
+    `crop_box` is (left, top, right, bottom) in image pixels and is clamped to the image.
+    The quality is lowered step by step first, then the image is downscaled, until the
+    encoded size fits the budget or MIN_WIDTH is reached. Blocking, call it from a
+    worker thread (the screenshot scheduler does).
+    """
+    max_bytes = max_bytes or Config.SCREENSHOT_MAX_BYTES
+    fmt = (fmt or Config.SCREENSHOT_FORMAT).upper()
+    if fmt == 'JPG':
+        fmt = 'JPEG'
+
+    image = Image.open(io.BytesIO(data))
+    if crop_box:
+        left, top, right, bottom = crop_box
+        left, top = max(0, int(left)), max(0, int(top))
+        right, bottom = min(image.width, int(right)), min(image.height, int(bottom))
+        if right > left and bottom > top:
+            image = image.crop((left, top, right, bottom))
+
+    if fmt in ('JPEG', 'WEBP') and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    output = None
+    while True:
+        for quality in QUALITY_STEPS:
+            output = _encode(image, fmt, quality)
+            if len(output) <= max_bytes or fmt == 'PNG':
+                break
+        if len(output) <= max_bytes or image.width * DOWNSCALE_FACTOR < MIN_WIDTH:
+            break
+        size = (int(image.width * DOWNSCALE_FACTOR), int(image.height * DOWNSCALE_FACTOR))
+        image = image.resize(size, Image.LANCZOS)
+
+    if len(output) > max_bytes:
+        logger.warning(f"Screenshot still {len(output)} bytes after compression (budget {max_bytes})")
+
+    with _stats_lock:
+        _stats['images'] += 1
+        _stats['bytes_in'] += len(data)
+        _stats['bytes_out'] += len(output)
+
+    saved = len(data) - len(output)
+    logger.info(f"Compressed screenshot {len(data) // 1024}KB -> {len(output) // 1024}KB "
+                f"({fmt} {image.width}x{image.height}, saved {saved * 100 // max(len(data), 1)}%)")
+    return output
+
+
+def get_compression_stats() -> dict:
+    """Total images processed and bytes saved by compress_image()"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+    return stats
@@ -0,0 +1,275 @@
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Per-incident caps keep memory bounded however large an incident grows
+MAX_HOSTS_PER_INCIDENT = 50  # Host names kept for display
+MAX_HOST_IDS_PER_INCIDENT = 5000  # Host name hashes kept for the distinct host count
+MAX_KEYS_PER_INCIDENT = 100
+MAX_GROUPS_PER_INCIDENT = 50
+
+# Closed incidents kept for /analyze windows
+RECENT_CLOSED = 500
+
+
+class Incident:
+    __slots__ = ('id', 'started', 'last_seen', 'events', 'hosts', 'host_ids', 'hosts_capped', 'groups', 'keys',
+                 'open_triggers', 'max_severity', 'opened')
+
+    def __init__(self, incident_id: int, clock: int):
+        self.id = incident_id
+        self.started = clock
+        self.last_seen = clock
+        self.events = 0
+        self.hosts = set()
+        self.host_ids = set()
+        self.hosts_capped = False
+        self.groups = set()
+        self.keys = Counter()
+        self.open_triggers = set()
+        self.max_severity = 0
+        self.opened = False
+
+    def summary(self) -> dict:
+        return {
+            'id': self.id,
+            'started': self.started,
+            'last_seen': self.last_seen,
+            'events': self.events,
+            'hosts': sorted(self.hosts)[:10],
+            'host_count': len(self.host_ids),
+            'hosts_capped': self.hosts_capped,
+            'groups': sorted(self.groups),
+            'open_problems': len(self.open_triggers),
+            'max_severity': self.max_severity,
+            'keys': [key for key, _ in self.keys.most_common(3)]
+        }
+
+
+class IncidentClusterer:
+    """
+    Online clustering of problem events into incidents.
+
+    A problem event joins the live incident sharing the most similarity keys with it
+    (host, host groups and tags, see INCIDENT_KEYS) whose last event is less than
+    INCIDENT_WINDOW seconds old, otherwise it starts a new one. An incident is reported
+    "opened" once it has INCIDENT_MIN_EVENTS events, "grown" on every later event and
+    "closed" when its window passes without new events. At most INCIDENT_MAX_LIVE
+    incidents are kept; the stalest is closed early when the limit is hit.
+    """
+
+    def __init__(self, window: int = None, min_events: int = None, max_live: int = None, keys: List[str] = None):
+        self.window = window or Config.INCIDENT_WINDOW
+        self.min_events = min_events or Config.INCIDENT_MIN_EVENTS
+        self.max_live = max_live or Config.INCIDENT_MAX_LIVE
+        self.key_fields = keys or Config.INCIDENT_KEYS
+        self._live: "OrderedDict[int, Incident]" = OrderedDict()  # Oldest last_seen first
+        self._key_index: Dict[str, set] = {}
+        self._trigger_index: Dict[str, int] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[dict], None]] = []
+        self.recent_closed = deque(maxlen=RECENT_CLOSED)
+        self.updates = deque(maxlen=200)
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Call `listener(update)` for every opened/grown/closed update"""
+        self._listeners.append(listener)
+
+    def _keys(self, event: dict) -> List[str]:
+        keys = []
+        if 'host' in self.key_fields:
+            keys.append(f"host:{event['host']}")
+        if 'group' in self.key_fields:
+            keys.extend(f"group:{group}" for group in event.get('groups', []))
+        if 'tag' in self.key_fields:
+            keys.extend(f"tag:{tag}" for tag in event.get('tags', []))
+        return keys
+
+    def _emit(self, kind: str, incident: Incident, updates: List[dict]):
+        update = {'type': kind, 'incident': incident.summary()}
+        updates.append(update)
+        self.updates.append(update)
+        for listener in self._listeners:
+            try:
+                listener(update)
+            except Exception as e:
+                logger.error(f"Incident listener failed: {e}")
+
+    def _close(self, incident: Incident, updates: List[dict]):
+        del self._live[incident.id]
+        for key in incident.keys:
+            members = self._key_index.get(key)
+            if members is not None:
+                members.discard(incident.id)
+                if not members:
+                    del self._key_index[key]
+        for triggerid in incident.open_triggers:
+            if self._trigger_index.get(triggerid) == incident.id:
+                del self._trigger_index[triggerid]
+        if incident.opened:
+            self.recent_closed.append(incident.summary())
+            self._emit('closed', incident, updates)
+
+    def _expire(self, now: int, updates: List[dict]):
+        while self._live:
+            incident = next(iter(self._live.values()))
+            if incident.last_seen > now - self.window:
+                break
+            self._close(incident, updates)
+
+    def _add(self, incident: Incident, event: dict, keys: List[str]):
+        incident.events += 1
+        incident.last_seen = max(incident.last_seen, event['clock'])
+        incident.max_severity = max(incident.max_severity, event.get('severity', 0))
+        host_id = hash(event['host'])
+        if host_id not in incident.host_ids:
+            if len(incident.host_ids) < MAX_HOST_IDS_PER_INCIDENT:
+                incident.host_ids.add(host_id)
+            else:
+                incident.hosts_capped = True
+            if len(incident.hosts) < MAX_HOSTS_PER_INCIDENT:
+                incident.hosts.add(event['host'])
+        for group in event.get('groups', []):
+            if len(incident.groups) < MAX_GROUPS_PER_INCIDENT:
+                incident.groups.add(group)
+        for key in keys:
+            if key in incident.keys or len(incident.keys) < MAX_KEYS_PER_INCIDENT:
+                incident.keys[key] += 1
+                self._key_index.setdefault(key, set()).add(incident.id)
+        incident.open_triggers.add(event['objectid'])
+        self._trigger_index[event['objectid']] = incident.id
+        self._live.move_to_end(incident.id)
+
+    def feed(self, events: List[dict]) -> List[dict]:
+        """Cluster new events (oldest first); returns the updates they caused"""
+        updates = []
+        with self._lock:
+            for event in events:
+                self._expire(event['clock'], updates)
+
+                if event['value'] == 0:
+                    # Recovery: the problem no longer counts as open in its incident
+                    incident_id = self._trigger_index.pop(event['objectid'], None)
+                    if incident_id in self._live:
+                        self._live[incident_id].open_triggers.discard(event['objectid'])
+                    continue
+
+                keys = self._keys(event)
+                shared = Counter(i for key in keys for i in self._key_index.get(key, ()))
+                if shared:
+                    best = max(shared, key=lambda i: (shared[i], self._live[i].last_seen))
+                    incident = self._live[best]
+                else:
+                    incident = Incident(self._next_id, event['clock'])
+                    self._next_id += 1
+                    self._live[incident.id] = incident
+                self._add(incident, event, keys)
+
+                if incident.opened:
+                    self._emit('grown', incident, updates)
+                elif incident.events >= self.min_events:
+                    incident.opened = True
+                    self._emit('opened', incident, updates)
+
+                while len(self._live) > self.max_live:
+                    self._close(next(iter(self._live.values())), updates)
+        return updates
+
+    def expire(self, now: int) -> List[dict]:
+        """Close incidents whose window has passed; call periodically when no events arrive"""
+        updates = []
+        with self._lock:
+            self._expire(now, updates)
+        return updates
+
+    def active(self) -> List[dict]:
+        """Summaries of live incidents that have been opened, largest first"""
+        with self._lock:
+            incidents = [incident.summary() for incident in self._live.values() if incident.opened]
+        return sorted(incidents, key=lambda i: i['events'], reverse=True)
+
+    def incidents(self, since: int, group: str = None) -> List[dict]:
+        """Live and recently closed incidents active since `since`, optionally touching `group`, largest first"""
+        with self._lock:
+            live = [dict(incident.summary(), live=True) for incident in self._live.values() if incident.opened]
+            closed = [dict(summary, live=False) for summary in self.recent_closed]
+        incidents = [incident for incident in live + closed
+                     if incident['last_seen'] >= since and (group is None or group in incident['groups'])]
+        return sorted(incidents, key=lambda i: i['events'], reverse=True)
+
+
+def host_count_label(incident: dict) -> str:
+    """Distinct host count of an incident summary, 'N+' once the count is capped"""
+    return f"{incident['host_count']}+" if incident.get('hosts_capped') else str(incident['host_count'])
+
+
+def describe_update(update: dict) -> Optional[str]:
+    """Notification text of an opened/closed update (None for grown, which would be too chatty)"""
+    incident = update['incident']
+    hosts = ', '.join(incident['hosts'][:5])
+    if incident['host_count'] > 5:
+        hosts += f" và {incident['host_count'] - 5}{'+' if incident.get('hosts_capped') else ''} hosts khác"
+    if update['type'] == 'opened':
+        return (f"🚨 Incident #{incident['id']} mở: {incident['events']} problems trên "
+                f"{host_count_label(incident)} hosts ({hosts})\nĐiểm chung: {', '.join(incident['keys'])}")
+    if update['type'] == 'closed':
+        minutes = max(1, (incident['last_seen'] - incident['started']) // 60)
+        return (f"✅ Incident #{incident['id']} đã lắng xuống sau {minutes} phút: "
+                f"{incident['events']} problems trên {host_count_label(incident)} hosts ({hosts})")
+    return None
+
+
+class IncidentNotices:
+    """
+    Incident messages waiting to be sent to the admins (clusterer listener).
+
+    Updates caused by backfilled or catch-up events (the first sync, or the sync after
+    an outage) only build cluster state: an incident is announced once its newest event
+    is less than INCIDENT_WINDOW old, and its closing only if it was announced.
+    """
+
+    MAX_ANNOUNCED = 1000
+
+    def __init__(self, window: int = None, max_pending: int = 50):
+        self.window = window or Config.INCIDENT_WINDOW
+        self._pending = deque(maxlen=max_pending)
+        self._announced: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, update: dict, now: int = None):
+        if not Config.INCIDENT_NOTIFY:
+            return
+        now = now or int(time.time())
+        incident = update['incident']
+        with self._lock:
+            if update['type'] == 'closed':
+                if incident['id'] not in self._announced:
+                    return
+                del self._announced[incident['id']]
+                text = describe_update(update)
+            else:
+                # Opened, or grown into the present after opening during a catch-up
+                if incident['id'] in self._announced or incident['last_seen'] < now - self.window:
+                    return
+                self._announced[incident['id']] = None
+                if len(self._announced) > self.MAX_ANNOUNCED:
+                    self._announced.popitem(last=False)
+                text = describe_update(dict(update, type='opened'))
+            self._pending.append(text)
+
+    def drain(self) -> List[str]:
+        """Pending messages, oldest first"""
+        with self._lock:
+            texts = list(self._pending)
+            self._pending.clear()
+        return texts
+
+
+# Global clusterer fed by event_sync
+incident_clusterer = IncidentClusterer()
@@ -0,0 +1,121 @@
+import logging
+from typing import Dict, List, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CRITICAL_SEVERITY = 4
+SEVERITY_LEVELS = 6
+
+
+def _intern(values, index: Dict[str, int]) -> np.ndarray:
+    """Map names to dense int32 ids, extending `index` with unseen names"""
+    return np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int32)
+
+
+def _top(totals: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n largest totals, largest first (argpartition, then sort only those n)"""
+    n = min(n, totals.size)
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-totals, n - 1)[:n]
+    return candidates[np.lexsort((candidates, -totals[candidates]))]
+
+
+class ProblemBatch:
+    """
+    Problems as parallel NumPy columns instead of a list of dicts.
+
+    Hosts and patterns are interned into int32 ids (names kept once in `host_names` /
+    `pattern_names`); severity, clock, duration and count are flat arrays. `count` is 1
+    for single events and the row count for pre-aggregated summary rows; `duration` is
+    the time to recovery in seconds, -1 while the problem is open or unknown. All
+    aggregates are bincount group-bys over the id columns.
+    """
+
+    def __init__(self, host_names: List[str], pattern_names: List[str], host: np.ndarray, pattern: np.ndarray,
+                 severity: np.ndarray, clock: np.ndarray, duration: np.ndarray, count: np.ndarray):
+        self.host_names = np.array(host_names, dtype=object)
+        self.pattern_names = np.array(pattern_names, dtype=object)
+        self.host = host
+        self.pattern = pattern
+        self.severity = severity
+        self.clock = clock
+        self.duration = duration
+        self.count = count
+
+    def __len__(self):
+        return self.host.size
+
+    @classmethod
+    def from_events(cls, problems: List[dict]) -> "ProblemBatch":
+        """Build from problem.get-shaped rows (`r_clock` gives the recovery time when known)"""
+        size = len(problems)
+        hosts: Dict[str, int] = {}
+        patterns: Dict[str, int] = {}
+        host = _intern((p['hosts'][0]['host'] if p.get('hosts') else "Unknown" for p in problems), hosts)
+        pattern = _intern((p['name'] for p in problems), patterns)
+        severity = np.fromiter((int(p['severity']) for p in problems), dtype=np.int8, count=size)
+        clock = np.fromiter((int(p['clock']) for p in problems), dtype=np.int64, count=size)
+        r_clock = np.fromiter((int(p.get('r_clock') or -1) for p in problems), dtype=np.int64, count=size)
+        duration = np.where(r_clock >= 0, r_clock - clock, -1)
+        return cls(list(hosts), list(patterns), host, pattern, severity, clock, duration,
+                   np.ones(size, dtype=np.int64))
+
+    @classmethod
+    def from_summary(cls, rows: List[tuple]) -> "ProblemBatch":
+        """Build from (host, severity, name, count) rows as returned by get_problem_summary"""
+        size = len(rows)
+        hosts: Dict[str, int] = {}
+        patterns: Dict[str, int] = {}
+        host = _intern((row[0] for row in rows), hosts)
+        pattern = _intern((row[2] for row in rows), patterns)
+        severity = np.fromiter((row[1] for row in rows), dtype=np.int8, count=size)
+        count = np.fromiter((row[3] for row in rows), dtype=np.int64, count=size)
+        return cls(list(hosts), list(patterns), host, pattern, severity, np.zeros(size, dtype=np.int64),
+                   np.full(size, -1, dtype=np.int64), count)
+
+    def total(self) -> int:
+        return int(self.count.sum())
+
+    def host_count(self) -> int:
+        return int(np.count_nonzero(np.bincount(self.host, weights=self.count, minlength=self.host_names.size)))
+
+    def severity_distribution(self) -> Dict[int, int]:
+        totals = np.bincount(self.severity, weights=self.count, minlength=SEVERITY_LEVELS)
+        return {int(severity): int(totals[severity]) for severity in np.flatnonzero(totals)}
+
+    def top_hosts(self, n: int = 5) -> List[Tuple[str, int, float]]:
+        """(host, problems, average severity) of the n hosts with most problems"""
+        totals = np.bincount(self.host, weights=self.count, minlength=self.host_names.size)
+        severity_sums = np.bincount(self.host, weights=self.count * self.severity, minlength=self.host_names.size)
+        return [(self.host_names[i], int(totals[i]), float(severity_sums[i] / totals[i]))
+                for i in _top(totals, n) if totals[i]]
+
+    def top_patterns(self, n: int = 3, sample: int = 3) -> List[Tuple[str, int, int, List[str]]]:
+        """(pattern, problems, distinct hosts, up to `sample` host names) of the n most frequent patterns"""
+        totals = np.bincount(self.pattern, weights=self.count, minlength=self.pattern_names.size)
+        pairs = np.unique(self.pattern.astype(np.int64) * max(self.host_names.size, 1) + self.host)
+        pair_pattern, pair_host = np.divmod(pairs, max(self.host_names.size, 1))
+        host_counts = np.bincount(pair_pattern, minlength=self.pattern_names.size)
+        starts = np.searchsorted(pair_pattern, np.arange(self.pattern_names.size))
+        return [(self.pattern_names[i], int(totals[i]), int(host_counts[i]),
+                 list(self.host_names[pair_host[starts[i]:starts[i] + min(sample, host_counts[i])]]))
+                for i in _top(totals, n) if totals[i]]
+
+    def critical_hosts(self, min_severity: int = CRITICAL_SEVERITY) -> List[str]:
+        return sorted(self.host_names[np.unique(self.host[self.severity >= min_severity])])
+
+    def mttr(self) -> float:
+        """Mean time to recovery in seconds over resolved problems, nan when none resolved"""
+        resolved = self.duration >= 0
+        if not resolved.any():
+            return float('nan')
+        return float(np.average(self.duration[resolved], weights=self.count[resolved]))
+
+    def mttr_by_severity(self) -> Dict[int, float]:
+        resolved = self.duration >= 0
+        weights = self.count[resolved]
+        counts = np.bincount(self.severity[resolved], weights=weights, minlength=SEVERITY_LEVELS)
+        sums = np.bincount(self.severity[resolved], weights=self.duration[resolved] * weights, minlength=SEVERITY_LEVELS)
+        return {int(severity): float(sums[severity] / counts[severity]) for severity in np.flatnonzero(counts)}
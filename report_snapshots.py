@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from config import Config
+from db import save_analysis_report, get_analysis_reports
+
+logger = logging.getLogger(__name__)
+
+# (window seconds, host group or None)
+SnapshotKey = Tuple[int, Optional[str]]
+
+
+class ReportSnapshots:
+    """
+    Pre-rendered /analyze reports, recomputed in the background.
+
+    Every (window, group) that has been requested within ANALYZE_SNAPSHOT_KEEP seconds
+    (and every pinned key) is rebuilt by refresh_due() once its snapshot is older than
+    ANALYZE_REFRESH_INTERVAL, or earlier once ANALYZE_REFRESH_EVENTS new events or any
+    high/disaster problem have been synced since it was built. Snapshots are stored in
+    the database so a restarted bot can answer straight away.
+    """
+
+    def __init__(self, builder: Callable[[int, Optional[str]], str], refresh_interval: int = None,
+                 change_threshold: int = None, keep: int = None, db_path: str = None,
+                 pinned: List[SnapshotKey] = ()):
+        self.builder = builder
+        self.refresh_interval = refresh_interval or Config.ANALYZE_REFRESH_INTERVAL
+        self.change_threshold = change_threshold or Config.ANALYZE_REFRESH_EVENTS
+        self.keep = keep or Config.ANALYZE_SNAPSHOT_KEEP
+        self.db_path = db_path or Config.DB_PATH
+        self._snapshots: Dict[SnapshotKey, Tuple[str, int]] = {}
+        self._pinned = set(pinned)
+        self._requested: Dict[SnapshotKey, float] = {key: time.time() for key in pinned}
+        self._changes: Dict[SnapshotKey, int] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[SnapshotKey, threading.Lock] = {}
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        for window, group, report, generated_at in get_analysis_reports(self.db_path):
+            self._snapshots.setdefault((window, group or None), (report, generated_at))
+
+    def get(self, key: SnapshotKey) -> Optional[Tuple[str, int]]:
+        """(report, generated_at) of the latest snapshot, None if there is none yet; keeps the key tracked"""
+        with self._lock:
+            self._load()
+            self._requested[key] = time.time()
+            return self._snapshots.get(key)
+
+    def refresh(self, key: SnapshotKey) -> Tuple[str, int]:
+        """Rebuild one snapshot now; concurrent refreshes of the same key share one build"""
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+            started = time.time()
+        with build_lock:
+            with self._lock:
+                current = self._snapshots.get(key)
+                if current and current[1] >= started:
+                    return current
+                self._changes[key] = 0
+            report = self.builder(*key)
+            snapshot = (report, int(time.time()))
+            with self._lock:
+                self._snapshots[key] = snapshot
+            save_analysis_report(key[0], key[1] or '', report, snapshot[1], self.db_path)
+            return snapshot
+
+    def note_events(self, events: List[dict]):
+        """Event sync listener: count changes against every tracked snapshot"""
+        if not events:
+            return
+        weight = len(events)
+        if any(event['value'] == 1 and event.get('severity', 0) >= 4 for event in events):
+            weight = self.change_threshold
+        with self._lock:
+            for key in self._requested:
+                self._changes[key] = self._changes.get(key, 0) + weight
+
+    def invalidate(self):
+        """Make every tracked snapshot due, e.g. when new anomalies change the predictions"""
+        with self._lock:
+            for key in self._requested:
+                self._changes[key] = self.change_threshold
+
+    def due(self, now: float = None) -> List[SnapshotKey]:
+        """Tracked keys whose snapshot is missing, stale or behind on events"""
+        now = now or time.time()
+        with self._lock:
+            self._load()
+            for key, requested in list(self._requested.items()):
+                if now - requested > self.keep and key not in self._pinned:
+                    del self._requested[key]
+                    self._changes.pop(key, None)
+            return [key for key in self._requested
+                    if key not in self._snapshots
+                    or now - self._snapshots[key][1] >= self.refresh_interval
+                    or self._changes.get(key, 0) >= self.change_threshold]
+
+    def refresh_due(self) -> int:
+        """Rebuild every due snapshot; returns how many were rebuilt"""
+        rebuilt = 0
+        for key in self.due():
+            try:
+                self.refresh(key)
+                rebuilt += 1
+            except Exception as e:
+                logger.error(f"Error refreshing analysis snapshot {key}: {e}")
+        return rebuilt
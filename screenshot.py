@@ -2,6 +2,10 @@ import os
 import logging
 import time
 import io
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -11,46 +15,228 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 from utils import retry, validate_url
+from image_processing import compress_image
 from config import Config
+from screenshot_queue import screenshot_scheduler, PRIORITY_ALERT, PRIORITY_INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
-@retry(tries=3, delay=5, backoff=2)
-async def take_screenshot(url: str) -> bytes:
-    """Take screenshot with retry mechanism and improved error handling"""
-    if not validate_url(url):
-        logger.error(f"Invalid URL: {url}")
-        raise ValueError(f"Invalid URL: {url}")
-    
+# Injected into every new document so we can tell when XHR/fetch traffic has settled
+NETWORK_TRACKER_SCRIPT = """
+(function() {
+    if (window.__pendingRequests !== undefined) { return; }
+    window.__pendingRequests = 0;
+    var done = function() { window.__pendingRequests = Math.max(0, window.__pendingRequests - 1); };
+    var origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        window.__pendingRequests++;
+        this.addEventListener('loadend', done);
+        return origSend.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var origFetch = window.fetch;
+        window.fetch = function() {
+            window.__pendingRequests++;
+            return origFetch.apply(this, arguments).finally(done);
+        };
+    }
+})();
+"""
+
+# Returns [readyState, pending requests, loading Zabbix widgets, layout signature]
+READINESS_PROBE_SCRIPT = """
+var body = document.body;
+return [
+    document.readyState,
+    window.__pendingRequests || 0,
+    document.querySelectorAll('.is-loading, .preloader').length,
+    body ? [body.scrollWidth, body.scrollHeight, document.getElementsByTagName('*').length].join('x') : ''
+];
+"""
+
+# Returns the element's box in device pixels, or null when the selector matches nothing
+ELEMENT_BOX_SCRIPT = """
+var el = document.querySelector(arguments[0]);
+if (!el) { return null; }
+var rect = el.getBoundingClientRect();
+var ratio = window.devicePixelRatio || 1;
+return [rect.left * ratio, rect.top * ratio, rect.right * ratio, rect.bottom * ratio];
+"""
+
+# Returns the box of the first dashboard widget whose header contains arguments[0]
+WIDGET_BOX_SCRIPT = """
+var name = arguments[0].toLowerCase();
+var widgets = document.querySelectorAll('.dashboard-grid-widget, .dashboard-widget');
+var ratio = window.devicePixelRatio || 1;
+for (var i = 0; i < widgets.length; i++) {
+    var head = widgets[i].querySelector('h4');
+    if (head && head.textContent.toLowerCase().indexOf(name) !== -1) {
+        widgets[i].scrollIntoView({block: 'nearest'});
+        var rect = widgets[i].getBoundingClientRect();
+        return [rect.left * ratio, rect.top * ratio, rect.right * ratio, rect.bottom * ratio];
+    }
+}
+return null;
+"""
+
+# Number of consecutive identical layout probes required before a page counts as stable
+STABLE_LAYOUT_POLLS = 2
+
+# Recent readiness waits (seconds waited, timed out) for tuning SCREENSHOT_READY_TIMEOUT
+_ready_waits = deque(maxlen=200)
+
+
+@contextmanager
+def capture_phase(timings: Optional[dict], name: str):
+    """Add the time spent in the block to timings[name] (no-op when timings is None)"""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.monotonic() - started
+
+
+def create_driver():
+    """Create a headless Chrome driver with the network tracker installed"""
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-extensions")
+    # Keep background tabs rendering so pooled dashboard tabs load in parallel
+    chrome_options.add_argument("--disable-background-timer-throttling")
+    chrome_options.add_argument("--disable-renderer-backgrounding")
+    chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+    chrome_options.add_argument(f"--window-size={Config.SCREENSHOT_WIDTH},{Config.SCREENSHOT_HEIGHT}")
+    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
+
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+    driver.set_page_load_timeout(30)
+    install_network_tracker(driver)
+    return driver
+
+
+def install_network_tracker(driver):
+    """Register the XHR/fetch tracker for every document the driver loads"""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_TRACKER_SCRIPT})
+    except Exception as e:
+        # Not fatal: readiness falls back to document state, widget markers and layout
+        logger.warning(f"Could not install network tracker: {str(e)}")
+
+
+def wait_for_page_ready(driver, timeout: float = None) -> float:
+    """
+    Wait until the current page is ready to be captured and return the seconds waited.
+
+    A page is ready when the document has finished loading, no XHR/fetch request is in
+    flight, no Zabbix widget shows a loading marker and the layout stayed unchanged for
+    STABLE_LAYOUT_POLLS consecutive probes. The wait never exceeds `timeout`
+    (SCREENSHOT_READY_TIMEOUT by default); on timeout the page is captured as it is.
+    """
+    timeout = Config.SCREENSHOT_READY_TIMEOUT if timeout is None else timeout
+    start = time.monotonic()
+    deadline = start + timeout
+    last_layout = None
+    stable_polls = 0
+    timed_out = True
+
+    while True:
+        try:
+            ready_state, pending, loading, layout = driver.execute_script(READINESS_PROBE_SCRIPT)
+        except WebDriverException as e:
+            logger.debug(f"Readiness probe failed: {str(e)}")
+            ready_state, pending, loading, layout = None, 0, 0, None
+
+        if ready_state == 'complete' and not pending and not loading and layout == last_layout:
+            stable_polls += 1
+        else:
+            stable_polls = 0
+        last_layout = layout
+
+        if stable_polls >= STABLE_LAYOUT_POLLS:
+            timed_out = False
+            break
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(min(Config.SCREENSHOT_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    waited = time.monotonic() - start
+    _ready_waits.append((waited, timed_out))
+    if timed_out:
+        logger.warning(f"Page not ready after {waited:.2f}s, capturing anyway")
+    else:
+        logger.info(f"Page ready after {waited:.2f}s")
+    return waited
+
+
+def get_ready_wait_stats() -> dict:
+    """Summarize recent readiness waits (count, avg/max seconds, timeouts)"""
+    if not _ready_waits:
+        return {"count": 0, "avg_wait": 0.0, "max_wait": 0.0, "timeouts": 0}
+    waits = [waited for waited, _ in _ready_waits]
+    return {
+        "count": len(waits),
+        "avg_wait": round(sum(waits) / len(waits), 3),
+        "max_wait": round(max(waits), 3),
+        "timeouts": sum(1 for _, timed_out in _ready_waits if timed_out)
+    }
+
+
+def element_box(driver, selector: str):
+    """Return the (left, top, right, bottom) pixel box of `selector`, or None"""
+    if not selector:
+        return None
+    try:
+        box = driver.execute_script(ELEMENT_BOX_SCRIPT, selector)
+    except WebDriverException as e:
+        logger.debug(f"Could not locate {selector}: {str(e)}")
+        return None
+    return tuple(box) if box else None
+
+
+def finish_capture(driver, selector: str = None, timings: dict = None) -> bytes:
+    """Grab the viewport, crop it to `selector` and compress it to the size budget"""
+    with capture_phase(timings, 'capture'):
+        png = driver.get_screenshot_as_png()
+        crop_box = element_box(driver, selector)
+    with capture_phase(timings, 'encode'):
+        return compress_image(png, crop_box=crop_box)
+
+
+# Runs in a scheduler worker and holds a Chrome slot while it sleeps: one quick retry only
+@retry(tries=2, delay=1)
+def capture_screenshot(url: str, selector: str = None, timings: dict = None) -> bytes:
+    """
+    Capture a page with one quick retry and improved error handling (blocking).
+
+    When a `timings` dict is given, seconds spent per phase (driver_start, navigation,
+    wait, capture, encode) are added to it.
+    """
     driver = None
     try:
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument(f"--window-size={Config.SCREENSHOT_WIDTH},{Config.SCREENSHOT_HEIGHT}")
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
-
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-        driver.set_page_load_timeout(30)
-        
+        with capture_phase(timings, 'driver_start'):
+            driver = create_driver()
+
         logger.info(f"Taking screenshot of: {url}")
-        driver.get(url)
-        
-        # Wait for page to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        
-        # Additional wait for dynamic content
-        time.sleep(3)
-        
-        screenshot = driver.get_screenshot_as_png()
+        with capture_phase(timings, 'navigation'):
+            driver.get(url)
+
+            # Wait for page to load
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            )
+
+        # Wait for dynamic content instead of sleeping a fixed time
+        with capture_phase(timings, 'wait'):
+            wait_for_page_ready(driver)
+
+        screenshot = finish_capture(driver, selector, timings)
         logger.info(f"Screenshot taken successfully for: {url}")
         return screenshot
-        
+
     except TimeoutException:
         logger.error(f"Timeout taking screenshot of: {url}")
         raise
@@ -66,3 +252,165 @@ async def take_screenshot(url: str) -> bytes:
                 driver.quit()
             except Exception as e:
                 logger.error(f"Error closing driver: {str(e)}")
+
+
+def dashboard_url(dashboardid: str) -> str:
+    """URL of a Zabbix dashboard by ID"""
+    return f"{Config.ZABBIX_URL.rstrip('/')}/zabbix.php?action=dashboard.view&dashboardid={dashboardid}"
+
+
+def url_dashboardid(url: str) -> Optional[str]:
+    """The dashboardid query parameter of a URL, None when it has none"""
+    return parse_qs(urlparse(url).query).get('dashboardid', [None])[0]
+
+
+def dashboard_loaded(dashboardid: str, old_document):
+    """
+    Wait condition: the tab has left `old_document` and shows exactly `dashboardid`.
+
+    A substring check on the URL would accept dashboard 10 while waiting for 1, and the
+    URL alone cannot tell a reload of the same dashboard from the page it replaces.
+    """
+    stale = EC.staleness_of(old_document)
+    return lambda driver: stale(driver) and url_dashboardid(driver.current_url) == dashboardid
+
+
+def login_zabbix(driver):
+    """Log in to the Zabbix web UI with the configured user"""
+    driver.get(Config.ZABBIX_URL)
+
+    # Wait for the login form instead of a fixed sleep
+    username_field = WebDriverWait(driver, Config.SCREENSHOT_READY_TIMEOUT).until(
+        EC.presence_of_element_located((By.NAME, "name"))
+    )
+    password_field = driver.find_element("name", "password")
+
+    username_field.send_keys(Config.ZABBIX_USER)
+    password_field.send_keys(Config.ZABBIX_PASSWORD)
+
+    login_button = driver.find_element("xpath", "//button[@type='submit']")
+    login_button.click()
+
+    WebDriverWait(driver, Config.SCREENSHOT_READY_TIMEOUT).until(EC.staleness_of(login_button))
+
+
+def capture_dashboard(selector: str = None, timings: dict = None) -> bytes:
+    """Log in to the Zabbix web UI and capture the landing dashboard (blocking)"""
+    selector = selector or Config.SCREENSHOT_DASHBOARD_SELECTOR
+    with capture_phase(timings, 'driver_start'):
+        driver = create_driver()
+    try:
+        with capture_phase(timings, 'navigation'):
+            login_zabbix(driver)
+
+        # Wait until the dashboard widgets have loaded and the layout settled
+        with capture_phase(timings, 'wait'):
+            wait_for_page_ready(driver)
+
+        return finish_capture(driver, selector, timings)
+    finally:
+        driver.quit()
+
+
+def capture_dashboards(targets: List[Tuple[str, Optional[str]]], timings: dict = None) -> List[Tuple[str, bytes]]:
+    """
+    Capture several dashboards or widgets with one login (blocking).
+
+    `targets` is a list of (dashboardid, widget name or None). Every dashboard gets its own
+    tab, at most SCREENSHOT_MAX_TABS at a time; all tabs of a batch start loading before the
+    first one is waited on, so their load times overlap. Returns (caption, image) pairs in
+    the order of `targets`.
+    """
+    with capture_phase(timings, 'driver_start'):
+        driver = create_driver()
+    try:
+        with capture_phase(timings, 'navigation'):
+            login_zabbix(driver)
+        first_tab = driver.current_window_handle
+
+        # Keep the order in which dashboards were requested
+        dashboards = {}
+        for dashboardid, widget in targets:
+            dashboards.setdefault(dashboardid, []).append(widget)
+        dashboard_ids = list(dashboards)
+
+        images = {}
+        for offset in range(0, len(dashboard_ids), Config.SCREENSHOT_MAX_TABS):
+            batch = dashboard_ids[offset:offset + Config.SCREENSHOT_MAX_TABS]
+            tabs = []
+            for index, dashboardid in enumerate(batch):
+                if index == 0:
+                    driver.switch_to.window(first_tab)
+                else:
+                    driver.switch_to.new_window('tab')
+                # Navigate without blocking on the load event so tabs load concurrently
+                with capture_phase(timings, 'navigation'):
+                    old_document = driver.find_element(By.TAG_NAME, 'html')
+                    driver.execute_script("window.location.href = arguments[0];", dashboard_url(dashboardid))
+                tabs.append((dashboardid, driver.current_window_handle, old_document))
+
+            for dashboardid, handle, old_document in tabs:
+                driver.switch_to.window(handle)
+                # A reused tab keeps showing its previous page until the navigation commits
+                with capture_phase(timings, 'wait'):
+                    WebDriverWait(driver, Config.SCREENSHOT_READY_TIMEOUT).until(
+                        dashboard_loaded(dashboardid, old_document)
+                    )
+                    wait_for_page_ready(driver)
+                for widget in dashboards[dashboardid]:
+                    images[(dashboardid, widget)] = _capture_target(driver, dashboardid, widget, timings)
+
+            # Close the extra tabs of this batch, the first one is reused
+            for _, handle, _ in tabs:
+                if handle != first_tab:
+                    driver.switch_to.window(handle)
+                    driver.close()
+            driver.switch_to.window(first_tab)
+
+        return [images[target] for target in targets]
+    finally:
+        driver.quit()
+
+
+def _capture_target(driver, dashboardid: str, widget: Optional[str], timings: dict = None) -> Tuple[str, bytes]:
+    """Capture a whole dashboard or one of its widgets in the current tab"""
+    caption = f"Dashboard {dashboardid}"
+    crop_box = None
+    if widget:
+        try:
+            box = driver.execute_script(WIDGET_BOX_SCRIPT, widget)
+        except WebDriverException as e:
+            logger.debug(f"Could not locate widget {widget}: {str(e)}")
+            box = None
+        if box:
+            crop_box = tuple(box)
+            caption += f" - {widget}"
+        else:
+            caption += f" (không tìm thấy widget '{widget}')"
+    if crop_box is None:
+        crop_box = element_box(driver, Config.SCREENSHOT_DASHBOARD_SELECTOR)
+
+    with capture_phase(timings, 'capture'):
+        png = driver.get_screenshot_as_png()
+    with capture_phase(timings, 'encode'):
+        return caption, compress_image(png, crop_box=crop_box)
+
+
+async def take_screenshot(url: str, priority: int = PRIORITY_ALERT) -> bytes:
+    """Queue a screenshot of `url` on the shared scheduler and wait for the PNG"""
+    if not validate_url(url):
+        logger.error(f"Invalid URL: {url}")
+        raise ValueError(f"Invalid URL: {url}")
+
+    return await screenshot_scheduler.run(url, capture_screenshot, url, priority=priority)
+
+
+async def take_dashboard_screenshot() -> bytes:
+    """Queue an interactive dashboard capture ahead of alert screenshots"""
+    return await screenshot_scheduler.run('dashboard', capture_dashboard, priority=PRIORITY_INTERACTIVE)
+
+
+async def take_dashboard_screenshots(targets: List[Tuple[str, Optional[str]]]) -> List[Tuple[str, bytes]]:
+    """Queue an interactive capture of several dashboards/widgets as one browser job"""
+    key = 'dashboards:' + ';'.join(f"{dashboardid}/{widget or ''}" for dashboardid, widget in targets)
+    return await screenshot_scheduler.run(key, capture_dashboards, targets, priority=PRIORITY_INTERACTIVE)
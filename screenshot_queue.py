@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower runs first
+PRIORITY_INTERACTIVE = 0  # user is waiting on /dashboard
+PRIORITY_ALERT = 10       # screenshots attached to alerts
+
+
+class ScreenshotQueueFull(Exception):
+    """Raised when the screenshot queue cannot accept another job"""
+    pass
+
+
+class ScreenshotJobExpired(Exception):
+    """Raised when a job waited in the queue longer than its max age"""
+    pass
+
+
+class _Job:
+    def __init__(self, key, func, args, priority, deadline):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.started = False
+        self.waiters = []
+
+    def settle(self, result=None, error=None):
+        for waiter in self.waiters:
+            # Waiters may be cancelled by their caller at any time, even between a done() check and the set
+            try:
+                if error is not None:
+                    waiter.set_exception(error)
+                else:
+                    waiter.set_result(result)
+            except InvalidStateError:
+                pass
+
+    def abandoned(self) -> bool:
+        return all(waiter.cancelled() for waiter in self.waiters)
+
+
+class ScreenshotScheduler:
+    """
+    Central queue for browser work with a concurrency cap and priority classes.
+
+    Jobs with the same key share one execution while queued or running, the queue is
+    bounded (lower priority jobs are shed first) and jobs older than their max age are
+    dropped instead of started. Workers are threads, so both the asyncio bot (`run`)
+    and the telebot bot (`submit(...).result()`) can use the same instance.
+    """
+
+    def __init__(self, max_concurrency: int = None, max_queue_size: int = None, max_job_age: float = None):
+        self.max_concurrency = max_concurrency or Config.SCREENSHOT_MAX_CONCURRENCY
+        self.max_queue_size = max_queue_size or Config.SCREENSHOT_QUEUE_SIZE
+        self.max_job_age = max_job_age or Config.SCREENSHOT_JOB_MAX_AGE
+        self._cond = threading.Condition()
+        self._heap = []
+        self._jobs = {}  # key -> queued or running job
+        self._seq = itertools.count()
+        self._workers = []
+        self._running = 0
+        self._stopped = False
+        self._waits = deque(maxlen=500)
+        self._counters = {'completed': 0, 'failed': 0, 'deduplicated': 0, 'rejected': 0, 'expired': 0}
+
+    def submit(self, key, func, *args, priority: int = PRIORITY_ALERT, max_age: float = None) -> Future:
+        """Queue `func(*args)` under `key` and return a Future for its result"""
+        waiter = Future()
+        deadline = time.monotonic() + (max_age or self.max_job_age)
+
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Screenshot scheduler is stopped")
+
+            job = self._jobs.get(key)
+            if job is not None:
+                # Same target already queued or running: share its result
+                job.waiters.append(waiter)
+                job.deadline = max(job.deadline, deadline)
+                if not job.started and priority < job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._seq), job))
+                self._counters['deduplicated'] += 1
+                return waiter
+
+            if self._queued_count() >= self.max_queue_size and not self._shed_for(priority):
+                self._counters['rejected'] += 1
+                raise ScreenshotQueueFull(f"Screenshot queue is full ({self.max_queue_size} jobs)")
+
+            job = _Job(key, func, args, priority, deadline)
+            job.waiters.append(waiter)
+            self._jobs[key] = job
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._ensure_workers()
+            self._cond.notify()
+
+        return waiter
+
+    async def run(self, key, func, *args, priority: int = PRIORITY_ALERT, max_age: float = None):
+        """Async wrapper around submit() for the python-telegram-bot handlers"""
+        return await asyncio.wrap_future(self.submit(key, func, *args, priority=priority, max_age=max_age))
+
+    def stats(self) -> dict:
+        """Queue depth, running jobs, queue wait times (seconds) and counters"""
+        with self._cond:
+            waits = sorted(self._waits)
+            stats = {
+                'queued': self._queued_count(),
+                'running': self._running,
+                'max_concurrency': self.max_concurrency,
+                'avg_wait': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'p95_wait': round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                'max_wait': round(waits[-1], 3) if waits else 0.0,
+            }
+            stats.update(self._counters)
+            return stats
+
+    def shutdown(self):
+        """Stop the workers and fail every job still queued"""
+        with self._cond:
+            self._stopped = True
+            for job in list(self._jobs.values()):
+                if not job.started:
+                    job.settle(error=RuntimeError("Screenshot scheduler stopped"))
+                    del self._jobs[job.key]
+            self._heap.clear()
+            self._cond.notify_all()
+
+    def _queued_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.started)
+
+    def _shed_for(self, priority: int) -> bool:
+        """Drop the newest job of the worst priority class to admit a more urgent one"""
+        queued = [job for job in self._jobs.values() if not job.started and job.priority > priority]
+        if not queued:
+            return False
+        victim = max(queued, key=lambda job: (job.priority, job.enqueued_at))
+        del self._jobs[victim.key]
+        victim.started = True  # makes the heap entry a no-op
+        victim.settle(error=ScreenshotQueueFull("Dropped in favour of a higher priority screenshot"))
+        self._counters['rejected'] += 1
+        logger.warning(f"Screenshot queue full, dropped job {victim.key}")
+        return True
+
+    def _ensure_workers(self):
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        while len(self._workers) < self.max_concurrency:
+            worker = threading.Thread(target=self._worker, name=f"screenshot-worker-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_job(self):
+        """Pop the next runnable job, dropping stale and abandoned ones (lock held)"""
+        while self._heap:
+            priority, _, job = heapq.heappop(self._heap)
+            if job.started or priority != job.priority:
+                continue
+            if job.abandoned():
+                del self._jobs[job.key]
+                continue
+            if time.monotonic() > job.deadline:
+                del self._jobs[job.key]
+                self._counters['expired'] += 1
+                waited = time.monotonic() - job.enqueued_at
+                logger.warning(f"Dropping stale screenshot job {job.key} after {waited:.1f}s in queue")
+                job.settle(error=ScreenshotJobExpired(f"Screenshot job expired after {waited:.1f}s in queue"))
+                continue
+            return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._stopped:
+                        return
+                    self._cond.wait()
+                    job = self._next_job()
+                job.started = True
+                self._running += 1
+                waited = time.monotonic() - job.enqueued_at
+                self._waits.append(waited)
+
+            logger.info(f"Screenshot job {job.key} started after {waited:.2f}s in queue")
+            result, error = None, None
+            try:
+                result = job.func(*job.args)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._running -= 1
+                self._jobs.pop(job.key, None)
+                self._counters['failed' if error is not None else 'completed'] += 1
+            job.settle(result=result, error=error)
+
+
+# Global scheduler instance
+screenshot_scheduler = ScreenshotScheduler()
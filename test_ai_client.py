@@ -0,0 +1,75 @@
+import asyncio
+import time
+import pytest
+from aiohttp import web
+from ai_client import AIClient, AIError
+
+
+async def _completion(request):
+    body = await request.json()
+    if request.headers.get("Authorization") != "Bearer key":
+        return web.Response(status=401, text="unauthorized")
+    if body["messages"][0]["content"] == "slow":
+        await asyncio.sleep(5)
+    return web.json_response({"choices": [{"message": {"content": f"echo {body['model']}"}}]})
+
+
+async def _with_server(scenario):
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", _completion)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await scenario(f"http://127.0.0.1:{port}/v1/chat/completions")
+    finally:
+        await runner.cleanup()
+
+
+class TestAIClient:
+    def test_chat_reuses_pooled_session(self):
+        async def scenario(url):
+            client = AIClient(api_url=url, api_key="key", model="m1", timeout=5, max_connections=2)
+            replies = await asyncio.gather(*[client.chat([{"role": "user", "content": "hi"}]) for _ in range(3)])
+            session = client._session
+            assert await client.chat([{"role": "user", "content": "hi"}]) == "echo m1"
+            assert client._session is session
+            await client.close()
+            return replies
+        assert asyncio.run(_with_server(scenario)) == ["echo m1"] * 3
+
+    def test_deadline_cancels_without_blocking_loop(self):
+        async def scenario(url):
+            client = AIClient(api_url=url, api_key="key", model="m1", timeout=5, max_connections=2)
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(time.perf_counter())
+                    await asyncio.sleep(0.02)
+
+            task = asyncio.create_task(ticker())
+            started = time.perf_counter()
+            with pytest.raises(AIError, match="không trả lời"):
+                await client.chat([{"role": "user", "content": "slow"}], timeout=0.3)
+            elapsed = time.perf_counter() - started
+            task.cancel()
+            # The pool is still usable after the cancelled request
+            assert await client.chat([{"role": "user", "content": "hi"}]) == "echo m1"
+            await client.close()
+            return elapsed, ticks
+        elapsed, ticks = asyncio.run(_with_server(scenario))
+        assert elapsed < 1.0
+        assert len(ticks) >= 10
+
+    def test_http_error_raises(self):
+        async def scenario(url):
+            client = AIClient(api_url=url, api_key="wrong", model="m1", timeout=5, max_connections=1)
+            try:
+                with pytest.raises(AIError, match="HTTP 401"):
+                    await client.chat([{"role": "user", "content": "hi"}])
+            finally:
+                await client.close()
+        asyncio.run(_with_server(scenario))
@@ -0,0 +1,263 @@
+import pytest
+from unittest.mock import MagicMock
+import numpy as np
+from commands.analyze import AnalyzeCommand
+from problem_batch import ProblemBatch
+from report_snapshots import ReportSnapshots
+from db import init_db
+from anomaly_detector import AnomalyDetector
+from forecast import Forecaster, huber_fit, trend_matrix
+from commands.forecast import ForecastCommand
+from config import Config
+from trigger_graph import TriggerDependencyGraph, build_csr, reachable
+
+
+def _problem(objectid, host):
+    return {"objectid": objectid, "name": objectid, "clock": "0", "severity": "3", "hosts": [{"host": host}]}
+
+
+class TestHostDependencies:
+    def test_dependencies_resolved_through_index(self):
+        problems = [_problem("1", "app"), _problem("2", "db"), _problem("3", "web")]
+        trigger_map = {
+            "1": {"dependencies": [{"triggerid": "2"}]},
+            "3": {"dependencies": [{"triggerid": "1"}, {"triggerid": "99"}]},
+        }
+        deps = AnalyzeCommand()._analyze_host_dependencies(problems, trigger_map)
+        assert deps["app"] == {"depends_on": {"db"}, "depended_by": {"web"}}
+        assert deps["db"] == {"depends_on": set(), "depended_by": {"app"}}
+        assert deps["web"] == {"depends_on": {"app"}, "depended_by": set()}
+
+    def test_plain_trigger_ids_and_missing_hosts(self):
+        problems = [{"objectid": "1", "hosts": []}, _problem("2", "db")]
+        deps = AnalyzeCommand()._analyze_host_dependencies(problems, {"1": {"dependencies": ["2"]}})
+        assert deps["Unknown"]["depends_on"] == {"db"}
+
+
+class TestAnalyzeReport:
+    def test_parse_window(self):
+        assert AnalyzeCommand._parse_window("24h") == (86400, "24 giờ qua")
+        assert AnalyzeCommand._parse_window("7D") == (7 * 86400, "7 ngày qua")
+        assert AnalyzeCommand._parse_window("90d")[0] == 30 * 86400
+        assert AnalyzeCommand._parse_window("0h") is None
+        assert AnalyzeCommand._parse_window("web") is None
+
+    def test_aggregates_from_summary_rows(self):
+        summary = [("web1", 4, "CPU high", 3), ("web1", 2, "Disk", 1), ("db1", 2, "Disk", 2)]
+        analysis = AnalyzeCommand()._analyze_problems(summary, [], {})
+        assert analysis['total_problems'] == 6
+        assert analysis['host_count'] == 2
+        assert analysis['top_hosts'][0] == ("web1", 4, 3.5)
+        assert analysis['top_patterns'][0][:3] == ("CPU high", 3, 1)
+        assert analysis['critical_hosts'] == ["web1"]
+        assert "6" in AnalyzeCommand()._generate_report(analysis)
+
+        analysis['incidents'] = [{"id": 7, "live": False, "started": 0, "events": 4, "host_count": 2,
+                                  "hosts": ["web1", "web2"]}]
+        report = AnalyzeCommand()._generate_report(analysis)
+        assert "#7 (đã đóng" in report and "vấn đề chung" in report and "Cluster" not in report
+
+class TestProblemBatch:
+    def test_group_bys_match_dict_counting(self):
+        problems = [dict(_problem(str(i), f"h{i % 3}"), name=f"p{i % 2}", severity=str(i % 6),
+                         clock=str(1000 + i), r_clock=(1060 + i) if i % 4 else None) for i in range(12)]
+        batch = ProblemBatch.from_events(problems)
+        assert batch.total() == 12
+        assert batch.severity_distribution() == {s: 2 for s in range(6)}
+        assert [(h, c) for h, c, _ in batch.top_hosts(2)] == [("h0", 4), ("h1", 4)]
+        assert batch.top_patterns(1)[0] == ("p0", 6, 3, ["h0", "h1", "h2"])
+        assert batch.critical_hosts() == ["h1", "h2"]
+        assert batch.mttr() == 60.0
+        assert batch.mttr_by_severity() == {s: 60.0 for s in range(6)}
+
+    def test_summary_counts_are_weights(self):
+        batch = ProblemBatch.from_summary([("a", 5, "x", 10), ("b", 1, "x", 1), ("b", 1, "y", 3)])
+        assert batch.top_hosts(1) == [("a", 10, 5.0)]
+        assert batch.top_patterns(2)[1][:3] == ("y", 3, 1)
+        assert batch.mttr() != batch.mttr()  # nan: summaries carry no durations
+
+
+class TestReportSnapshots:
+    def test_refresh_on_change_and_restart(self, tmp_path):
+        db_path = str(tmp_path / "reports.db")
+        init_db(db_path)
+        builds = []
+        builder = lambda seconds, group: builds.append((seconds, group)) or f"report {len(builds)}"
+        snapshots = ReportSnapshots(builder, refresh_interval=900, change_threshold=10, db_path=db_path,
+                                    pinned=[(259200, None)])
+
+        assert snapshots.due() == [(259200, None)]
+        assert snapshots.get((3600, "Web")) is None
+        assert snapshots.refresh_due() == 2
+        assert snapshots.get((3600, "Web"))[0] == "report 2"
+        assert snapshots.due() == []
+
+        snapshots.note_events([{"value": 1, "severity": 2}] * 5)
+        assert snapshots.due() == []
+        snapshots.note_events([{"value": 1, "severity": 5}])
+        assert sorted(snapshots.due(), key=str) == [(259200, None), (3600, "Web")]
+        assert snapshots.due(now=snapshots.get((3600, "Web"))[1] + 86401 + 900) == [(259200, None)]
+
+        restarted = ReportSnapshots(builder, db_path=db_path)
+        assert restarted.get((259200, None))[0] == "report 1"
+        assert len(builds) == 2
+
+
+class TestAnomalyDetector:
+    def _detector(self, tmp_path):
+        return AnomalyDetector(keys=["system.cpu.util"], alpha=0.2, threshold=4.0, min_samples=10,
+                               snapshot_path=str(tmp_path / "anomaly.npz"), item_refresh=3600)
+
+    def test_item_keys_split_on_semicolon(self):
+        assert Config.ANOMALY_ITEM_KEYS == ["system.cpu.util", "system.cpu.load", "vm.memory.util",
+                                            "vfs.fs.size", "net.if.in", "net.if.out"]
+
+    def test_cycle_flags_spike_and_snapshot_restores(self, tmp_path):
+        detector = self._detector(tmp_path)
+        zapi = MagicMock()
+        rng = np.random.default_rng(0)
+
+        def rows(clock, spike=False):
+            return [{"itemid": str(i), "lastclock": str(clock), "lastvalue": str(50 + rng.normal() + (40 if spike and i == 2 else 0)),
+                     "name": f"CPU {i}", "key_": "system.cpu.util", "hosts": [{"host": f"web{i}"}]}
+                    for i in range(1, 4)] + [{"itemid": "9", "lastclock": "0", "lastvalue": "", "name": "CPU 9", "key_": "system.cpu.util", "hosts": []}]
+
+        for clock in range(100, 130):
+            zapi.item.get.return_value = rows(clock)
+            assert detector.cycle(zapi) == 0
+        assert "selectHosts" in zapi.item.get.call_args_list[0][0][0]
+        assert "selectHosts" not in zapi.item.get.call_args_list[1][0][0]
+
+        zapi.item.get.return_value = rows(130, spike=True)
+        assert detector.cycle(zapi) == 1
+        anomalies = detector.anomalies()
+        assert [a["host"] for a in anomalies] == ["web2"] and anomalies[0]["score"] > 4
+        assert detector.anomalies(host="web1") == []
+
+        # Same clock again: state unchanged
+        assert detector.cycle(zapi) == 0
+
+        restored = self._detector(tmp_path)
+        assert restored.itemids.tolist() == [1, 2, 3, 9]
+        assert restored.count.tolist() == [31, 31, 31, 0]
+        assert restored.flagged.tolist() == [False, True, False, False]
+
+    def test_reindex_keeps_known_items(self, tmp_path):
+        detector = self._detector(tmp_path)
+        detector._reindex(np.array([1, 5], dtype=np.int64))
+        detector.update(np.array([5, 1]), np.array([10, 10]), np.array([3.0, 7.0]))
+        detector._reindex(np.array([2, 5, 8], dtype=np.int64))
+        assert detector.mean.tolist() == [0.0, 3.0, 0.0]
+        assert detector.count.tolist() == [0, 1, 0]
+
+
+class TestForecaster:
+    def _rows(self, itemid, values, time_from):
+        return [{"itemid": str(itemid), "clock": str(time_from + h * 3600), "value_avg": str(v)}
+                for h, v in enumerate(values) if v is not None]
+
+    def test_trend_matrix_places_rows(self):
+        rows = self._rows(7, [1.0, None, 3.0], 0) + self._rows(3, [5.0], 7200) + self._rows(4, [9.0], 0)
+        matrix = trend_matrix(rows, np.array([3, 7], dtype=np.int64), 0, 3)
+        assert np.isnan(matrix[0, :2]).all() and matrix[0, 2] == 5.0
+        assert matrix[1, 0] == 1.0 and np.isnan(matrix[1, 1]) and matrix[1, 2] == 3.0
+
+    def test_huber_ignores_spike(self):
+        x = np.arange(48, dtype=np.float64) * 3600
+        y = 10 + x / 3600 * 0.5
+        y[20] = 95.0
+        _, slope = huber_fit(x, y[None, :])
+        assert abs(slope[0] * 3600 - 0.5) < 0.01
+
+    def test_item_keys_are_whole_keys(self, monkeypatch):
+        assert Config.FORECAST_ITEM_KEYS == ["vfs.fs.size[*,pused]", "vfs.fs.dependent.size[*,pused]",
+                                             "vfs.fs.inode[*,pused]", "vm.memory.util*", "vm.memory.size[pused]"]
+        monkeypatch.setattr(Config, "HOST_GROUPS", [])
+        zapi = MagicMock()
+        zapi.item.get.return_value = [{"itemid": "1", "name": "Used disk space on /", "key_": "vfs.fs.size[/,pused]",
+                                       "hosts": [{"host": "db1"}]}]
+        items = ForecastCommand()._items(zapi, None)
+        assert items[0]["host"] == "db1"
+        assert zapi.item.get.call_args[0][0]["search"]["key_"] == Config.FORECAST_ITEM_KEYS
+
+    def test_forecast_ranks_and_caches(self):
+        forecaster = Forecaster(window=24 * 3600, batch=2, capacity=100, trend_delay=300)
+        items = [{"itemid": str(i), "host": f"db{i}", "name": f"Disk {i}"} for i in (1, 2, 3)]
+        zapi = MagicMock()
+
+        def trend_get(params):
+            time_from = params["time_from"]
+            rows = []
+            for itemid in params["itemids"]:
+                slope = {"1": 0.1, "2": 2.0, "3": -0.5}[itemid]
+                rows += self._rows(itemid, [50 + slope * h for h in range(24)], time_from)
+            return rows
+        zapi.trend.get.side_effect = trend_get
+
+        forecasts = forecaster.forecast(zapi, items)
+        assert zapi.trend.get.call_count == 2
+        assert [f["itemid"] for f in forecasts] == ["2", "1", "3"]
+        assert forecasts[0]["slope_per_day"] == pytest.approx(48.0)
+        assert forecasts[2]["eta"] == float("inf")
+
+        assert forecaster.forecast(zapi, items, limit=1)[0]["itemid"] == "2"
+        assert zapi.trend.get.call_count == 2
+
+    def test_cached_forecast_needs_no_login(self, monkeypatch):
+        forecaster = Forecaster(window=24 * 3600, batch=2, capacity=100, trend_delay=300)
+        items = [{"itemid": "1", "host": "db1", "name": "Disk 1"}]
+        zapi = MagicMock()
+        zapi.trend.get.side_effect = lambda params: self._rows("1", [50 + h for h in range(24)], params["time_from"])
+        login = MagicMock(return_value=zapi)
+        monkeypatch.setattr("forecast.get_zabbix_api", login)
+        monkeypatch.setattr("commands.forecast.get_zabbix_api", login)
+        monkeypatch.setattr("commands.forecast.forecaster", forecaster)
+        monkeypatch.setattr("commands.forecast.item_lookup_cache.get", lambda key: items)
+
+        assert ForecastCommand()._forecast("db1")[0]["itemid"] == "1"
+        assert login.call_count == 1
+        assert ForecastCommand()._forecast("db1")[0]["itemid"] == "1"
+        assert login.call_count == 1
+
+
+def _trigger(triggerid, host, deps=()):
+    return {"triggerid": triggerid, "description": f"t{triggerid}", "hosts": [{"host": host}],
+            "dependencies": [{"triggerid": d} for d in deps]}
+
+
+class TestTriggerDependencyGraph:
+    def setup_method(self):
+        # switch <- router <- (web1, web2 <- app); db is independent
+        self.zapi = MagicMock()
+        self.zapi.trigger.get.return_value = [
+            _trigger("1", "switch"),
+            _trigger("2", "router", ["1"]),
+            _trigger("3", "web1", ["2"]),
+            _trigger("4", "web2", ["2"]),
+            _trigger("5", "app", ["4"]),
+            _trigger("6", "db"),
+        ]
+        self.graph = TriggerDependencyGraph(refresh_interval=3600)
+        self.graph.refresh(self.zapi)
+
+    def test_reachable(self):
+        indptr, indices = build_csr(np.array([0, 0, 1]), np.array([1, 2, 3]), 4)
+        assert reachable(indptr, indices, np.array([0])).tolist() == [False, True, True, True]
+
+    def test_root_cause_ranked_by_blast_radius(self):
+        ranked = self.graph.rank_root_causes(["2", "3", "5", "6"])
+        assert [r["triggerid"] for r in ranked] == ["2"]
+        assert ranked[0]["host"] == "router"
+        assert ranked[0]["active_downstream"] == 2
+        assert ranked[0]["total_downstream"] == 3
+
+    def test_missing_triggers_merged_incrementally(self):
+        self.zapi.trigger.get.side_effect = [[_trigger("7", "vm", ["8"])], [_trigger("8", "hypervisor")]]
+        self.graph.ensure(self.zapi, ["7", "8"])
+        assert self.zapi.trigger.get.call_count == 3
+        ranked = self.graph.rank_root_causes(["7", "8"])
+        assert ranked[0]["host"] == "hypervisor"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
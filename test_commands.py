@@ -39,6 +39,24 @@ class TestAllCommands(unittest.IsolatedAsyncioTestCase):
                     except Exception as e:
                         self.fail(f"{class_name}.execute() raised {e}")
 
+    async def test_spark_rejects_bad_period(self):
+        from commands.spark import SparkCommand
+        update = MagicMock()
+        update.effective_user.id = 1
+        update.message.reply_text = AsyncMock()
+        context = MagicMock()
+        context.args = ["host1", "system.cpu.util", "abc"]
+        with patch("decorators.Config.ADMIN_IDS", [1]), patch("commands.spark.get_zabbix_api") as get_zapi:
+            await SparkCommand().execute(update, context)
+        get_zapi.assert_not_called()
+        self.assertIn("/spark host1 system.cpu.util 3600", update.message.reply_text.call_args[0][0])
+
+    def test_spark_period_label(self):
+        from commands.spark import SparkCommand
+        self.assertEqual(SparkCommand._format_period(1200), "20 phút")
+        self.assertEqual(SparkCommand._format_period(5400), "1.5 giờ")
+        self.assertEqual(SparkCommand._format_period(7 * 86400), "7 ngày")
+
     def mock_zabbix_api(self):
         mock_zapi = MagicMock()
         mock_zapi.host.get.return_value = [{"hostid": "10101"}]
@@ -0,0 +1,260 @@
+import math
+import time
+import pytest
+from unittest.mock import MagicMock
+from db import init_db, get_last_event, get_problem_summary, get_problem_events, get_problem_occurrences
+from event_sync import EventSync
+import incident_clustering
+from incident_clustering import IncidentClusterer, IncidentNotices, describe_update
+import error_patterns
+from error_patterns import PatternMiner, RankedCounter, normalise
+from db import get_error_patterns, save_events
+from flapping import FlapDetector
+
+
+def _row(eventid, clock, host, value="1", objectid=None, tags=()):
+    return {"eventid": str(eventid), "clock": str(clock), "value": value, "r_eventid": "0",
+            "objectid": objectid or str(eventid), "severity": "4", "name": f"problem {eventid}",
+            "hosts": [{"hostid": f"h-{host}", "host": host}],
+            "tags": [{"tag": t, "value": v} for t, v in tags]}
+
+
+def _event(clock, host, objectid, value=1, groups=(), tags=()):
+    return {"clock": clock, "host": host, "objectid": objectid, "value": value, "severity": 3,
+            "groups": list(groups), "tags": list(tags)}
+
+
+class TestEventSync:
+    def test_incremental_sync_and_listeners(self, tmp_path):
+        db_path = str(tmp_path / "events.db")
+        init_db(db_path)
+        zapi = MagicMock()
+        zapi.host.get.return_value = [{"hostid": "h-web1", "hostgroups": [{"name": "Web"}]}]
+        zapi.event.get.side_effect = [
+            [_row(1, 100, "web1"), _row(2, 110, "web1", tags=[("service", "shop")])],
+            [_row(3, 120, "web1")],
+            [],
+        ]
+        received = []
+        sync = EventSync(batch_size=2, db_path=db_path)
+        sync.add_listener(received.extend)
+
+        assert sync.sync(zapi) == 3
+        assert "time_from" in zapi.event.get.call_args_list[0][0][0]
+        assert zapi.event.get.call_args_list[1][0][0]["eventid_from"] == "3"
+        assert received[1]["groups"] == ["Web"] and received[1]["tags"] == ["service=shop"]
+        assert get_last_event(db_path) == (3, 120)
+
+        sync.sync(zapi)
+        assert zapi.event.get.call_args_list[2][0][0]["eventid_from"] == "4"
+        zapi.host.get.assert_called_once()
+
+    def test_summary_from_rollups_and_coverage(self, tmp_path):
+        db_path = str(tmp_path / "events.db")
+        init_db(db_path)
+        zapi = MagicMock()
+        zapi.host.get.return_value = [{"hostid": "h-web1", "hostgroups": [{"name": "Web"}]},
+                                      {"hostid": "h-db1", "hostgroups": [{"name": "DB"}]}]
+        zapi.event.get.side_effect = [
+            [_row(10, 7200, "web1", objectid="t1"), _row(11, 9000, "db1", objectid="t2"),
+             _row(12, 10900, "web1", value="0", objectid="t1")],
+            [_row(5, 3000, "web1", objectid="t1")],
+        ]
+        sync = EventSync(batch_size=10, db_path=db_path)
+        sync.sync(zapi)
+        sync_state_from = sync.covered_from()
+
+        # Already covered: no Zabbix call
+        assert sync.ensure_coverage(sync_state_from + 1, zapi) == 0
+        assert sync.ensure_coverage(0, zapi) == 1
+        assert zapi.event.get.call_args_list[1][0][0]["time_till"] == sync_state_from - 1
+        assert sync.covered_from() == 0
+
+        # 7200 and 9000 come from full rollup hours, 3000 from the partial edge hour
+        summary = get_problem_summary(1000, 11000, db_path=db_path)
+        assert sorted((host, count) for host, _, _, count in summary) == [("db1", 1), ("web1", 1), ("web1", 1)]
+        assert get_problem_summary(1000, 11000, group="DB", db_path=db_path) == [("db1", 4, "problem 11", 1)]
+
+        events = get_problem_events(0, 20000, db_path=db_path)
+        assert [(e["eventid"], e["active"]) for e in events] == [("11", True), ("10", False), ("5", False)]
+
+        # Heatmap input: problem events only, recoveries and events past time_till left out
+        assert sorted(get_problem_occurrences(0, 9000, db_path=db_path)) == [("web1", 3000), ("web1", 7200)]
+
+
+class TestIncidentClusterer:
+    def test_opened_grown_closed(self):
+        clusterer = IncidentClusterer(window=300, min_events=2, max_live=10, keys=["host", "group"])
+        updates = clusterer.feed([
+            _event(0, "web1", "1", groups=["Web"]),
+            _event(60, "web2", "2", groups=["Web"]),
+            _event(120, "db1", "3", groups=["DB"]),
+            _event(200, "web3", "4", groups=["Web"]),
+        ])
+        assert [u["type"] for u in updates] == ["opened", "grown"]
+        assert updates[-1]["incident"]["host_count"] == 3
+        assert clusterer.active()[0]["events"] == 3
+
+        closed = clusterer.expire(600)
+        assert [u["type"] for u in closed] == ["closed"]
+        assert clusterer.active() == []
+
+        assert describe_update(updates[0]).startswith("🚨 Incident #1 mở")
+        assert describe_update(updates[1]) is None
+        assert "đã lắng xuống" in describe_update(closed[0])
+
+    def test_first_sync_sends_no_notices(self, tmp_path):
+        db_path = str(tmp_path / "events.db")
+        init_db(db_path)
+        now = int(time.time())
+        day_ago = now - 86400
+        zapi = MagicMock()
+        zapi.host.get.return_value = []
+        zapi.event.get.side_effect = [
+            [_row(1, day_ago, "web1"), _row(2, day_ago + 10, "web1"), _row(3, day_ago + 20, "web1")],
+            [_row(4, now - 5, "db1"), _row(5, now, "db1")],
+        ]
+        clusterer = IncidentClusterer(window=300, min_events=2, max_live=10, keys=["host"])
+        notices = IncidentNotices(window=300)
+        clusterer.add_listener(notices.add)
+        sync = EventSync(batch_size=10, db_path=db_path)
+        sync.add_listener(clusterer.feed)
+
+        # Backfill: the day-old incident is opened and closed in state only
+        sync.sync(zapi)
+        assert notices.drain() == []
+
+        sync.sync(zapi)
+        texts = notices.drain()
+        assert len(texts) == 1 and texts[0].startswith("🚨 Incident #2 mở")
+        clusterer.expire(now + 600)
+        assert [text[:14] for text in notices.drain()] == ["✅ Incident #2 "]
+
+    def test_host_count_past_display_cap(self, monkeypatch):
+        monkeypatch.setattr(incident_clustering, "MAX_HOSTS_PER_INCIDENT", 2)
+        monkeypatch.setattr(incident_clustering, "MAX_HOST_IDS_PER_INCIDENT", 4)
+        clusterer = IncidentClusterer(window=300, min_events=1, max_live=10, keys=["group"])
+        # Repeat events from hosts past the display cap are not counted again
+        clusterer.feed([_event(i, f"h{i % 3}", str(i), groups=["Web"]) for i in range(9)])
+        incident = clusterer.active()[0]
+        assert incident["host_count"] == 3 and not incident["hosts_capped"]
+        assert len(incident["hosts"]) == 2
+
+        updates = clusterer.feed([_event(10 + i, f"x{i}", str(100 + i), groups=["Web"]) for i in range(3)])
+        incident = updates[-1]["incident"]
+        assert incident["host_count"] == 4 and incident["hosts_capped"]
+        assert "4+ hosts" in describe_update({"type": "opened", "incident": incident})
+
+    def test_incidents_for_report_window(self):
+        clusterer = IncidentClusterer(window=300, min_events=2, max_live=10, keys=["host", "group"])
+        clusterer.feed([_event(0, "web1", "1", groups=["Web"]), _event(60, "web2", "2", groups=["Web"]),
+                        _event(1000, "db1", "3", groups=["DB"]), _event(1010, "db1", "4", groups=["DB"])])
+        assert [(i["groups"], i["live"]) for i in clusterer.incidents(0)] == [(["DB"], True), (["Web"], False)]
+        assert [i["groups"] for i in clusterer.incidents(0, group="Web")] == [["Web"]]
+        assert [i["groups"] for i in clusterer.incidents(500)] == [["DB"]]
+
+    def test_recovery_and_bounded_memory(self):
+        clusterer = IncidentClusterer(window=300, min_events=1, max_live=2, keys=["host"])
+        clusterer.feed([_event(0, "a", "1"), _event(1, "a", "2"), _event(2, "a", "1", value=0)])
+        assert clusterer.active()[0]["open_problems"] == 1
+        updates = clusterer.feed([_event(10, "b", "3"), _event(11, "c", "4")])
+        assert "closed" in [u["type"] for u in updates]
+        assert len(clusterer.active()) == 2
+        assert len(clusterer._key_index) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+
+class TestPatternMiner:
+    def test_normalise_masks_variable_parts(self):
+        assert normalise("Free disk space is less than 20% on volume /var/log") == \
+            "Free disk space is less than <NUM>% on volume <PATH>"
+        assert normalise("Ping to 10.0.0.12:8080 failed after 3.5s") == "Ping to <IP> failed after <NUM>s"
+        assert normalise("Interface eth0: link down") == "Interface eth0: link down"
+
+    def test_ranked_counter_top(self):
+        counter = RankedCounter()
+        for key, delta in [("a", 3), ("b", 5), ("c", 1), ("a", 4), ("b", -5)]:
+            counter.add(key, delta)
+        assert counter.top(2) == [("a", 7), ("c", 1)]
+        assert counter.get("b") == 0 and len(counter) == 2
+
+    def test_ranked_counter_ties_take_only_k(self):
+        counter = RankedCounter()
+        for i in range(1000):
+            counter.add(f"t{i}")
+        counter.add("t500", 2)
+        assert counter.top(3) == [("t500", 3), ("t0", 1), ("t1", 1)]
+        assert counter.top(0) == []
+
+    def test_windows_slide_and_flush_in_batch(self, tmp_path, monkeypatch):
+        db_path = str(tmp_path / "patterns.db")
+        init_db(db_path)
+        now = [1200]
+        monkeypatch.setattr(error_patterns.time, "time", lambda: now[0])
+        miner = PatternMiner(windows=[120, 600], bucket=60, flush_interval=1000, db_path=db_path)
+        miner.feed([
+            {"value": 1, "clock": 700, "name": "Disk /var at 91%"},
+            {"value": 1, "clock": 1150, "name": "Disk /data at 95%"},
+            {"value": 1, "clock": 1190, "name": "Host web1 down"},
+            {"value": 0, "clock": 1195, "name": "Host web1 down"},
+        ])
+        assert miner.top(600) == [("Disk <PATH> at <NUM>%", 2), ("Host web1 down", 1)]
+        assert miner.top(120, 1) == [("Disk <PATH> at <NUM>%", 1)]
+
+        now[0] = 1400
+        assert miner.top(120) == []
+        # Tied templates, listed in the order they reached the count
+        assert miner.top(600) == [("Host web1 down", 1), ("Disk <PATH> at <NUM>%", 1)]
+        assert miner.window_for(300) == 600
+
+        assert miner.flush() == 2
+        miner.feed([{"value": 1, "clock": 1390, "name": "Disk /tmp at 99%"}])
+        miner.flush()
+        assert get_error_patterns(db_path=db_path)[0] == ("Disk <PATH> at <NUM>%", "Disk /tmp at 99%", 3, 1390)
+
+
+
+class TestFlapDetector:
+    def _events(self):
+        flaps = [dict(_event(clock, "web1", "10", value=(i + 1) % 2), eventid=i + 1, name="Ping loss", r_eventid=0)
+                 for i, clock in enumerate(range(0, 360, 60))]
+        flaps.insert(2, dict(_event(70, "web1", "10", value=0), eventid=100, name="Ping loss", r_eventid=0))
+        return flaps + [dict(_event(120, "db1", "20"), eventid=200, name="Disk full", r_eventid=0)]
+
+    def _detector(self, db_path=None):
+        return FlapDetector(window=600, threshold=4, history=5, max_triggers=10, db_path=db_path)
+
+    def test_flap_score_suppression_and_decay(self):
+        detector = self._detector()
+        detector.feed(self._events())
+        # The first event only seeds the state: 5 changes, the last one at 300
+        assert detector.is_flapping("10", now=300) and not detector.is_flapping("20", now=300)
+        assert detector.top(now=300)[0]["score"] == pytest.approx(sum(math.exp(-k / 10) for k in range(5)))
+
+        detector.feed([dict(_event(330, "web1", "10"), name="Ping loss")])
+        assert detector.suppress(["10", "20", "30"], now=330) == {"10"}
+        assert detector.suppress(["10"], now=330) == {"10"}
+
+        worst = detector.top(now=330)
+        assert [entry["triggerid"] for entry in worst] == ["10"]
+        # Listing the trigger twice does not count; only the problem at 330 was folded
+        assert worst[0]["transitions"] == 5 and worst[0]["suppressed"] == 1
+
+        assert detector.flapping_count(now=1000) == 0
+        assert detector.suppress(["10"], now=1000) == set()
+
+    def test_load_rebuilds_from_stored_events(self, tmp_path):
+        db_path = str(tmp_path / "flap.db")
+        init_db(db_path)
+        save_events(self._events(), db_path)
+        detector = self._detector(db_path)
+        detector.load(now=300)
+        assert detector.is_flapping("10", now=300)
+
+    def test_tracked_triggers_are_bounded(self):
+        detector = self._detector()
+        detector.feed([_event(clock, "web1", str(clock)) for clock in range(20)])
+        assert len(detector._triggers) == 10 and "19" in detector._triggers and "0" not in detector._triggers
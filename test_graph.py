@@ -0,0 +1,253 @@
+import asyncio
+import time
+import pytest
+import numpy as np
+from unittest.mock import MagicMock, patch
+from config import Config
+import graph_engine
+from graph_cache import ByteLRUCache, bucket_end, graph_key
+from history_store import HistoryStore
+from graph_data import fetch_item_series, fetch_items_series, find_items
+from graph_renderer import GraphRenderService, GraphRenderTimeout, render_line_chart, render_heatmap
+from heatmap import bin_problems, build_heatmap, page_rows
+
+PNG_MAGIC = b'\x89PNG'
+
+
+def _slow_render():
+    time.sleep(5)
+    return b''
+
+
+class TestRenderLineChart:
+    def test_renders_png(self):
+        clocks = np.arange(1718000000, 1718003600, 60, dtype=np.int64)
+        values = np.sin(np.arange(clocks.size, dtype=np.float64))
+        png = render_line_chart([{"clock": clocks, "value": values}], "CPU - host1")
+        assert png.startswith(PNG_MAGIC)
+
+    def test_empty_series(self):
+        png = render_line_chart([{"clock": np.array([], dtype=np.int64), "value": np.array([])}], "empty")
+        assert png.startswith(PNG_MAGIC)
+
+
+class TestGraphRenderService:
+    def setup_method(self):
+        self.service = GraphRenderService(max_workers=1, timeout=30)
+
+    def teardown_method(self):
+        self.service.shutdown()
+
+    def test_render_in_pool(self):
+        clocks = np.array([1718000000, 1718000600], dtype=np.int64)
+        values = np.array([10.0, 20.0])
+        png = asyncio.run(self.service.render(render_line_chart, [{"clock": clocks, "value": values}], "t"))
+        assert png.startswith(PNG_MAGIC)
+        assert self.service.stats()['renders'] == 1
+
+    def test_render_deadline(self):
+        with pytest.raises(GraphRenderTimeout):
+            asyncio.run(self.service.render(_slow_render, timeout=0.1))
+        assert self.service.stats()['timeouts'] == 1
+
+    def test_timed_out_render_does_not_block_the_next(self):
+        with pytest.raises(GraphRenderTimeout):
+            self.service.render_sync(_slow_render, timeout=0.1)
+        # With one worker the next render would wait for the 5 s sleep if it were still running
+        clocks = np.array([1718000000, 1718000600], dtype=np.int64)
+        png = self.service.render_sync(render_line_chart, [{"clock": clocks, "value": np.array([1.0, 2.0])}], "t",
+                                       timeout=4)
+        assert png.startswith(PNG_MAGIC)
+
+    def test_render_sync(self):
+        clocks = np.array([1718000000, 1718000600], dtype=np.int64)
+        png = self.service.render_sync(render_line_chart, [{"clock": clocks, "value": np.array([1.0, -2.0])}], "t")
+        assert png.startswith(PNG_MAGIC)
+        with pytest.raises(GraphRenderTimeout):
+            self.service.render_sync(_slow_render, timeout=0.1)
+
+
+class TestGraphEngine:
+    def test_second_request_served_from_cache(self):
+        now = int(time.time())
+        zapi = MagicMock()
+        zapi.history.get.return_value = [{"clock": str(now - 120), "value": "-1.5e2"}]
+        item = {"itemid": "42", "name": "cpu", "value_type": "0", "host": "web1"}
+        with patch.object(graph_engine, 'graph_cache', ByteLRUCache(1024 * 1024)), \
+                patch.object(graph_engine, 'graph_window', return_value=(now - 3600, now)), \
+                patch.object(Config, 'HISTORY_CACHE_ENABLED', False), \
+                patch.object(graph_engine.graph_renderer, 'render_sync', return_value=PNG_MAGIC) as render, \
+                patch.object(graph_engine, 'get_zabbix_api', return_value=zapi) as login:
+            assert graph_engine.render_graph_sync([item], 3600, "cpu - web1") == PNG_MAGIC
+            assert graph_engine.render_graph_sync([item], 3600, "cpu - web1") == PNG_MAGIC
+        assert login.call_count == 1
+        assert render.call_count == 1
+        series = render.call_args[0][1]
+        assert series[0]["value"].tolist() == [-150.0]
+
+
+class TestFetchItemSeries:
+    def _zapi(self):
+        zapi = MagicMock()
+        zapi.trend.get.return_value = [
+            {"clock": "7200", "value_min": "1", "value_avg": "2", "value_max": "3"},
+            {"clock": "3600", "value_min": "0", "value_avg": "1", "value_max": "5"},
+        ]
+        zapi.history.get.return_value = [{"clock": "10900", "value": "4.5"}]
+        return zapi
+
+    def test_short_period_uses_history(self):
+        zapi = self._zapi()
+        series = fetch_item_series(zapi, {"itemid": "1", "value_type": "0"}, 7200, 10900)
+        assert series["source"] == "history"
+        zapi.trend.get.assert_not_called()
+        assert zapi.history.get.call_args[0][0]["history"] == 0
+
+    def test_long_period_uses_trends_and_recent_history(self):
+        zapi = self._zapi()
+        with patch.object(Config, 'GRAPH_TRENDS_THRESHOLD', 3600):
+            series = fetch_item_series(zapi, {"itemid": "1", "value_type": "3"}, 0, 10900)
+        assert series["source"] == "trends"
+        assert zapi.trend.get.call_args[0][0]["time_till"] == 10799
+        assert zapi.history.get.call_args[0][0]["time_from"] == 10800
+        assert series["clock"].tolist() == [3600, 7200, 10900]
+        assert series["value"].tolist() == [1.0, 2.0, 4.5]
+        assert series["min"].tolist() == [0.0, 1.0, 4.5]
+        assert series["max"].tolist() == [5.0, 3.0, 4.5]
+
+    def test_text_items_never_use_trends(self):
+        zapi = self._zapi()
+        with patch.object(Config, 'GRAPH_TRENDS_THRESHOLD', 3600):
+            fetch_item_series(zapi, {"itemid": "1", "value_type": "4"}, 0, 10900)
+        zapi.trend.get.assert_not_called()
+
+
+class TestMultiItemFetch:
+    def test_one_history_call_split_by_item(self):
+        zapi = MagicMock()
+        zapi.history.get.return_value = [
+            {"itemid": "2", "clock": "20", "value": "-3"},
+            {"itemid": "1", "clock": "20", "value": "2"},
+            {"itemid": "1", "clock": "10", "value": "1"},
+        ]
+        items = [{"itemid": "1", "value_type": "0"}, {"itemid": "2", "value_type": "0"}, {"itemid": "3", "value_type": "0"}]
+        series = fetch_items_series(zapi, items, 0, 30)
+        zapi.history.get.assert_called_once()
+        assert zapi.history.get.call_args[0][0]["itemids"] == ["1", "2", "3"]
+        assert series["1"]["clock"].tolist() == [10, 20]
+        assert series["1"]["value"].tolist() == [1.0, 2.0]
+        assert series["2"]["value"].tolist() == [-3.0]
+        assert series["3"]["clock"].size == 0
+
+    def test_history_grouped_by_value_type(self):
+        zapi = MagicMock()
+        zapi.history.get.return_value = []
+        fetch_items_series(zapi, [{"itemid": "1", "value_type": "0"}, {"itemid": "2", "value_type": "3"}], 0, 30)
+        assert sorted(c[0][0]["history"] for c in zapi.history.get.call_args_list) == [0, 3]
+
+    def test_find_items_prefers_exact_key_per_host(self):
+        zapi = MagicMock()
+        zapi.item.get.return_value = [
+            {"itemid": "1", "hostid": "10", "key_": "system.cpu.util[,idle]", "name": "idle", "value_type": "0"},
+            {"itemid": "2", "hostid": "10", "key_": "system.cpu.util", "name": "cpu", "value_type": "0"},
+            {"itemid": "3", "hostid": "11", "key_": "system.cpu.util[,user]", "name": "user", "value_type": "0"},
+            {"itemid": "4", "hostid": "11", "key_": "vm.memory.size[available]", "name": "mem", "value_type": "3"},
+        ]
+        items = find_items(zapi, {"10": "web1", "11": "web2"}, ["system.cpu.util", "vm.memory.*"])
+        assert [(i["itemid"], i["host"]) for i in items] == [("2", "web1"), ("3", "web2"), ("4", "web2")]
+        zapi.item.get.assert_called_once()
+
+
+class TestHistoryStore:
+    def _zapi(self, rows):
+        zapi = MagicMock()
+        zapi.history.get.side_effect = lambda params: [
+            row for row in rows if params["time_from"] <= int(row["clock"]) <= params["time_till"]
+        ]
+        return zapi
+
+    def test_second_request_fetches_only_the_tail(self, tmp_path):
+        now = int(time.time())
+        rows = [{"itemid": "1", "clock": str(now - 600 + i * 60), "value": str(i)} for i in range(10)]
+        store = HistoryStore(str(tmp_path), max_age=86400, overlap=60)
+        item = {"itemid": "1", "value_type": "0"}
+        zapi = self._zapi(rows[:5])
+
+        clocks, values = store.get(zapi, item, now - 600, now - 300)
+        assert values.tolist() == [0, 1, 2, 3, 4]
+
+        zapi = self._zapi(rows)
+        clocks, values = store.get(zapi, item, now - 600, now)
+        assert zapi.history.get.call_args[0][0]["time_from"] == now - 360
+        assert values.tolist() == list(range(10))
+        assert clocks.dtype == np.int64
+        assert store.stats()["points_fetched"] == 5 + 6
+
+    def test_old_points_evicted(self, tmp_path):
+        now = int(time.time())
+        rows = [{"itemid": "1", "clock": str(now - 100), "value": "1"}, {"itemid": "1", "clock": str(now - 10), "value": "2"}]
+        store = HistoryStore(str(tmp_path), max_age=200, overlap=0)
+        store.get(self._zapi(rows), {"itemid": "1", "value_type": "0"}, now - 150, now)
+        store.max_age = 50
+        clocks, values = store.get(self._zapi(rows), {"itemid": "1", "value_type": "0"}, now - 40, now)
+        assert values.tolist() == [2.0]
+        assert store._read("1")[2].size == 1
+
+    def test_text_items_bypass_cache(self, tmp_path):
+        now = int(time.time())
+        store = HistoryStore(str(tmp_path), max_age=86400)
+        store.get(self._zapi([]), {"itemid": "1", "value_type": "4"}, now - 60, now)
+        assert store.stats()["items"] == 0
+
+
+class TestGraphCache:
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = ByteLRUCache(max_bytes=10)
+        cache.put("a", b"aaaa")
+        cache.put("b", b"bbbb")
+        assert cache.get("a") == b"aaaa"
+        cache.put("c", b"cccc")
+        assert cache.get("b") is None
+        assert cache.get("a") == b"aaaa"
+        assert cache.stats()["bytes"] == 8
+
+    def test_oversized_value_not_cached(self):
+        cache = ByteLRUCache(max_bytes=3)
+        cache.put("a", b"aaaa")
+        assert cache.get("a") is None
+
+    def test_ttl_expiry(self):
+        cache = ByteLRUCache(max_bytes=100, ttl=0.01)
+        cache.put("a", [1], size=1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+
+    def test_same_bucket_same_key(self):
+        assert bucket_end(1718000059, 60) == bucket_end(1718000041, 60) == 1718000040
+        assert graph_key(1, 3600, bucket_end(1718000059, 60)) == graph_key("1", 3600, 1718000040)
+
+
+class TestHeatmap:
+    def test_bin_problems(self):
+        hosts = np.array(["b", "a", "b", "b", "c"], dtype=object)
+        clocks = np.array([0, 10, 3700, 3800, 99999])
+        names, matrix = bin_problems(hosts, clocks, 0, 7200)
+        assert names.tolist() == ["a", "b"]
+        assert matrix.tolist() == [[1, 0], [1, 2]]
+
+    def test_ranked_and_paged(self):
+        occurrences = [(f"host{i}", 100) for i in range(5000)] + [("host4999", 200)] * 3
+        names, matrix, bin_seconds = build_heatmap(occurrences, 0, 7 * 86400, 168)
+        assert bin_seconds == 3600
+        assert names[0] == "host4999" and matrix[0].sum() == 4
+        page_names, page_matrix, page, pages = page_rows(names, matrix, 200, 40)
+        assert (page, pages) == (125, 125)
+        assert page_matrix.shape == (40, 168)
+
+    def test_render(self):
+        png = render_heatmap(np.array([[0, 3], [1, 0]]), ["web1", "web2"], 1718000000, 3600, "t")
+        assert png.startswith(PNG_MAGIC)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
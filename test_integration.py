@@ -205,15 +205,11 @@ class TestIntegration:
             }
         ]
         
-        # Mock requests
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            'choices': [{'message': {'content': 'AI analysis response'}}]
-        }
+        # Mock the AI client
+        mock_chat = AsyncMock(return_value='AI analysis response')
         
         with patch('commands.ask_ai.get_zabbix_api', return_value=mock_zapi):
-            with patch('commands.ask_ai.requests.post', return_value=mock_response):
+            with patch('commands.ask_ai.ai_client.chat', mock_chat):
                 command = AskAiCommand()
                 
                 # Create mock update and context
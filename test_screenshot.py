@@ -0,0 +1,230 @@
+import io
+import os
+import pytest
+import threading
+import time
+from PIL import Image
+from unittest.mock import MagicMock, patch
+from config import Config
+import screenshot
+from selenium.common.exceptions import StaleElementReferenceException
+from screenshot import wait_for_page_ready, get_ready_wait_stats, url_dashboardid, dashboard_loaded
+from commands.dashboard import DashboardCommand, MAX_TARGETS
+from image_processing import compress_image, get_compression_stats
+from concurrent.futures import Future
+from screenshot_queue import (
+    _Job, ScreenshotScheduler, ScreenshotQueueFull, ScreenshotJobExpired,
+    PRIORITY_ALERT, PRIORITY_INTERACTIVE
+)
+
+
+class TestWaitForPageReady:
+    def setup_method(self):
+        screenshot._ready_waits.clear()
+
+    def test_returns_once_layout_is_stable(self):
+        """Ready page should return after a few polls, well before the cap"""
+        driver = MagicMock()
+        driver.execute_script.return_value = ['complete', 0, 0, '1920x1080x300']
+        with patch.object(Config, 'SCREENSHOT_POLL_INTERVAL', 0.01):
+            waited = wait_for_page_ready(driver, timeout=5)
+        assert waited < 1
+        assert driver.execute_script.call_count == 3
+        assert get_ready_wait_stats()['timeouts'] == 0
+
+    def test_waits_for_loading_widgets_and_requests(self):
+        """Pending requests and loading widgets keep the page not ready"""
+        driver = MagicMock()
+        driver.execute_script.side_effect = [
+            ['interactive', 0, 0, 'a'],
+            ['complete', 2, 0, 'b'],
+            ['complete', 0, 3, 'b'],
+            ['complete', 0, 0, 'c'],
+            ['complete', 0, 0, 'c'],
+            ['complete', 0, 0, 'c'],
+        ]
+        with patch.object(Config, 'SCREENSHOT_POLL_INTERVAL', 0.01):
+            wait_for_page_ready(driver, timeout=5)
+        assert driver.execute_script.call_count == 6
+
+    def test_hard_cap(self):
+        """A page that never settles is captured after the timeout"""
+        driver = MagicMock()
+        counter = iter(range(10 ** 6))
+        driver.execute_script.side_effect = lambda script: ['complete', 1, 0, str(next(counter))]
+        with patch.object(Config, 'SCREENSHOT_POLL_INTERVAL', 0.01):
+            waited = wait_for_page_ready(driver, timeout=0.1)
+        assert 0.1 <= waited < 0.5
+        stats = get_ready_wait_stats()
+        assert stats['count'] == 1
+        assert stats['timeouts'] == 1
+
+
+class TestScreenshotScheduler:
+    def setup_method(self):
+        self.scheduler = ScreenshotScheduler(max_concurrency=1, max_queue_size=3, max_job_age=30)
+        self.gate = threading.Event()
+        # Occupy the single worker so following jobs stay queued
+        self.blocker = self.scheduler.submit('blocker', self.gate.wait, 5)
+        self._wait_until(lambda: self.scheduler.stats()['running'] == 1)
+
+    def teardown_method(self):
+        self.gate.set()
+        self.scheduler.shutdown()
+
+    def _wait_until(self, predicate, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            assert time.monotonic() < deadline
+            time.sleep(0.005)
+
+    def test_interactive_runs_before_alerts(self):
+        order = []
+        alert = self.scheduler.submit('alert', order.append, 'alert', priority=PRIORITY_ALERT)
+        dashboard = self.scheduler.submit('dashboard', order.append, 'dashboard', priority=PRIORITY_INTERACTIVE)
+        self.gate.set()
+        alert.result(timeout=2)
+        dashboard.result(timeout=2)
+        assert order == ['dashboard', 'alert']
+
+    def test_duplicate_jobs_share_one_execution(self):
+        calls = []
+        first = self.scheduler.submit('https://a', lambda: calls.append(1) or b'png')
+        second = self.scheduler.submit('https://a', lambda: calls.append(2) or b'png')
+        time.sleep(0.01)
+        self.gate.set()
+        assert first.result(timeout=2) == second.result(timeout=2) == b'png'
+        assert calls == [1]
+        stats = self.scheduler.stats()
+        assert stats['deduplicated'] == 1
+        assert stats['max_wait'] > 0
+
+    def test_backpressure_sheds_lower_priority(self):
+        alerts = [self.scheduler.submit(f'alert{i}', str, i) for i in range(3)]
+        with pytest.raises(ScreenshotQueueFull):
+            self.scheduler.submit('alert3', str, 3)
+        dashboard = self.scheduler.submit('dashboard', str, 'ok', priority=PRIORITY_INTERACTIVE)
+        with pytest.raises(ScreenshotQueueFull):
+            alerts[2].result(timeout=2)
+        self.gate.set()
+        assert dashboard.result(timeout=2) == 'ok'
+        assert self.scheduler.stats()['rejected'] == 2
+
+    def test_stale_jobs_are_dropped(self):
+        stale = self.scheduler.submit('stale', str, 1, max_age=0.01)
+        time.sleep(0.05)
+        self.gate.set()
+        with pytest.raises(ScreenshotJobExpired):
+            stale.result(timeout=2)
+        assert self.scheduler.stats()['expired'] == 1
+
+    def test_settle_skips_cancelled_waiters(self):
+        cancelled, waiting = Future(), Future()
+        cancelled.cancel()
+        job = _Job('race', str, (), PRIORITY_ALERT, None)
+        job.waiters = [cancelled, waiting]
+        job.settle(result=b'png')
+        assert waiting.result(timeout=0) == b'png'
+
+
+class TestCompressImage:
+    def _png(self, width=1920, height=1080):
+        # Random pixels are the worst case for any encoder
+        image = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+        buf = io.BytesIO()
+        image.save(buf, format='PNG')
+        return buf.getvalue()
+
+    def test_fits_budget(self):
+        png = self._png()
+        before = get_compression_stats()
+        output = compress_image(png, max_bytes=200000, fmt='JPEG')
+        assert len(output) <= 200000
+        assert Image.open(io.BytesIO(output)).format == 'JPEG'
+        after = get_compression_stats()
+        assert after['bytes_saved'] - before['bytes_saved'] == len(png) - len(output)
+
+    def test_crop_box_is_clamped(self):
+        output = compress_image(self._png(400, 300), crop_box=(100, 50, 5000, 250), max_bytes=10 ** 7, fmt='PNG')
+        assert Image.open(io.BytesIO(output)).size == (300, 200)
+
+
+class _FakeDriver:
+    """Just enough WebDriver for capture_dashboards: tabs, navigation and closing"""
+
+    def __init__(self):
+        self.current_window_handle = "tab0"
+        self.tabs = 1
+        self.navigations = []
+        self.closed = []
+        self.switch_to = MagicMock()
+        self.switch_to.window.side_effect = lambda handle: setattr(self, "current_window_handle", handle)
+        self.switch_to.new_window.side_effect = self._new_tab
+
+    def _new_tab(self, kind):
+        self.current_window_handle = f"tab{self.tabs}"
+        self.tabs += 1
+
+    def find_element(self, by, value):
+        return MagicMock()
+
+    def execute_script(self, script, url):
+        self.navigations.append((self.current_window_handle, url.rsplit("=", 1)[1]))
+
+    def close(self):
+        self.closed.append(self.current_window_handle)
+
+    def quit(self):
+        pass
+
+
+class TestDashboardTargets:
+    def test_parse_targets(self):
+        parse = DashboardCommand()._parse_targets
+        assert parse([]) == []
+        assert parse(["12"]) == [("12", None)]
+        assert parse(["3,1,3"]) == [("3", None), ("1", None)]
+        assert parse(["5", "CPU", "load,", "Disk"]) == [("5", "CPU load"), ("5", "Disk")]
+        with pytest.raises(ValueError, match="số"):
+            parse(["abc"])
+        with pytest.raises(ValueError, match="một dashboard"):
+            parse(["1,2", "CPU"])
+        with pytest.raises(ValueError, match=f"Tối đa {MAX_TARGETS}"):
+            parse([",".join(str(i) for i in range(MAX_TARGETS + 1))])
+
+    def test_dashboard_wait_matches_exact_id(self):
+        assert url_dashboardid("http://z/zabbix.php?action=dashboard.view&dashboardid=10") == "10"
+        assert url_dashboardid("http://z/zabbix.php?action=dashboard.view") is None
+
+        old_document = MagicMock()
+        old_document.is_enabled.side_effect = StaleElementReferenceException()
+        driver = MagicMock(current_url="http://z/zabbix.php?action=dashboard.view&dashboardid=10")
+        assert not dashboard_loaded("1", old_document)(driver)
+        assert dashboard_loaded("10", old_document)(driver)
+
+        # Same URL, but the previous document is still there
+        assert not dashboard_loaded("10", MagicMock())(driver)
+
+    def test_capture_dashboards_batches_tabs_and_keeps_order(self, monkeypatch):
+        driver = _FakeDriver()
+        monkeypatch.setattr(Config, "SCREENSHOT_MAX_TABS", 2)
+        monkeypatch.setattr(Config, "ZABBIX_URL", "http://zabbix")
+        monkeypatch.setattr(screenshot, "create_driver", lambda: driver)
+        monkeypatch.setattr(screenshot, "login_zabbix", lambda d: None)
+        monkeypatch.setattr(screenshot, "WebDriverWait", MagicMock())
+        monkeypatch.setattr(screenshot, "wait_for_page_ready", lambda d: None)
+        monkeypatch.setattr(screenshot, "_capture_target",
+                            lambda d, dashboardid, widget, timings=None: (f"{dashboardid}/{widget}", d.current_window_handle.encode()))
+
+        targets = [("3", "cpu"), ("1", None), ("3", "mem"), ("2", None)]
+        images = screenshot.capture_dashboards(targets)
+
+        assert [caption for caption, _ in images] == ["3/cpu", "1/None", "3/mem", "2/None"]
+        # Batch 1 loads 3 and 1 in two tabs, batch 2 reuses the first tab for 2
+        assert driver.navigations == [("tab0", "3"), ("tab1", "1"), ("tab0", "2")]
+        assert [image for _, image in images] == [b"tab0", b"tab1", b"tab0", b"tab0"]
+        assert driver.closed == ["tab1"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
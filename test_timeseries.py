@@ -0,0 +1,108 @@
+import pytest
+import numpy as np
+from timeseries import (
+    parse_history, parse_trends, split_by_item, sparkline, bucket_means, minmax_downsample, lttb_downsample, downsample_series
+)
+
+
+class TestParsing:
+    def test_parse_history_handles_negative_and_exponent(self):
+        rows = [
+            {"clock": "1718000600", "value": "-1.5e-3"},
+            {"clock": "1718000000", "value": "42"},
+            {"clock": "1718001200", "value": "-7"},
+        ]
+        clocks, values = parse_history(rows)
+        assert clocks.dtype == np.int64
+        assert clocks.tolist() == [1718000000, 1718000600, 1718001200]
+        assert values.tolist() == [42.0, -0.0015, -7.0]
+
+    def test_parse_empty(self):
+        clocks, values = parse_history([])
+        assert clocks.size == 0 and values.size == 0
+
+    def test_parse_trends_sorted(self):
+        rows = [
+            {"clock": "7200", "value_min": "1", "value_avg": "2", "value_max": "3"},
+            {"clock": "3600", "value_min": "4", "value_avg": "5", "value_max": "6"},
+        ]
+        clocks, avg, low, high = parse_trends(rows)
+        assert clocks.tolist() == [3600, 7200]
+        assert avg.tolist() == [5.0, 2.0]
+        assert low.tolist() == [4.0, 1.0]
+        assert high.tolist() == [6.0, 3.0]
+
+    def test_split_by_item(self):
+        rows = [
+            {"itemid": "7", "clock": "30", "value": "3"},
+            {"itemid": "5", "clock": "20", "value": "2"},
+            {"itemid": "7", "clock": "10", "value": "1"},
+        ]
+        split = split_by_item(rows, ['value'])
+        assert set(split) == {"5", "7"}
+        assert split["7"][0].tolist() == [10, 30]
+        assert split["7"][1].tolist() == [1.0, 3.0]
+        assert split_by_item([], ['value']) == {}
+
+
+class TestDownsampling:
+    def setup_method(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(100000, dtype=np.int64)
+        self.y = rng.normal(size=self.x.size)
+        self.y[12345] = 50.0
+        self.y[67890] = -50.0
+
+    def test_minmax_keeps_extremes_in_order(self):
+        index = minmax_downsample(self.x, self.y, 2000)
+        assert index.size <= 2000
+        assert np.all(np.diff(index) > 0)
+        assert 12345 in index and 67890 in index
+
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        index = lttb_downsample(self.x, self.y, 2000)
+        assert index.size == 2000
+        assert index[0] == 0 and index[-1] == self.x.size - 1
+        assert np.all(np.diff(index) > 0)
+        assert 12345 in index and 67890 in index
+
+    def test_short_series_untouched(self):
+        assert lttb_downsample(self.x[:10], self.y[:10], 2000).tolist() == list(range(10))
+
+    def test_band_series_are_aggregated(self):
+        series = {
+            "clock": np.arange(10, dtype=np.int64),
+            "value": np.arange(10, dtype=np.float64),
+            "min": np.arange(10, dtype=np.float64) - 1,
+            "max": np.arange(10, dtype=np.float64) + 1,
+            "source": "trends",
+        }
+        result = downsample_series(series, 5)
+        assert result["clock"].tolist() == [0, 2, 4, 6, 8]
+        assert result["value"].tolist() == [0.5, 2.5, 4.5, 6.5, 8.5]
+        assert result["min"].tolist() == [-1, 1, 3, 5, 7]
+        assert result["max"].tolist() == [2, 4, 6, 8, 10]
+        assert result["source"] == "trends"
+
+    def test_nan_values_dropped(self):
+        series = {"clock": np.arange(4, dtype=np.int64), "value": np.array([1.0, np.nan, 2.0, 3.0])}
+        assert downsample_series(series, 10)["clock"].tolist() == [0, 2, 3]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
+
+
+class TestSparkline:
+    def test_length_and_extremes(self):
+        line = sparkline(np.arange(1000, dtype=np.float64), 40)
+        assert len(line) == 40
+        assert line[0] == '▁' and line[-1] == '█'
+
+    def test_short_and_flat_series(self):
+        assert len(sparkline(np.array([1.0, 2.0, np.nan]), 40)) == 2
+        assert len(set(sparkline(np.full(100, 5.0), 40))) == 1
+        assert sparkline(np.array([])) == ''
+
+    def test_bucket_means(self):
+        assert bucket_means(np.arange(8, dtype=np.float64), 4).tolist() == [0.5, 2.5, 4.5, 6.5]
@@ -0,0 +1,185 @@
+import logging
+from operator import itemgetter
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def parse_column(rows, field: str, dtype) -> np.ndarray:
+    """
+    Convert one field of Zabbix API rows (numeric strings) into a NumPy array.
+
+    The strings are collected with a C-level itemgetter and converted by NumPy while the
+    array is built, with no intermediate list of Python floats. Negative values and
+    exponent notation ("-1.5e-3") are accepted.
+    """
+    if not rows:
+        return np.empty(0, dtype=dtype)
+    return np.array(list(map(itemgetter(field), rows)), dtype=dtype)
+
+
+def parse_history(rows):
+    """history.get rows -> (clock int64, value float64) sorted by clock"""
+    clocks = parse_column(rows, 'clock', np.int64)
+    values = parse_column(rows, 'value', np.float64)
+    if clocks.size > 1 and np.any(clocks[1:] < clocks[:-1]):
+        order = np.argsort(clocks, kind='stable')
+        clocks, values = clocks[order], values[order]
+    return clocks, values
+
+
+def parse_trends(rows):
+    """trend.get rows -> (clock, avg, min, max) arrays sorted by clock"""
+    clocks = parse_column(rows, 'clock', np.int64)
+    order = np.argsort(clocks, kind='stable')
+    return (clocks[order],
+            parse_column(rows, 'value_avg', np.float64)[order],
+            parse_column(rows, 'value_min', np.float64)[order],
+            parse_column(rows, 'value_max', np.float64)[order])
+
+
+def split_by_item(rows, fields):
+    """
+    Rows of several items (history.get/trend.get with a list of itemids) ->
+    {itemid: (clock, *fields)} with each item's arrays sorted by clock.
+
+    All rows are parsed at once and split with one lexsort instead of a pass per item.
+    """
+    if not rows:
+        return {}
+    itemids = parse_column(rows, 'itemid', np.int64)
+    clocks = parse_column(rows, 'clock', np.int64)
+    columns = [parse_column(rows, field, np.float64) for field in fields]
+    order = np.lexsort((clocks, itemids))
+    sorted_ids = itemids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    ends = np.r_[starts[1:], sorted_ids.size]
+    result = {}
+    for start, end in zip(starts, ends):
+        index = order[start:end]
+        result[str(sorted_ids[start])] = (clocks[index], *(column[index] for column in columns))
+    return result
+
+
+def _bucket_starts(length: int, buckets: int) -> np.ndarray:
+    return np.unique(np.linspace(0, length, buckets + 1).astype(np.int64)[:-1])
+
+
+def minmax_downsample(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of the min and max point of max_points/2 equal-sized buckets, in time order.
+
+    Fully vectorised (one lexsort), keeps every spike visible.
+    """
+    n = y.size
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, max_points // 2)
+    bucket_id = (np.arange(n) * buckets) // n
+    order = np.lexsort((y, bucket_id))
+    sorted_buckets = bucket_id[order]
+    first = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+    return np.unique(np.concatenate((order[first], order[last])))
+
+
+def lttb_downsample(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices selected by Largest-Triangle-Three-Buckets, first and last point included.
+
+    The bucket loop is inherently sequential (each pick depends on the previous one), but
+    every bucket is scored with array operations, so the cost is O(n) NumPy work plus
+    max_points Python iterations.
+    """
+    n = y.size
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+
+    xf = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = xf[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((xf[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (xf[previous] - xf[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def _aggregate_buckets(series: dict, max_points: int) -> dict:
+    """Merge consecutive min/avg/max points into max_points buckets"""
+    starts = _bucket_starts(series['clock'].size, max_points)
+    counts = np.diff(np.r_[starts, series['clock'].size])
+    result = dict(series)
+    result['clock'] = series['clock'][starts]
+    result['value'] = np.add.reduceat(series['value'], starts) / counts
+    result['min'] = np.minimum.reduceat(series['min'], starts)
+    result['max'] = np.maximum.reduceat(series['max'], starts)
+    return result
+
+
+def target_points(width_px: int) -> int:
+    """Points worth drawing for a chart `width_px` wide: about two per pixel"""
+    return 2 * width_px
+
+
+def downsample_series(series: dict, max_points: int, method: str = None) -> dict:
+    """
+    Reduce a series dict (`clock`, `value`, optional `min`/`max`) to about max_points.
+
+    Series with min/max bands are bucket-aggregated so the band stays exact; plain series
+    use LTTB or min-max bucketing (GRAPH_DOWNSAMPLE). NaN values are dropped first.
+    """
+    method = (method or Config.GRAPH_DOWNSAMPLE).lower()
+
+    keep = ~np.isnan(series['value'])
+    if not keep.all():
+        series = {k: (v[keep] if isinstance(v, np.ndarray) else v) for k, v in series.items()}
+
+    size = series['clock'].size
+    if size <= max_points:
+        return series
+    if series.get('min') is not None and series.get('max') is not None:
+        result = _aggregate_buckets(series, max_points)
+    else:
+        picker = minmax_downsample if method == 'minmax' else lttb_downsample
+        index = picker(series['clock'], series['value'], max_points)
+        result = {k: (v[index] if isinstance(v, np.ndarray) else v) for k, v in series.items()}
+    logger.debug(f"Downsampled {size} points to {result['clock'].size}")
+    return result
+
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+def bucket_means(values: np.ndarray, buckets: int) -> np.ndarray:
+    """Average of `buckets` consecutive, equal-sized slices of values (fewer if shorter)"""
+    if values.size <= buckets:
+        return values.astype(np.float64)
+    starts = _bucket_starts(values.size, buckets)
+    counts = np.diff(np.r_[starts, values.size])
+    return np.add.reduceat(values, starts) / counts
+
+
+def sparkline(values: np.ndarray, buckets: int = 40) -> str:
+    """One-line Unicode sparkline of a value array, NaNs ignored"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return ''
+    means = bucket_means(values, buckets)
+    low, high = means.min(), means.max()
+    if high == low:
+        levels = np.full(means.size, len(SPARK_CHARS) // 2, dtype=np.int64)
+    else:
+        levels = np.rint((means - low) / (high - low) * (len(SPARK_CHARS) - 1)).astype(np.int64)
+    return ''.join(SPARK_CHARS[level] for level in levels)
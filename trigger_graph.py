@@ -0,0 +1,233 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def build_csr(src: np.ndarray, dst: np.ndarray, size: int):
+    """Edge arrays -> (indptr, indices) compressed adjacency of `size` nodes"""
+    counts = np.bincount(src, minlength=size)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = dst[np.argsort(src, kind='stable')].astype(np.int64)
+    return indptr, indices
+
+
+def reachable(indptr: np.ndarray, indices: np.ndarray, sources: np.ndarray) -> np.ndarray:
+    """
+    Mask of nodes reachable from `sources` through at least one edge.
+
+    Breadth-first, one array gather per level instead of a Python loop per edge.
+    """
+    visited = np.zeros(indptr.size - 1, dtype=bool)
+    frontier = np.unique(np.asarray(sources, dtype=np.int64))
+    while frontier.size:
+        starts = indptr[frontier]
+        lengths = indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            break
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        following = np.unique(indices[offsets])
+        frontier = following[~visited[following]]
+        visited[frontier] = True
+    return visited
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray):
+    """(position in `nodes`, neighbour) for every edge leaving `nodes`"""
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    total = int(lengths.sum())
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    return np.repeat(np.arange(nodes.size), lengths), indices[offsets]
+
+
+def reachable_pairs(indptr: np.ndarray, indices: np.ndarray, sources: np.ndarray):
+    """
+    Every (source position, node) pair with node reachable from sources[pos].
+
+    All sources are walked together, level by level, with pairs encoded as one int64
+    key, so the cost is the total reach size rather than one traversal per source.
+    """
+    size = indptr.size - 1
+    labels = np.arange(sources.size, dtype=np.int64)
+    nodes = np.asarray(sources, dtype=np.int64)
+    seen = np.empty(0, dtype=np.int64)
+    while nodes.size:
+        position, following = _gather(indptr, indices, nodes)
+        if following.size == 0:
+            break
+        keys = np.unique(labels[position] * size + following)
+        keys = keys[~np.isin(keys, seen, assume_unique=True)]
+        seen = np.union1d(seen, keys)
+        labels, nodes = np.divmod(keys, size)
+    return np.divmod(seen, size)
+
+
+class TriggerDependencyGraph:
+    """
+    Trigger dependency DAG of the whole Zabbix install.
+
+    Built from trigger.get with selectDependencies and kept as integer-indexed CSR arrays
+    in both directions: `up` (trigger -> triggers it depends on) and `down` (trigger ->
+    triggers depending on it). Rebuilt fully every TRIGGER_GRAPH_REFRESH seconds; triggers
+    seen in problems but missing from the graph are fetched and merged in between.
+    """
+
+    def __init__(self, refresh_interval: int = None):
+        self.refresh_interval = refresh_interval or Config.TRIGGER_GRAPH_REFRESH
+        self._lock = threading.Lock()
+        self._deps: Dict[str, List[str]] = {}
+        self._info: Dict[str, tuple] = {}  # triggerid -> (host, description)
+        self.built_at = 0.0
+        self._index: Dict[str, int] = {}
+        self.triggerids = np.empty(0, dtype=object)
+        self.host_ids = np.empty(0, dtype=np.int64)
+        self.host_names: List[str] = []
+        self.up = (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self.down = (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    @staticmethod
+    def _fetch(zapi, triggerids: Iterable[str] = None) -> List[dict]:
+        params = {
+            "output": ["triggerid", "description"],
+            "selectDependencies": ["triggerid"],
+            "selectHosts": ["host"]
+        }
+        if triggerids is not None:
+            params["triggerids"] = list(triggerids)
+        return zapi.trigger.get(params) or []
+
+    def _merge(self, triggers: List[dict]):
+        for trigger in triggers:
+            triggerid = trigger["triggerid"]
+            host = trigger['hosts'][0]['host'] if trigger.get('hosts') else "Unknown"
+            self._info[triggerid] = (host, trigger.get("description", ""))
+            self._deps[triggerid] = [dep["triggerid"] for dep in trigger.get("dependencies") or []]
+
+    def _rebuild_arrays(self):
+        """Intern trigger ids and hosts and lay the edges out as CSR arrays"""
+        known = set(self._info)
+        for deps in self._deps.values():
+            known.update(deps)
+        triggerids = sorted(known)
+        index = {triggerid: i for i, triggerid in enumerate(triggerids)}
+
+        host_index: Dict[str, int] = {}
+        host_ids = np.fromiter(
+            (host_index.setdefault(self._info.get(t, ("Unknown", ""))[0], len(host_index)) for t in triggerids),
+            dtype=np.int64, count=len(triggerids)
+        )
+        src = np.fromiter((index[t] for t, deps in self._deps.items() for _ in deps), dtype=np.int64)
+        dst = np.fromiter((index[d] for deps in self._deps.values() for d in deps), dtype=np.int64)
+
+        self._index = index
+        self.triggerids = np.array(triggerids, dtype=object)
+        self.host_ids = host_ids
+        self.host_names = list(host_index)
+        self.up = build_csr(src, dst, len(triggerids))
+        self.down = build_csr(dst, src, len(triggerids))
+
+    def refresh(self, zapi, force: bool = False):
+        """Full rebuild when stale (or forced)"""
+        with self._lock:
+            if not force and self.built_at and time.time() - self.built_at < self.refresh_interval:
+                return
+            started = time.perf_counter()
+            triggers = self._fetch(zapi)
+            self._deps, self._info = {}, {}
+            self._merge(triggers)
+            self._rebuild_arrays()
+            self.built_at = time.time()
+            logger.info(f"Trigger dependency graph built: {len(self._index)} triggers, "
+                        f"{self.up[1].size} dependencies in {time.perf_counter() - started:.2f}s")
+
+    def add_missing(self, zapi, triggerids: Iterable[str], max_rounds: int = 5):
+        """Fetch triggers (and the triggers they depend on) that the graph does not know yet"""
+        with self._lock:
+            missing = {t for t in triggerids if t not in self._info}
+            changed = False
+            for _ in range(max_rounds):
+                if not missing:
+                    break
+                triggers = self._fetch(zapi, missing)
+                self._merge(triggers)
+                changed = changed or bool(triggers)
+                missing = {d for t in triggers for d in self._deps[t["triggerid"]] if d not in self._info}
+            if changed:
+                self._rebuild_arrays()
+
+    def stale(self, triggerids: Iterable[str] = ()) -> bool:
+        """Whether ensure() would have to call Zabbix for these triggers"""
+        if not self.built_at or time.time() - self.built_at >= self.refresh_interval:
+            return True
+        return any(t not in self._info for t in triggerids)
+
+    def trigger_map(self, triggerids: Iterable[str]) -> Dict[str, dict]:
+        """trigger.get-shaped {triggerid: {description, dependencies}} from the cached graph"""
+        with self._lock:
+            return {
+                t: {
+                    "triggerid": t,
+                    "description": self._info[t][1],
+                    "dependencies": [{"triggerid": d} for d in self._deps.get(t, [])]
+                }
+                for t in triggerids if t in self._info
+            }
+
+    def ensure(self, zapi, triggerids: Iterable[str]):
+        """Refresh if stale, then merge any trigger the graph has not seen"""
+        triggerids = list(triggerids)
+        self.refresh(zapi)
+        self.add_missing(zapi, triggerids)
+
+    def rank_root_causes(self, active_triggerids: Iterable[str], limit: int = 5) -> List[dict]:
+        """
+        Rank probable root causes among active problem triggers.
+
+        A root is an active trigger that depends (transitively) on no other active
+        trigger. Roots are ranked by blast radius: how many active problems, and on how
+        many hosts, sit downstream of them, then by their total downstream size.
+        """
+        with self._lock:
+            index, down_indptr, down_indices = self._index, self.down[0], self.down[1]
+            triggerids, host_ids, host_names = self.triggerids, self.host_ids, self.host_names
+
+        nodes = np.unique(np.fromiter((index[t] for t in active_triggerids if t in index), dtype=np.int64))
+        if nodes.size == 0:
+            return []
+        active = np.zeros(triggerids.size, dtype=bool)
+        active[nodes] = True
+
+        # Active problems reachable downstream of another active problem are consequences
+        dependent = reachable(down_indptr, down_indices, nodes)
+        roots = nodes[~dependent[nodes]]
+        roots = roots[(down_indptr[roots + 1] - down_indptr[roots]) > 0]
+
+        # Blast radius of every root in one labelled traversal
+        position, node = reachable_pairs(down_indptr, down_indices, roots)
+        total = np.bincount(position, minlength=roots.size)
+        hit = active[node]
+        active_downstream = np.bincount(position[hit], minlength=roots.size)
+        host_pairs = np.unique(position[hit] * max(len(host_names), 1) + host_ids[node[hit]])
+        affected_hosts = np.bincount(host_pairs // max(len(host_names), 1), minlength=roots.size)
+
+        ranked = [{
+            "triggerid": triggerids[root],
+            "host": host_names[host_ids[root]],
+            "description": self._info.get(triggerids[root], ("", ""))[1],
+            "active_downstream": int(active_downstream[i]),
+            "affected_hosts": int(affected_hosts[i]),
+            "total_downstream": int(total[i])
+        } for i, root in enumerate(roots)]
+        ranked.sort(key=lambda r: (r["active_downstream"], r["affected_hosts"], r["total_downstream"]), reverse=True)
+        return ranked[:limit]
+
+
+# Global dependency graph shared by analyses
+trigger_graph = TriggerDependencyGraph()